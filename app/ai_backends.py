@@ -0,0 +1,114 @@
+"""
+KI-Backends: wer beantwortet die Structured-Output-Aufrufe (Extraktion, Titel,
+Commodity Group, One-Shot)?
+
+AI_BACKEND (Konfiguration, Standard "openai"):
+- "openai":  AsyncOpenAI gegen die OpenAI-API bzw. OPENAI_BASE_URL – das kann auch der
+             lokale Stand-in-Server sein (python app/ai_standin.py --port 8000).
+- "standin": deterministischer Stand-in im Prozess (ai_standin), ohne Netzwerk und ohne Key;
+             Latenz und Fehlerquote über STANDIN_LATENCY_MS / STANDIN_ERROR_RATE.
+
+Ein Backend liefert pro Aufruf ein Objekt mit .output_parsed (Instanz von text_format)
+und .usage (input_tokens/output_tokens/total_tokens) – wie responses.parse().
+stream() liefert dasselbe, ruft aber unterwegs on_text(bisheriger Antworttext) auf, sobald
+weiterer JSON-Text da ist (Auto-Fill füllt damit das Formular schon während der Antwort).
+Rate-Limit, Retries und Circuit Breaker liegen davor im ai_gateway, gelten also für alle Backends.
+
+Import ohne openai/pydantic: app.py und die Worker fragen nur ai_available().
+"""
+import os
+import threading
+from typing import Callable, Optional
+
+from intake import OPENAI_MODEL, get_clean_openai_key
+
+AI_BACKENDS = ("openai", "standin")
+AI_BACKEND = os.getenv("AI_BACKEND", "openai").strip().lower()
+# Eigene Timeouts + Retries im Gateway statt 600 s / 2 Retries im Client
+AI_TIMEOUT_S = float(os.getenv("AI_TIMEOUT_S", "60"))
+
+
+class AIBackend:
+    name = ""
+    # Geht in Cache-Keys ein: Antworten verschiedener Backends/Modelle mischen sich nicht
+    model = ""
+
+    def available(self) -> bool:
+        return True
+
+    def unavailable_reason(self) -> str:
+        return ""
+
+    async def parse(self, messages: list[dict], text_format):
+        raise NotImplementedError
+
+    async def stream(self, messages: list[dict], text_format, on_text: Callable[[str], None]):
+        # Backends ohne Streaming: die ganze Antwort auf einmal
+        resp = await self.parse(messages, text_format)
+        on_text(resp.output_parsed.model_dump_json())
+        return resp
+
+
+class OpenAIBackend(AIBackend):
+    name = "openai"
+
+    def __init__(self, model: str = OPENAI_MODEL):
+        self.model = model
+        self._clients = {}
+
+    def available(self) -> bool:
+        return bool(get_clean_openai_key())
+
+    def unavailable_reason(self) -> str:
+        return "OPENAI_API_KEY ist nicht gesetzt oder leer."
+
+    def client(self):
+        # Nur auf dem AI-Loop aufrufen: der httpx-Pool des Clients hängt an diesem Loop
+        from openai import AsyncOpenAI
+
+        api_key = get_clean_openai_key()
+        if not api_key:
+            raise RuntimeError(self.unavailable_reason())
+        client = self._clients.get(api_key)
+        if client is None:
+            client = self._clients[api_key] = AsyncOpenAI(api_key=api_key, max_retries=0, timeout=AI_TIMEOUT_S)
+        return client
+
+    async def parse(self, messages: list[dict], text_format):
+        return await self.client().responses.parse(model=self.model, input=messages, text_format=text_format)
+
+    async def stream(self, messages: list[dict], text_format, on_text: Callable[[str], None]):
+        async with self.client().responses.stream(model=self.model, input=messages, text_format=text_format) as stream:
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    on_text(event.snapshot)
+            # Validiert gegen text_format wie parse(); fehlt "response.completed", gibt es einen Fehler
+            return await stream.get_final_response()
+
+
+_backends: dict[str, AIBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name: Optional[str] = None) -> AIBackend:
+    name = (name or AI_BACKEND).strip().lower()
+    backend = _backends.get(name)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(name)
+            if backend is None:
+                if name == "openai":
+                    backend = OpenAIBackend()
+                elif name == "standin":
+                    from ai_standin import StandInBackend
+
+                    backend = StandInBackend()
+                else:
+                    raise ValueError(f"Unbekanntes AI_BACKEND '{name}' (erlaubt: {', '.join(AI_BACKENDS)}).")
+                _backends[name] = backend
+    return backend
+
+
+def ai_available() -> bool:
+    """Kann das konfigurierte Backend gerade Aufrufe annehmen (z.B. API-Key vorhanden)?"""
+    return get_backend().available()
@@ -0,0 +1,270 @@
+"""
+KI-Gateway: eine Stelle pro Prozess vor allen KI-Aufrufen (OpenAI oder Stand-in, siehe ai_backends).
+
+- Token-Bucket für Requests/Minute und Tokens/Minute (AI_RPM, AI_TPM, Burst
+  AI_BURST_S Sekunden): Aufrufe warten, statt ins 429 zu laufen. Tokens werden vorab geschätzt und nach der
+  Antwort mit usage verrechnet. Ein 429 mit Retry-After pausiert alle Aufrufer.
+- Wiederholungen mit exponentiellem Backoff + Jitter bei 429, Timeouts,
+  Verbindungsfehlern und 5xx (der OpenAI-Client selbst wiederholt nicht mehr).
+- Coalescing: identische Anfragen, die gleichzeitig laufen, teilen sich einen Aufruf.
+- Circuit Breaker: nach AI_BREAKER_FAILURES Ausfällen in Folge (Timeout,
+  Verbindung, 5xx) sofort AIUnavailableError statt erneut zu warten; nach
+  AI_BREAKER_COOLDOWN_S darf ein Probe-Aufruf durch. Auch ein Aufruf, der wegen
+  eines Ausfalls aufgibt, endet mit AIUnavailableError (Original als __cause__).
+
+Läuft komplett auf dem AI-Event-Loop (ai_service.run_ai) → keine Thread-Locks nötig.
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Awaitable, Callable, Optional
+
+from metrics import METRICS_ENABLED, record, record_tokens, span
+
+AI_RPM = float(os.getenv("AI_RPM", "500"))
+AI_TPM = float(os.getenv("AI_TPM", "200000"))
+# OpenAI setzt die Minutenquote auch über kürzere Fenster durch → Burst auf einige Sekunden begrenzen
+AI_BURST_S = float(os.getenv("AI_BURST_S", "10"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "4"))
+AI_BACKOFF_BASE_S = float(os.getenv("AI_BACKOFF_BASE_S", "0.5"))
+AI_BACKOFF_MAX_S = float(os.getenv("AI_BACKOFF_MAX_S", "20"))
+# Mehr als die Versuche eines einzelnen Aufrufs: ein einzelner kaputter Prompt öffnet den Breaker nicht
+AI_BREAKER_FAILURES = int(os.getenv("AI_BREAKER_FAILURES", "8"))
+AI_BREAKER_COOLDOWN_S = float(os.getenv("AI_BREAKER_COOLDOWN_S", "30"))
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Diese Fehler heißen "API nicht erreichbar" (zählen für den Circuit Breaker), 429 nicht
+OUTAGE_ERRORS = ("APIConnectionError", "APITimeoutError")
+
+
+class AIUnavailableError(RuntimeError):
+    """
+    KI gerade nicht erreichbar (Circuit Breaker offen oder Wiederholungen wegen Ausfall aufgebraucht),
+    retry_after Sekunden bis zum nächsten Versuch.
+    """
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# -----------------------------
+# Fehler einordnen (ohne openai zu importieren: Status-Code + Klassenname)
+# -----------------------------
+def error_kind(e: BaseException) -> Optional[str]:
+    """"rate_limit", "outage" oder None (nicht wiederholbar, z.B. 400/401/Schema)."""
+    status = getattr(e, "status_code", None)
+    if status == 429:
+        return "rate_limit"
+    if status is not None:
+        return "outage" if status in RETRY_STATUS or status >= 500 else None
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return "outage"
+    if any(cls.__name__ in OUTAGE_ERRORS for cls in type(e).__mro__):
+        return "outage"
+    return None
+
+
+def retry_after_s(e: BaseException) -> float:
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return max(0.0, float(headers.get("retry-after", 0)))
+    except (TypeError, ValueError):
+        # HTTP-Datum statt Sekunden → eigener Backoff
+        return 0.0
+
+
+def backoff_s(attempt: int, base: float = AI_BACKOFF_BASE_S, cap: float = AI_BACKOFF_MAX_S) -> float:
+    # "Equal Jitter": mindestens die Hälfte des exponentiellen Werts, Rest zufällig
+    d = min(cap, base * 2 ** attempt)
+    return d / 2 + random.uniform(0, d / 2)
+
+
+# -----------------------------
+# Bausteine
+# -----------------------------
+class TokenBucket:
+    def __init__(self, per_minute: float, burst_s: float = AI_BURST_S, clock: Callable[[], float] = time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_s)
+        self.level = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_s(self, amount: float) -> float:
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        # Darf negativ werden: nachträglich verrechnete Tokens werden dann "abgestottert"
+        self._refill()
+        self.level -= amount
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int = AI_BREAKER_FAILURES, cooldown_s: float = AI_BREAKER_COOLDOWN_S,
+                 clock: Callable[[], float] = time.monotonic):
+        self.threshold = failures
+        self.cooldown_s = cooldown_s
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_running = False
+
+    def before_call(self):
+        if self.state == "closed":
+            return
+        remaining = self.cooldown_s - (self.clock() - self.opened_at)
+        if self.state == "open" and remaining <= 0:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.probe_running:
+            self.probe_running = True
+            return
+        raise AIUnavailableError("KI-Dienst nicht erreichbar (Circuit Breaker offen).", max(remaining, 1.0))
+
+    def success(self):
+        self.state, self.failures, self.probe_running = "closed", 0, False
+
+    def failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            self.state, self.opened_at = "open", self.clock()
+        self.probe_running = False
+
+    def release_probe(self):
+        # Probe endete ohne Aussage über die Erreichbarkeit (z.B. 400) → nächster Aufruf darf proben
+        self.probe_running = False
+
+
+# -----------------------------
+# Gateway
+# -----------------------------
+class AIGateway:
+    def __init__(self, rpm: float = AI_RPM, tpm: float = AI_TPM, burst_s: float = AI_BURST_S,
+                 max_retries: int = AI_MAX_RETRIES, backoff_base_s: float = AI_BACKOFF_BASE_S,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.requests = TokenBucket(rpm, burst_s)
+        self.tokens = TokenBucket(tpm, burst_s)
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.breaker = breaker or CircuitBreaker()
+        self.paused_until = 0.0
+        self._acquire_lock: Optional[asyncio.Lock] = None
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.counters = {"calls": 0, "coalesced": 0, "retries": 0, "rate_limited": 0, "rejected": 0}
+
+    async def _acquire(self, est_tokens: float):
+        if self._acquire_lock is None:
+            self._acquire_lock = asyncio.Lock()
+        t0 = time.perf_counter()
+        # Lock = FIFO: wer zuerst wartet, bekommt das nächste freie Kontingent
+        async with self._acquire_lock:
+            while True:
+                wait = max(self.paused_until - time.monotonic(),
+                           self.requests.wait_s(1), self.tokens.wait_s(est_tokens))
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            self.requests.take(1)
+            self.tokens.take(est_tokens)
+        waited_ms = (time.perf_counter() - t0) * 1000
+        if METRICS_ENABLED and waited_ms >= 1:
+            record("llm.ratelimit_wait", waited_ms)
+
+    async def call(self, stage: str, key: str, request: Callable[[], Awaitable], est_tokens: float):
+        """request() einmal pro Versuch; gleiche `key`s, die schon laufen, warten auf dasselbe Ergebnis."""
+        running = self._inflight.get(key)
+        if running is not None:
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(running)
+
+        task = asyncio.ensure_future(self._run(stage, request, est_tokens))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+        # Abbruch eines Wartenden bricht den geteilten Aufruf nicht ab
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Fehler gilt als abgeholt, auch wenn alle Wartenden abgebrochen wurden
+            task.exception()
+
+    async def _run(self, stage: str, request: Callable[[], Awaitable], est_tokens: float):
+        self.counters["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.breaker.before_call()
+            except AIUnavailableError:
+                self.counters["rejected"] += 1
+                raise
+            await self._acquire(est_tokens)
+            try:
+                with span(stage):
+                    resp = await request()
+            except Exception as e:
+                kind = error_kind(e)
+                if kind is None:
+                    self.breaker.release_probe()
+                    raise
+                if kind == "outage":
+                    self.breaker.failure()
+                else:
+                    self.counters["rate_limited"] += 1
+                    self.breaker.release_probe()
+                wait = retry_after_s(e)
+                if wait:
+                    self.paused_until = max(self.paused_until, time.monotonic() + wait)
+                if attempt == self.max_retries or self.breaker.state == "open":
+                    if kind == "outage":
+                        # Aufgegeben, weil die API nicht erreichbar ist → wie ein offener Breaker behandeln,
+                        # damit Titel/Commodity Group auf ihre Fallbacks gehen statt Auto-Fill abzubrechen
+                        retry_after = self.breaker.cooldown_s if self.breaker.state == "open" else wait
+                        raise AIUnavailableError(f"KI-Dienst nicht erreichbar ({type(e).__name__}: {e}).",
+                                                 max(retry_after, 1.0)) from e
+                    raise
+                self.counters["retries"] += 1
+                await asyncio.sleep(max(wait, backoff_s(attempt, self.backoff_base_s)))
+                continue
+
+            self.breaker.success()
+            usage = getattr(resp, "usage", None)
+            record_tokens(stage, usage)
+            actual = getattr(usage, "total_tokens", None)
+            if actual:
+                self.tokens.take(actual - est_tokens)
+            return resp
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "inflight": len(self._inflight),
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "requests_available": round(self.requests.level, 1),
+            "tokens_available": round(self.tokens.level),
+        }
+
+
+_gateway: Optional[AIGateway] = None
+
+
+def get_gateway() -> AIGateway:
+    # Nur auf dem AI-Loop aufrufen (wie OpenAIBackend.client)
+    global _gateway
+    if _gateway is None:
+        _gateway = AIGateway()
+    return _gateway
+
+
+def gateway_stats() -> Optional[dict]:
+    return _gateway.stats() if _gateway is not None else None
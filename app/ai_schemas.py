@@ -0,0 +1,80 @@
+"""
+Pydantic-Schemas für die KI-Aufrufe (Extraktion, Titel, Commodity Group, One-Shot).
+
+Eigenes Modul, damit `import intake` ohne pydantic auskommt: intake lädt die
+Schemas erst beim ersten Zugriff (siehe intake.__getattr__).
+"""
+import hashlib
+import json
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from intake import EXTRACTION_CHUNK_SYSTEM_PROMPT, EXTRACTION_SYSTEM_PROMPT, ONESHOT_SYSTEM_PROMPT
+
+
+# -----------------------------
+# Extraktion: Angebot → strukturierte Daten
+# -----------------------------
+class ExtractedOrderLine(BaseModel):
+    description: str
+    unit_price: float = Field(..., ge=0)
+    quantity: float = Field(..., ge=0)
+    unit: Optional[str] = None
+
+class ExtractedOffer(BaseModel):
+    vendor_name: Optional[str] = None
+    vendor_vat_id: Optional[str] = None
+    department: Optional[str] = None
+
+    # Requestor Name kommt in Angeboten oft nicht vor → nicht extrahieren
+    # Title/Short Description generieren wir separat (siehe unten)
+
+    order_lines: List[ExtractedOrderLine] = []
+
+    positions_net: Optional[float] = None
+    shipping_net: Optional[float] = None
+    tax_amount: Optional[float] = None
+    total_gross: Optional[float] = None
+
+    currency: Optional[str] = "EUR"
+
+# Ändert sich der Prompt oder das Schema, ändert sich die Version → alte Cache-Einträge greifen nicht mehr
+EXTRACTION_PROMPT_VERSION = hashlib.sha256(
+    (EXTRACTION_SYSTEM_PROMPT + json.dumps(ExtractedOffer.model_json_schema(), sort_keys=True)).encode("utf-8")
+).hexdigest()[:12]
+# Teil-Extraktionen langer Angebote (anderer Prompt) → eigene Cache-Einträge pro Teil
+EXTRACTION_CHUNK_PROMPT_VERSION = hashlib.sha256(
+    (EXTRACTION_CHUNK_SYSTEM_PROMPT + json.dumps(ExtractedOffer.model_json_schema(), sort_keys=True)).encode("utf-8")
+).hexdigest()[:12]
+
+
+# -----------------------------
+# Title/Short Description
+# -----------------------------
+class TitleSuggestion(BaseModel):
+    title: str = Field(..., description="Kurzer Titel/Short Description, max. ca. 70 Zeichen")
+
+
+# -----------------------------
+# Commodity Group
+# -----------------------------
+class CommodityPick(BaseModel):
+    commodity_group_id: str
+    commodity_group_name: str
+    confidence: float = Field(..., ge=0.0, le=1.0)
+    reasoning_short: str
+
+
+# -----------------------------
+# One-Shot: alle drei Ergebnisse in einer strukturierten Antwort
+# -----------------------------
+class OneShotAutoFill(BaseModel):
+    offer: ExtractedOffer
+    title: TitleSuggestion
+    commodity: CommodityPick
+
+# Eigene Version → One-Shot-Antworten und reine Extraktionen teilen sich den Cache, ohne zu kollidieren
+ONESHOT_PROMPT_VERSION = hashlib.sha256(
+    (ONESHOT_SYSTEM_PROMPT + json.dumps(OneShotAutoFill.model_json_schema(), sort_keys=True)).encode("utf-8")
+).hexdigest()[:12]
@@ -0,0 +1,371 @@
+"""
+Async KI-Service für Auto-Fill.
+
+Das KI-Backend (ai_backends: OpenAI oder lokaler Stand-in, AI_BACKEND) läuft auf
+einem eigenen Event-Loop-Thread, damit HTTP-Verbindungen über Streamlit-Reruns und
+Batch-Threads hinweg wiederverwendet werden. Aufrufer aus synchronem Code nutzen run_ai()/autofill().
+
+Zwei Modi (AUTOFILL_MODE bzw. Parameter mode):
+- "multi":   Extraktion, danach Titel ∥ Commodity Group (drei Aufrufe)
+- "oneshot": ein Aufruf mit kombiniertem Schema (OneShotAutoFill); schlägt er fehl,
+             läuft der Mehrschritt-Pfad als Fallback
+
+Die Extraktion läuft ohne Boilerplate (AGB usw.); lange Angebote werden an Seiten- und
+Tabellengrenzen geteilt, parallel extrahiert und zusammengeführt (offer_chunking) –
+dann auch im Modus "oneshot" über den Mehrschritt-Pfad.
+
+Mit on_partial (Auto-Fill-Job im Formular) wird die Extraktion gestreamt (AUTOFILL_STREAM=0
+schaltet das ab): Lieferant, USt-Id, Abteilung und jede Position gehen an on_partial, sobald sie
+im JSON fertig sind; validiert und übernommen wird am Ende trotzdem die vollständige Antwort.
+
+Davor der lokale Schnellpfad (offer_parser, AUTOFILL_LOCAL_PARSER=0 schaltet ihn ab):
+erkennt er ein strukturiertes Angebot sicher, entfällt die KI-Extraktion ("local").
+
+Alle Aufrufe laufen über ai_gateway (Rate-Limit, Retries, Coalescing, Circuit Breaker).
+Ist der Breaker offen, kommen Titel und Commodity Group sofort aus den Fallbacks.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Optional
+
+from pydantic import BaseModel, ValidationError
+
+import extraction_cache
+from ai_backends import get_backend
+from ai_gateway import AIUnavailableError, get_gateway
+from ai_schemas import (
+    EXTRACTION_CHUNK_PROMPT_VERSION,
+    EXTRACTION_PROMPT_VERSION,
+    ONESHOT_PROMPT_VERSION,
+    CommodityPick,
+    ExtractedOffer,
+    ExtractedOrderLine,
+    OneShotAutoFill,
+    TitleSuggestion,
+)
+from intake import (
+    AUTOFILL_MODE,
+    build_commodity_input,
+    build_extraction_chunk_input,
+    build_extraction_input,
+    build_oneshot_input,
+    build_title_input,
+    clean_title,
+    extraction_cache_key,
+    local_commodity_pick,
+    offer_line_from_extraction,
+    offer_lines_from_extraction,
+    simple_commodity_group_guess,
+    title_fallback,
+    validate_commodity_pick,
+)
+from metrics import METRICS_ENABLED, record, span
+from offer_chunking import EXTRACT_CHUNK_CHARS, merge_extractions, split_for_extraction
+from offer_parser import parse_offer_locally
+from partial_offer import PartialOfferParser
+
+LOCAL_PARSER_ENABLED = os.getenv("AUTOFILL_LOCAL_PARSER", "1") != "0"
+AUTOFILL_STREAM = os.getenv("AUTOFILL_STREAM", "1") != "0"
+# Für die Token-Schätzung vor dem Aufruf (Ausgabe ist strukturiert und kurz)
+EXPECTED_OUTPUT_TOKENS = 600
+
+
+# -----------------------------
+# Event-Loop (einmal pro Prozess)
+# -----------------------------
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_ai_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="ai-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run_ai(coro, timeout: Optional[float] = None):
+    # Blockiert nur den aufrufenden Thread; alle Aufrufe teilen sich Loop + Client
+    return asyncio.run_coroutine_threadsafe(coro, get_ai_loop()).result(timeout)
+
+
+@lru_cache(maxsize=None)
+def schema_chars(text_format) -> int:
+    return len(json.dumps(text_format.model_json_schema()))
+
+
+def estimate_tokens(messages: list[dict], text_format) -> int:
+    # ≈ 4 Zeichen pro Token; das Schema geht bei Structured Outputs mit
+    chars = sum(len(m["content"]) for m in messages) + schema_chars(text_format)
+    return chars // 4 + EXPECTED_OUTPUT_TOKENS
+
+
+async def parse_structured(stage: str, messages: list[dict], text_format,
+                           on_text: Optional[Callable[[str], None]] = None):
+    """
+    Ein Structured-Output-Aufruf über den Gateway; gleiche Anfragen gleichzeitig → ein Aufruf.
+    Mit on_text gestreamt (on_text(bisheriger Antworttext)); wer sich an einen laufenden
+    Aufruf anhängt, bekommt nur das Endergebnis.
+    """
+    backend = get_backend()
+    if not backend.available():
+        raise RuntimeError(backend.unavailable_reason())
+    key = hashlib.sha256(
+        json.dumps([backend.model, text_format.__name__, messages], sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    if on_text is None:
+        request = lambda: backend.parse(messages, text_format)  # noqa: E731
+    else:
+        request = lambda: backend.stream(messages, text_format, on_text)  # noqa: E731
+    return await get_gateway().call(stage, key, request, estimate_tokens(messages, text_format))
+
+
+# -----------------------------
+# Streaming: Teilergebnisse der Extraktion
+# -----------------------------
+# Ein Thread → Teilergebnisse kommen in Reihenfolge an; DB-Schreiben blockiert den AI-Loop nicht
+_partial_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autofill-partial")
+
+
+def partial_text_handler(stage: str, on_partial: Optional[Callable[[dict], None]]):
+    """
+    on_text für parse_structured (None, wenn nicht gestreamt wird): ruft on_partial mit
+    {vendor_name, vendor_vat_id, department, "lines": [...]} auf, sobald ein Feld oder eine
+    Position fertig ist. Noch nicht fertige Kopffelder fehlen im dict; Positionen sind im
+    Format des Order-Lines-Editors, ungültige (z.B. negativer Preis) fehlen bis zum Endergebnis.
+    """
+    if on_partial is None or not AUTOFILL_STREAM:
+        return None
+    parser = PartialOfferParser()
+    lines: list[dict] = []
+    t0 = time.perf_counter()
+    state = {"seen": 0, "first": True}
+
+    def on_text(text: str):
+        snapshot = parser.feed(text)
+        if snapshot is None:
+            return
+        raw_lines = snapshot.pop("order_lines")
+        if len(raw_lines) < state["seen"]:
+            # Retry im Gateway: Antwort beginnt von vorn
+            lines.clear()
+            state["seen"] = 0
+        for raw in raw_lines[state["seen"]:]:
+            try:
+                lines.append(offer_line_from_extraction(ExtractedOrderLine.model_validate(raw)))
+            except ValidationError:
+                pass
+        state["seen"] = len(raw_lines)
+        if state["first"]:
+            # Wartezeit bis zum ersten Feld im Formular (inkl. Rate-Limit-Wartezeit)
+            if METRICS_ENABLED:
+                record(f"{stage}.first_field", (time.perf_counter() - t0) * 1000)
+            state["first"] = False
+        _partial_executor.submit(on_partial, {**snapshot, "lines": list(lines)})
+
+    return on_text
+
+
+# -----------------------------
+# Einzelschritte (async)
+# -----------------------------
+def split_offer(offer_text: str) -> list[str]:
+    with span("parse.chunk"):
+        chunks, _stats = split_for_extraction(offer_text)
+    return chunks
+
+
+async def extract_offer_async(offer_text: str, chunks: Optional[list[str]] = None,
+                              on_partial: Optional[Callable[[dict], None]] = None) -> ExtractedOffer:
+    """
+    Ohne Boilerplate; lange Angebote als Map-Reduce: Teile parallel extrahieren, dann zusammenführen.
+    on_partial: Teilergebnisse während der Antwort (nur bei einem Teil, siehe partial_text_handler).
+    """
+    model = get_backend().model
+    key = extraction_cache_key(offer_text, model)
+    # Cache = SQLite (Lock-Wartezeit bis busy_timeout) → im Thread, der AI-Loop bedient derweil andere Aufrufe
+    cached = await asyncio.to_thread(extraction_cache.get, key)
+    if cached is not None:
+        return ExtractedOffer.model_validate_json(cached)
+
+    chunks = chunks or split_offer(offer_text)
+    if len(chunks) == 1:
+        resp = await parse_structured("llm.extract", build_extraction_input(chunks[0]), ExtractedOffer,
+                                      partial_text_handler("llm.extract", on_partial))
+        extracted = resp.output_parsed
+    else:
+        parts = await asyncio.gather(*(extract_chunk_async(c, i, len(chunks)) for i, c in enumerate(chunks, start=1)))
+        extracted = ExtractedOffer.model_validate(merge_extractions([p.model_dump() for p in parts]))
+    await asyncio.to_thread(extraction_cache.put, key, model, EXTRACTION_PROMPT_VERSION, extracted.model_dump_json())
+    return extracted
+
+
+async def extract_chunk_async(chunk_text: str, part: int, parts: int) -> ExtractedOffer:
+    # Eigener Cache pro Teil: scheitert ein Teil, wiederholt der nächste Versuch nur diesen
+    messages = build_extraction_chunk_input(chunk_text, part, parts)
+    model = get_backend().model
+    key = extraction_cache_key(messages[-1]["content"], model, EXTRACTION_CHUNK_PROMPT_VERSION)
+    cached = await asyncio.to_thread(extraction_cache.get, key)
+    if cached is not None:
+        return ExtractedOffer.model_validate_json(cached)
+
+    resp = await parse_structured("llm.extract_chunk", messages, ExtractedOffer)
+    extracted = resp.output_parsed
+    await asyncio.to_thread(extraction_cache.put, key, model, EXTRACTION_CHUNK_PROMPT_VERSION,
+                            extracted.model_dump_json())
+    return extracted
+
+
+async def generate_title_async(vendor: str, lines: list[dict], department: str = "") -> str:
+    if not get_backend().available():
+        return title_fallback(vendor, lines)
+    resp = await parse_structured("llm.title", build_title_input(vendor, lines, department), TitleSuggestion)
+    return clean_title(resp.output_parsed)
+
+
+async def pick_commodity_group_async(title: str, vendor: str, lines: list[dict]) -> CommodityPick:
+    resp = await parse_structured("llm.commodity", build_commodity_input(title, vendor, lines), CommodityPick)
+    return validate_commodity_pick(resp.output_parsed)
+
+
+async def oneshot_async(offer_text: str, on_partial: Optional[Callable[[dict], None]] = None) -> OneShotAutoFill:
+    model = get_backend().model
+    key = extraction_cache_key(offer_text, model, ONESHOT_PROMPT_VERSION)
+    cached = await asyncio.to_thread(extraction_cache.get, key)
+    if cached is not None:
+        return OneShotAutoFill.model_validate_json(cached)
+
+    resp = await parse_structured("llm.oneshot", build_oneshot_input(offer_text), OneShotAutoFill,
+                                  partial_text_handler("llm.oneshot", on_partial))
+    combined = resp.output_parsed
+    await asyncio.to_thread(extraction_cache.put, key, model, ONESHOT_PROMPT_VERSION, combined.model_dump_json())
+    return combined
+
+
+# -----------------------------
+# Auto-Fill: Extraktion → (Titel ∥ Commodity Group), optional alles in einem Aufruf
+# -----------------------------
+class AutoFillResult(BaseModel):
+    extracted: ExtractedOffer
+    lines: list[dict]
+    title: str
+    pick: Optional[CommodityPick] = None
+    pick_source: Optional[str] = None
+    pick_error: Optional[str] = None
+    mode: str = "multi"
+    fallback_error: Optional[str] = None
+
+
+def heuristic_commodity_pick(title: str, vendor: str, lines: list[dict]) -> CommodityPick:
+    # KI nicht erreichbar → Schlagwort-Heuristik wie beim Fallback im Formular
+    cg_id, cg_name = simple_commodity_group_guess(title, vendor, lines)
+    return CommodityPick(commodity_group_id=cg_id, commodity_group_name=cg_name, confidence=0.0,
+                         reasoning_short="KI nicht erreichbar – Schlagwort-Heuristik.")
+
+
+async def autofill_oneshot_async(redacted_text: str, title: str = "",
+                                 on_partial: Optional[Callable[[dict], None]] = None) -> AutoFillResult:
+    combined = await oneshot_async(redacted_text, on_partial)
+    extracted = combined.offer
+    lines = offer_lines_from_extraction(extracted)
+    vendor = extracted.vendor_name or ""
+    new_title = title.strip() or clean_title(combined.title)
+
+    # Wie im Mehrschritt-Pfad: ein sicherer lokaler Treffer geht vor
+    pick, pick_source, pick_error = local_commodity_pick(title.strip(), vendor, lines), "Lokal", None
+    if pick is None:
+        try:
+            pick, pick_source = validate_commodity_pick(combined.commodity), "KI"
+        except RuntimeError:
+            # ID nicht in COMMODITY_GROUPS → nur die Commodity Group gezielt nachfragen
+            try:
+                pick, pick_source = await pick_commodity_group_async(new_title, vendor, lines), "KI"
+            except Exception as e:
+                pick, pick_source, pick_error = None, None, str(e)
+
+    return AutoFillResult(extracted=extracted, lines=lines, title=new_title, pick=pick,
+                          pick_source=pick_source, pick_error=pick_error, mode="oneshot")
+
+
+async def autofill_async(redacted_text: str, title: str = "", mode: Optional[str] = None,
+                         on_partial: Optional[Callable[[dict], None]] = None) -> AutoFillResult:
+    if LOCAL_PARSER_ENABLED:
+        with span("parse.offer_local"):
+            offer, _problems = parse_offer_locally(redacted_text)
+        if offer is not None:
+            # Beträge sind gegengeprüft → keine KI-Extraktion nötig, nur noch Titel/Commodity Group
+            result = await complete_autofill_async(ExtractedOffer.model_validate(offer), title,
+                                                   use_ai=get_backend().available())
+            result.mode = "local"
+            return result
+
+    fallback_error, chunks = None, None
+    if len(redacted_text) > EXTRACT_CHUNK_CHARS:
+        chunks = split_offer(redacted_text)
+    # Zu lang für einen Aufruf → gleich der Mehrschritt-Pfad mit Teil-Extraktion
+    if (mode or AUTOFILL_MODE) == "oneshot" and (chunks is None or len(chunks) == 1):
+        try:
+            return await autofill_oneshot_async(chunks[0] if chunks else redacted_text, title, on_partial)
+        except Exception as e:
+            # z.B. Schema vom Modell nicht erfüllt → bewährter Mehrschritt-Pfad
+            fallback_error = f"{type(e).__name__}: {e}"
+
+    result = await autofill_multi_async(redacted_text, title, chunks, on_partial)
+    result.fallback_error = fallback_error
+    return result
+
+
+async def autofill_multi_async(redacted_text: str, title: str = "", chunks: Optional[list[str]] = None,
+                               on_partial: Optional[Callable[[dict], None]] = None) -> AutoFillResult:
+    return await complete_autofill_async(await extract_offer_async(redacted_text, chunks, on_partial), title)
+
+
+async def complete_autofill_async(extracted: ExtractedOffer, title: str = "", use_ai: bool = True) -> AutoFillResult:
+    lines = offer_lines_from_extraction(extracted)
+    vendor = extracted.vendor_name or ""
+    department = extracted.department or ""
+
+    async def title_step() -> str:
+        if title.strip():
+            return title.strip()
+        if not use_ai:
+            return title_fallback(vendor, lines)
+        try:
+            return await generate_title_async(vendor, lines, department)
+        except AIUnavailableError:
+            return title_fallback(vendor, lines)
+
+    async def pick_step():
+        # Läuft parallel zur Titel-Generierung; nutzt den Titel nur, wenn der User schon einen hat.
+        # Lokaler Klassifikator zuerst, die KI nur bei niedriger Konfidenz.
+        # Fehler hier sind kein Abbruchgrund → UI nimmt dann die Fallback-Heuristik.
+        local = local_commodity_pick(title.strip(), vendor, lines)
+        if local is not None:
+            return local, "Lokal", None
+        if not use_ai:
+            return None, None, get_backend().unavailable_reason()
+        try:
+            return await pick_commodity_group_async(title.strip(), vendor, lines), "KI", None
+        except AIUnavailableError as e:
+            return heuristic_commodity_pick(title.strip(), vendor, lines), "Fallback", str(e)
+        except Exception as e:
+            return None, None, str(e)
+
+    new_title, (pick, pick_source, pick_error) = await asyncio.gather(title_step(), pick_step())
+    return AutoFillResult(extracted=extracted, lines=lines, title=new_title,
+                          pick=pick, pick_source=pick_source, pick_error=pick_error)
+
+
+def autofill(redacted_text: str, title: str = "", mode: Optional[str] = None,
+             on_partial: Optional[Callable[[dict], None]] = None) -> AutoFillResult:
+    return run_ai(autofill_async(redacted_text, title, mode, on_partial))
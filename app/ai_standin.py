@@ -0,0 +1,371 @@
+"""
+Lokaler Stand-in für die KI: deterministische Antworten für ExtractedOffer,
+TitleSuggestion, CommodityPick und OneShotAutoFill – für Last- und Durchsatztests
+ohne Netzwerk, ohne API-Key und ohne Kosten.
+
+Die Antworten hängen nur vom Prompt ab:
+- Extraktion:       Tabellen-/Summen-Erkennung aus offer_parser (auch wenn die Beträge
+                    nicht aufgehen; Zeilen mit Betrag gelten dann als Position à 1 Stk),
+- Titel:            title_fallback aus Vendor + erster Position,
+- Commodity Group:  Schlagwort-Heuristik (simple_commodity_group_guess).
+
+Latenz (STANDIN_LATENCY_MS ± STANDIN_JITTER_MS, optional plus Zeit pro Token wie beim
+Generieren: STANDIN_MS_PER_OUTPUT_TOKEN, STANDIN_MS_PER_1K_INPUT_TOKENS) und Fehlerquote
+(STANDIN_ERROR_RATE, je zur Hälfte 429 und 503) sind einstellbar; der Zufall ist geseedet (STANDIN_SEED),
+Läufe sind also reproduzierbar.
+
+Gestreamt (stream() bzw. "stream": true per HTTP als Server-Sent Events) kommt die Antwort in
+Stücken von DELTA_CHARS Zeichen: erst nach Latenz + Eingabe-Tokens, dann im Takt der Ausgabe-Tokens.
+
+Zwei Wege:
+- im Prozess:  AI_BACKEND=standin (ai_backends.get_backend → StandInBackend)
+- per HTTP:    python app/ai_standin.py --port 8000 [--latency-ms 300] [--error-rate 0.05]
+               spricht die Responses API (POST /v1/responses) → OPENAI_BASE_URL=http://127.0.0.1:8000/v1
+               bzw. --base-url bei batch_ingest.py/bench_oneshot.py; der Client braucht einen
+               beliebigen OPENAI_API_KEY.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from typing import Iterator, Optional
+
+from ai_backends import AIBackend
+from intake import normalize_offer_text, simple_commodity_group_guess, title_fallback
+from offer_parser import (
+    MONEY,
+    check_amounts,
+    find_currency,
+    find_vat_id,
+    find_vendor,
+    match_total,
+    parse_offer_locally,
+    parse_table,
+)
+
+STANDIN_LATENCY_MS = float(os.getenv("STANDIN_LATENCY_MS", "0"))
+STANDIN_JITTER_MS = float(os.getenv("STANDIN_JITTER_MS", "0"))
+STANDIN_ERROR_RATE = float(os.getenv("STANDIN_ERROR_RATE", "0"))
+STANDIN_MS_PER_OUTPUT_TOKEN = float(os.getenv("STANDIN_MS_PER_OUTPUT_TOKEN", "0"))
+STANDIN_MS_PER_1K_INPUT_TOKENS = float(os.getenv("STANDIN_MS_PER_1K_INPUT_TOKENS", "0"))
+STANDIN_SEED = int(os.getenv("STANDIN_SEED", "42"))
+STANDIN_MODEL = "standin"
+ERROR_STATUSES = (429, 503)
+# ≈ 4 Tokens pro Delta-Event
+DELTA_CHARS = 16
+
+_money_at_end = re.compile(rf"^(?P<desc>.*?[A-Za-zÄÖÜäöüß].*?)\s+(?P<amount>{MONEY})\s*(?:€|EUR|USD|\$|GBP|£)?\s*$")
+_field = re.compile(r"^(?P<key>[A-Za-z_]+):[ \t]*(?P<value>.*)$", re.M)
+_order_line = re.compile(r"^- (?P<desc>.*?) \(unit_price=", re.M)
+
+
+class StandInError(Exception):
+    """Simulierter API-Fehler; status_code wie bei openai.APIStatusError → der Gateway wiederholt 429/5xx."""
+
+    def __init__(self, status_code: int, message: str = ""):
+        super().__init__(message or f"Stand-in: HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers={})
+
+
+# -----------------------------
+# Antworten (nur vom Prompt abhängig)
+# -----------------------------
+def _amount(s: str) -> float:
+    return float(s.replace(".", "").replace(",", "."))
+
+
+def extract_offer(text: str) -> dict:
+    offer, _problems = parse_offer_locally(text)
+    if offer is not None:
+        return offer
+
+    lines = normalize_offer_text(text).splitlines()
+    rows, totals, _problems = parse_table(lines)
+    if not rows:
+        # Kein Tabellenkopf: jede Zeile mit Text + Betrag am Ende ist eine Position
+        for line in lines:
+            m = _money_at_end.match(line.strip())
+            if m and match_total(line) is None:
+                price = abs(_amount(m.group("amount")))
+                rows.append({"description": m.group("desc").strip()[:120], "unit_price": price,
+                             "quantity": 1.0, "unit": "Stk", "line_total": price})
+    amounts, _problems = check_amounts(rows, totals)
+    return {
+        "vendor_name": find_vendor(lines),
+        "vendor_vat_id": find_vat_id(text),
+        "department": None,
+        # Rabattzeilen (negativ) passen nicht ins Schema (ge=0) → weglassen
+        "order_lines": [{k: r[k] for k in ("description", "unit_price", "quantity", "unit")}
+                        for r in rows if r["unit_price"] >= 0 and r["quantity"] >= 0],
+        **amounts,
+        "currency": find_currency(text),
+    }
+
+
+def suggest_title(vendor: str, descriptions: list[str]) -> dict:
+    return {"title": title_fallback(vendor, [{"description": d} for d in descriptions[:1]])}
+
+
+def pick_commodity(title: str, vendor: str, descriptions: list[str]) -> dict:
+    cg_id, cg_name = simple_commodity_group_guess(title, vendor, [{"description": d} for d in descriptions])
+    return {"commodity_group_id": cg_id, "commodity_group_name": cg_name, "confidence": 0.6,
+            "reasoning_short": "Stand-in: Schlagwort-Heuristik."}
+
+
+def _fields(prompt: str) -> dict[str, str]:
+    return {m.group("key").lower(): m.group("value").strip() for m in _field.finditer(prompt)}
+
+
+def respond(schema: str, messages: list[dict]) -> dict:
+    """Antwort-JSON für das Schema `schema` (Klassenname) auf die Nachrichten im Format der Builder in intake."""
+    prompt = messages[-1]["content"] if messages else ""
+    if schema == "ExtractedOffer":
+        return extract_offer(prompt)
+    if schema == "TitleSuggestion":
+        fields = _fields(prompt)
+        items = [i.strip() for i in fields.get("items", "").split(";") if i.strip()]
+        return suggest_title(fields.get("vendor", ""), items)
+    if schema == "CommodityPick":
+        fields = _fields(prompt)
+        return pick_commodity(fields.get("title", ""), fields.get("vendor", ""), _order_line.findall(prompt))
+    if schema == "OneShotAutoFill":
+        offer = extract_offer(prompt)
+        vendor = offer["vendor_name"] or ""
+        descriptions = [ol["description"] for ol in offer["order_lines"]]
+        title = suggest_title(vendor, descriptions)
+        return {"offer": offer, "title": title, "commodity": pick_commodity(title["title"], vendor, descriptions)}
+    raise StandInError(400, f"Stand-in kennt das Schema '{schema}' nicht.")
+
+
+def usage_for(messages: list[dict], payload_json: str) -> dict:
+    # ≈ 4 Zeichen pro Token, wie die Schätzung in ai_service
+    tokens_in = sum(len(m.get("content") or "") for m in messages) // 4
+    tokens_out = len(payload_json) // 4
+    return {"input_tokens": tokens_in, "output_tokens": tokens_out, "total_tokens": tokens_in + tokens_out}
+
+
+class StandIn:
+    """Latenz + Fehler würfeln (geseedet, thread-sicher) und antworten."""
+
+    def __init__(self, latency_ms: float = STANDIN_LATENCY_MS, jitter_ms: float = STANDIN_JITTER_MS,
+                 error_rate: float = STANDIN_ERROR_RATE, seed: int = STANDIN_SEED,
+                 ms_per_output_token: float = STANDIN_MS_PER_OUTPUT_TOKEN,
+                 ms_per_1k_input_tokens: float = STANDIN_MS_PER_1K_INPUT_TOKENS):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.ms_per_output_token = ms_per_output_token
+        self.ms_per_1k_input_tokens = ms_per_1k_input_tokens
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "errors": 0}
+
+    def draw(self) -> tuple[float, Optional[int]]:
+        """(Verzögerung in s, HTTP-Status des simulierten Fehlers oder None)."""
+        with self._lock:
+            self.counters["calls"] += 1
+            delay_ms = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms))
+            status = None
+            if self._rng.random() < self.error_rate:
+                status = self._rng.choice(ERROR_STATUSES)
+                self.counters["errors"] += 1
+        return delay_ms / 1000, status
+
+    def answer(self, schema: str, messages: list[dict]) -> tuple[str, dict]:
+        payload_json = json.dumps(respond(schema, messages), ensure_ascii=False)
+        return payload_json, usage_for(messages, payload_json)
+
+    def prefill_s(self, usage: dict) -> float:
+        # Bis zum ersten Token: der Prompt muss gelesen werden
+        return usage["input_tokens"] * self.ms_per_1k_input_tokens / 1_000_000
+
+    def generation_s(self, usage: dict) -> float:
+        # Lange Prompts und lange Antworten dauern länger – wie bei einem echten Modell
+        return self.prefill_s(usage) + usage["output_tokens"] * self.ms_per_output_token / 1000
+
+    def deltas(self, payload_json: str) -> Iterator[tuple[str, float]]:
+        """(Textstück, Zeitpunkt in s ab dem ersten Token) – wie die output_text.delta-Events eines Modells."""
+        for end in range(DELTA_CHARS, len(payload_json) + DELTA_CHARS, DELTA_CHARS):
+            piece = payload_json[end - DELTA_CHARS:end]
+            yield piece, min(end, len(payload_json)) / 4 * self.ms_per_output_token / 1000
+
+
+# -----------------------------
+# Im Prozess: AI_BACKEND=standin
+# -----------------------------
+class StandInBackend(AIBackend):
+    name = "standin"
+    model = STANDIN_MODEL
+
+    def __init__(self, standin: Optional[StandIn] = None):
+        self.standin = standin or StandIn()
+
+    async def parse(self, messages: list[dict], text_format):
+        delay_s, status = self.standin.draw()
+        if status is not None:
+            await asyncio.sleep(delay_s)
+            raise StandInError(status)
+        payload_json, usage = self.standin.answer(text_format.__name__, messages)
+        delay_s += self.standin.generation_s(usage)
+        if delay_s:
+            await asyncio.sleep(delay_s)
+        return SimpleNamespace(output_parsed=text_format.model_validate_json(payload_json),
+                               usage=SimpleNamespace(**usage))
+
+    async def stream(self, messages: list[dict], text_format, on_text):
+        delay_s, status = self.standin.draw()
+        if status is not None:
+            await asyncio.sleep(delay_s)
+            raise StandInError(status)
+        payload_json, usage = self.standin.answer(text_format.__name__, messages)
+        loop = asyncio.get_running_loop()
+        # Gegen feste Zeitpunkte schlafen, sonst summieren sich die Ungenauigkeiten von sleep()
+        first_token = loop.time() + delay_s + self.standin.prefill_s(usage)
+        text = ""
+        for piece, at_s in self.standin.deltas(payload_json):
+            await asyncio.sleep(max(0.0, first_token + at_s - loop.time()))
+            text += piece
+            on_text(text)
+        return SimpleNamespace(output_parsed=text_format.model_validate_json(payload_json),
+                               usage=SimpleNamespace(**usage))
+
+
+# -----------------------------
+# Per HTTP: Responses API auf localhost
+# -----------------------------
+def output_text_part(text: str) -> dict:
+    return {"type": "output_text", "text": text, "annotations": []}
+
+
+def message_item(payload_json: str, status: str = "completed") -> dict:
+    content = [output_text_part(payload_json)] if status == "completed" else []
+    return {"type": "message", "id": "msg_standin", "role": "assistant", "status": status, "content": content}
+
+
+def response_body(model: str, payload_json: str, usage: Optional[dict]) -> dict:
+    # usage None = Antwort läuft noch (erstes Event beim Streaming)
+    return {
+        "id": "resp_standin", "object": "response", "created_at": int(time.time()), "model": model,
+        "status": "completed" if usage else "in_progress", "parallel_tool_calls": False, "tool_choice": "auto",
+        "tools": [], "output": [message_item(payload_json)] if usage else [],
+        "usage": {**usage, "input_tokens_details": {"cached_tokens": 0},
+                  "output_tokens_details": {"reasoning_tokens": 0}} if usage else None,
+    }
+
+
+def stream_events(standin: StandIn, model: str, payload_json: str, usage: dict) -> Iterator[tuple[float, dict]]:
+    """(Zeitpunkt in s ab dem ersten Token, Event) in der Reihenfolge der Responses API."""
+    text_ref = {"item_id": "msg_standin", "output_index": 0, "content_index": 0}
+    yield 0.0, {"type": "response.created", "response": response_body(model, payload_json, None)}
+    yield 0.0, {"type": "response.output_item.added", "output_index": 0,
+                "item": message_item(payload_json, "in_progress")}
+    yield 0.0, {"type": "response.content_part.added", **text_ref, "part": output_text_part("")}
+    at_s = 0.0
+    for piece, at_s in standin.deltas(payload_json):
+        yield at_s, {"type": "response.output_text.delta", **text_ref, "delta": piece, "logprobs": []}
+    yield at_s, {"type": "response.output_text.done", **text_ref, "text": payload_json, "logprobs": []}
+    yield at_s, {"type": "response.content_part.done", **text_ref, "part": output_text_part(payload_json)}
+    yield at_s, {"type": "response.output_item.done", "output_index": 0, "item": message_item(payload_json)}
+    yield at_s, {"type": "response.completed", "response": response_body(model, payload_json, usage)}
+
+
+def make_server(standin: StandIn, port: int = 8000, host: str = "127.0.0.1"):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, body: dict):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, model: str, payload_json: str, usage: dict, first_token: float):
+            # Server-Sent Events; HTTP/1.0 → Ende des Streams = Verbindung zu
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            sequence = itertools.count()
+            for at_s, event in stream_events(standin, model, payload_json, usage):
+                time.sleep(max(0.0, first_token + at_s - time.monotonic()))
+                event["sequence_number"] = next(sequence)
+                self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                                 .encode("utf-8"))
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/responses"):
+                self._send_json(404, {"error": {"message": f"Stand-in: {self.path} gibt es nicht.", "type": "not_found"}})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            schema = ((body.get("text") or {}).get("format") or {}).get("name", "")
+            messages = body.get("input") or []
+            if isinstance(messages, str):
+                messages = [{"role": "user", "content": messages}]
+
+            delay_s, status = standin.draw()
+            if status is not None:
+                time.sleep(delay_s)
+                self._send_json(status, {"error": {"message": f"Stand-in: simulierter Fehler {status}.",
+                                                   "type": "standin_error", "code": str(status)}})
+                return
+            try:
+                payload_json, usage = standin.answer(schema, messages)
+            except StandInError as e:
+                self._send_json(e.status_code, {"error": {"message": str(e), "type": "invalid_request_error"}})
+                return
+            model = body.get("model", STANDIN_MODEL)
+            if body.get("stream"):
+                self._send_stream(model, payload_json, usage, time.monotonic() + delay_s + standin.prefill_s(usage))
+                return
+            time.sleep(delay_s + standin.generation_s(usage))
+            self._send_json(200, response_body(model, payload_json, usage))
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), StandInHandler)
+
+
+def start_server(standin: Optional[StandIn] = None, port: int = 0):
+    """Server im Hintergrund-Thread (port 0 = freier Port); Rückgabe: Server, Basis-URL für OPENAI_BASE_URL."""
+    server = make_server(standin or StandIn(), port)
+    threading.Thread(target=server.serve_forever, name="ai-standin", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Lokaler KI-Stand-in (Responses API) für Lasttests ohne OpenAI.")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--latency-ms", type=float, default=STANDIN_LATENCY_MS)
+    ap.add_argument("--jitter-ms", type=float, default=STANDIN_JITTER_MS)
+    ap.add_argument("--error-rate", type=float, default=STANDIN_ERROR_RATE, help="Anteil 429/503-Antworten (0–1)")
+    ap.add_argument("--seed", type=int, default=STANDIN_SEED)
+    ap.add_argument("--ms-per-output-token", type=float, default=STANDIN_MS_PER_OUTPUT_TOKEN)
+    ap.add_argument("--ms-per-1k-input-tokens", type=float, default=STANDIN_MS_PER_1K_INPUT_TOKENS)
+    args = ap.parse_args()
+
+    standin = StandIn(args.latency_ms, args.jitter_ms, args.error_rate, args.seed,
+                      args.ms_per_output_token, args.ms_per_1k_input_tokens)
+    server = make_server(standin, args.port, args.host)
+    print(f"KI-Stand-in auf http://{args.host}:{args.port}/v1 (Latenz {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, "
+          f"Fehlerquote {args.error_rate:.0%}) – Strg+C beendet")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"{standin.counters['calls']} Aufrufe, davon {standin.counters['errors']} simulierte Fehler")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,623 +1,39 @@
-import os
-import re
-import sqlite3
-from datetime import datetime
-from typing import List, Optional
+import json
+from datetime import datetime, timedelta
+from typing import Optional
 
 import streamlit as st
-from openai import OpenAI
-from pydantic import BaseModel, Field
 
-# Datei-Parsing
-from pypdf import PdfReader
-from docx import Document
-
-DB_PATH = "procurement.db"
-
-
-# -----------------------------
-# Commodity Groups (aus deiner Tabelle)
-# -----------------------------
-COMMODITY_GROUPS = [
-    {"id": "001", "category": "General Services", "group": "Accommodation Rentals"},
-    {"id": "002", "category": "General Services", "group": "Membership Fees"},
-    {"id": "003", "category": "General Services", "group": "Workplace Safety"},
-    {"id": "004", "category": "General Services", "group": "Consulting"},
-    {"id": "005", "category": "General Services", "group": "Financial Services"},
-    {"id": "006", "category": "General Services", "group": "Fleet Management"},
-    {"id": "007", "category": "General Services", "group": "Recruitment Services"},
-    {"id": "008", "category": "General Services", "group": "Professional Development"},
-    {"id": "009", "category": "General Services", "group": "Miscellaneous Services"},
-    {"id": "010", "category": "General Services", "group": "Insurance"},
-    {"id": "011", "category": "Facility Management", "group": "Electrical Engineering"},
-    {"id": "012", "category": "Facility Management", "group": "Facility Management Services"},
-    {"id": "013", "category": "Facility Management", "group": "Security"},
-    {"id": "014", "category": "Facility Management", "group": "Renovations"},
-    {"id": "015", "category": "Facility Management", "group": "Office Equipment"},
-    {"id": "016", "category": "Facility Management", "group": "Energy Management"},
-    {"id": "017", "category": "Facility Management", "group": "Maintenance"},
-    {"id": "018", "category": "Facility Management", "group": "Cafeteria and Kitchenettes"},
-    {"id": "019", "category": "Facility Management", "group": "Cleaning"},
-    {"id": "020", "category": "Publishing Production", "group": "Audio and Visual Production"},
-    {"id": "021", "category": "Publishing Production", "group": "Books/Videos/CDs"},
-    {"id": "022", "category": "Publishing Production", "group": "Printing Costs"},
-    {"id": "023", "category": "Publishing Production", "group": "Software Development for Publishing"},
-    {"id": "024", "category": "Publishing Production", "group": "Material Costs"},
-    {"id": "025", "category": "Publishing Production", "group": "Shipping for Production"},
-    {"id": "026", "category": "Publishing Production", "group": "Digital Product Development"},
-    {"id": "027", "category": "Publishing Production", "group": "Pre-production"},
-    {"id": "028", "category": "Publishing Production", "group": "Post-production Costs"},
-    {"id": "029", "category": "Information Technology", "group": "Hardware"},
-    {"id": "030", "category": "Information Technology", "group": "IT Services"},
-    {"id": "031", "category": "Information Technology", "group": "Software"},
-    {"id": "032", "category": "Logistics", "group": "Courier, Express, and Postal Services"},
-    {"id": "033", "category": "Logistics", "group": "Warehousing and Material Handling"},
-    {"id": "034", "category": "Transportation Logistics", "group": "Transportation Logistics"},
-    {"id": "035", "category": "Logistics", "group": "Delivery Services"},
-    {"id": "036", "category": "Marketing & Advertising", "group": "Advertising"},
-    {"id": "037", "category": "Marketing & Advertising", "group": "Outdoor Advertising"},
-    {"id": "038", "category": "Marketing & Advertising", "group": "Marketing Agencies"},
-    {"id": "039", "category": "Marketing & Advertising", "group": "Direct Mail"},
-    {"id": "040", "category": "Marketing & Advertising", "group": "Customer Communication"},
-    {"id": "041", "category": "Marketing & Advertising", "group": "Online Marketing"},
-    {"id": "042", "category": "Marketing & Advertising", "group": "Events"},
-    {"id": "043", "category": "Marketing & Advertising", "group": "Promotional Materials"},
-    {"id": "044", "category": "Production", "group": "Warehouse and Operational Equipment"},
-    {"id": "045", "category": "Production", "group": "Production Machinery"},
-    {"id": "046", "category": "Production", "group": "Spare Parts"},
-    {"id": "047", "category": "Production", "group": "Internal Transportation"},
-    {"id": "048", "category": "Production", "group": "Production Materials"},
-    {"id": "049", "category": "Production", "group": "Consumables"},
-    {"id": "050", "category": "Production", "group": "Maintenance and Repairs"},
-]
-
-COMMODITY_TEXT = "\n".join([f'{c["id"]} | {c["category"]} | {c["group"]}' for c in COMMODITY_GROUPS])
-
-
-# -----------------------------
-# Utility: API Key säubern
-# -----------------------------
-def get_clean_openai_key() -> str:
-    raw = os.getenv("OPENAI_API_KEY", "")
-    if not raw:
-        return ""
-    k = raw.strip()
-    k = k.strip('"').strip("'")
-    k = k.strip("“").strip("”")
-    k = k.strip('"').strip("“").strip("”").strip()
-    return k
-
-
-# -----------------------------
-# DSGVO: Redaction (personenbezogene Daten maskieren)
-# -----------------------------
-def redact_personal_data(text: str) -> str:
-    """
-    Heuristische Maskierung typischer personenbezogener Daten.
-    Ziel: Datenminimierung, bevor Text an OpenAI geht.
-    """
-    if not text:
-        return ""
-
-    t = text
-
-    # E-Mail
-    t = re.sub(r"\b[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}\b", "[EMAIL]", t, flags=re.IGNORECASE)
-
-    # Telefonnummer (grob)
-    t = re.sub(r"\b(\+?\d{1,3}[\s\-]?)?(\(?\d{2,5}\)?[\s\-]?)?\d{3,}[\s\-]?\d{2,}\b", "[PHONE]", t)
-
-    # IBAN (DE + allgemein grob)
-    t = re.sub(r"\b[A-Z]{2}\d{2}[A-Z0-9]{11,30}\b", "[IBAN]", t)
-
-    # BIC (8 oder 11 Zeichen)
-    t = re.sub(r"\b[A-Z]{4}[A-Z]{2}[A-Z0-9]{2}([A-Z0-9]{3})?\b", "[BIC]", t)
-
-    # Ansprechpartner / Contact Person (einfach)
-    t = re.sub(r"(?i)(ansprechpartner|kontakt|bearbeiter)\s*:\s*[^\n\r]{1,60}", r"\1: [PERSON]", t)
-
-    # Adresszeile (sehr grob, optional)
-    # t = re.sub(r"\b\d{5}\s+[A-Za-zÄÖÜäöüß\- ]{2,}\b", "[ADDRESS]", t)
-
-    return t
-
-
-# -----------------------------
-# Utility: Text/Nummern normalisieren
-# -----------------------------
-def normalize_offer_text(t: str) -> str:
-    t = t.replace("“", '"').replace("”", '"')
-    t = t.replace("\u00A0", " ")
-    return t
-
-def parse_de_number_to_float(val) -> Optional[float]:
-    if val is None:
-        return None
-    if isinstance(val, (int, float)):
-        return float(val)
-    s = str(val).strip()
-    if not s:
-        return None
-    s = s.replace("€", "").replace("EUR", "").replace("Euro", "").strip()
-    s = re.sub(r"\s+", "", s)
-    if "," in s:
-        s = s.replace(".", "")
-        s = s.replace(",", ".")
-    try:
-        return float(s)
-    except Exception:
-        return None
-
-
-# -----------------------------
-# Datei → Text (Upload)
-# -----------------------------
-def extract_text_from_uploaded_file(uploaded_file) -> str:
-    if uploaded_file is None:
-        return ""
-
-    name = uploaded_file.name.lower()
-    data = uploaded_file.getvalue()
-
-    # TXT
-    if name.endswith(".txt"):
-        try:
-            return data.decode("utf-8", errors="ignore")
-        except Exception:
-            return data.decode("latin-1", errors="ignore")
-
-    # DOCX
-    if name.endswith(".docx"):
-        import tempfile
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp:
-            tmp.write(data)
-            tmp_path = tmp.name
-        doc = Document(tmp_path)
-        text = "\n".join([p.text for p in doc.paragraphs if p.text])
-        return text
-
-    # PDF (nur Text-PDFs)
-    if name.endswith(".pdf"):
-        import io
-        reader = PdfReader(io.BytesIO(data))
-        pages_text = []
-        for p in reader.pages:
-            pages_text.append(p.extract_text() or "")
-        return "\n".join(pages_text)
-
-    return ""
-
-
-# -----------------------------
-# Extraktion: Angebot → strukturierte Daten
-# -----------------------------
-class ExtractedOrderLine(BaseModel):
-    description: str
-    unit_price: float = Field(..., ge=0)
-    quantity: float = Field(..., ge=0)
-    unit: Optional[str] = None
-
-class ExtractedOffer(BaseModel):
-    vendor_name: Optional[str] = None
-    vendor_vat_id: Optional[str] = None
-    department: Optional[str] = None
-
-    # Requestor Name kommt in Angeboten oft nicht vor → nicht extrahieren
-    # Title/Short Description generieren wir separat (siehe unten)
-
-    order_lines: List[ExtractedOrderLine] = []
-
-    positions_net: Optional[float] = None
-    shipping_net: Optional[float] = None
-    tax_amount: Optional[float] = None
-    total_gross: Optional[float] = None
-
-    currency: Optional[str] = "EUR"
-
-def extract_offer_with_openai(offer_text: str) -> ExtractedOffer:
-    api_key = get_clean_openai_key()
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY ist nicht gesetzt oder leer.")
-    client = OpenAI(api_key=api_key)
-
-    offer_text = normalize_offer_text(offer_text)
-
-    system_msg = (
-        "Du extrahierst Daten aus einem Lieferanten-Angebot/Rechnungstext (Copy/Paste) für einen Procurement Request.\n"
-        "Gib NUR Daten gemäß Schema zurück.\n\n"
-        "Sehr wichtig:\n"
-        "- Der Text ist oft aus PDF kopiert (Zeilenumbrüche). Bitte robust interpretieren.\n"
-        "- total_gross ist die Endsumme/Gesamtbetrag/Endsumme (inkl. Versand & Steuer), NICHT die Positionssumme.\n"
-        "- positions_net ist 'Positionen netto' (ohne Versand, ohne Steuer).\n"
-        "- shipping_net ist 'Versandkosten netto'.\n"
-        "- tax_amount ist die SUMME aller Steuerbeträge (z.B. USt auf Positionen + USt auf Versand).\n"
-        "- Zahlen bitte als reine Zahlen (ohne €). Dezimalkomma ist erlaubt.\n"
-        "- quantity darf Dezimal sein (z.B. 1,28).\n"
-        "- Wenn etwas nicht sicher erkennbar ist: None.\n"
-    )
-
-    resp = client.responses.parse(
-        model="gpt-4o-2024-08-06",
-        input=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": offer_text},
-        ],
-        text_format=ExtractedOffer,
-    )
-    return resp.output_parsed
-
-
-# -----------------------------
-# NEU: Title/Short Description generieren (weil im Angebot oft nicht vorhanden)
-# -----------------------------
-class TitleSuggestion(BaseModel):
-    title: str = Field(..., description="Kurzer Titel/Short Description, max. ca. 70 Zeichen")
-
-def generate_title_with_openai(vendor: str, lines: List[dict], department: str = "") -> str:
-    api_key = get_clean_openai_key()
-    if not api_key:
-        # Fallback ohne KI
-        first = (lines[0].get("description", "") if lines else "").strip()
-        base = first[:50] if first else vendor
-        return (base or "Procurement Request").strip()
-
-    client = OpenAI(api_key=api_key)
-
-    # Nur wenig Kontext senden (Datenminimierung)
-    short_lines = []
-    for l in (lines or [])[:5]:
-        short_lines.append(str(l.get("description", "")).strip()[:80])
-    lines_text = "; ".join([x for x in short_lines if x])
-
-    user_msg = (
-        "Erstelle einen kurzen Titel für einen Procurement Request.\n"
-        "Regeln: kurz, verständlich, keine personenbezogenen Daten.\n"
-        f"Vendor: {vendor}\n"
-        f"Department: {department}\n"
-        f"Items: {lines_text}\n"
-    )
-
-    resp = client.responses.parse(
-        model="gpt-4o-2024-08-06",
-        input=[{"role": "user", "content": user_msg}],
-        text_format=TitleSuggestion,
-    )
-    t = (resp.output_parsed.title or "").strip()
-    # Safety: begrenzen
-    return t[:80] if t else "Procurement Request"
-
-
-# -----------------------------
-# Commodity Group Auswahl (Ausschlusslogik + Zweck)
-# -----------------------------
-class CommodityPick(BaseModel):
-    commodity_group_id: str
-    commodity_group_name: str
-    confidence: float = Field(..., ge=0.0, le=1.0)
-    reasoning_short: str
-
-def pick_commodity_group_with_openai(title: str, vendor: str, lines: list[dict]) -> CommodityPick:
-    api_key = get_clean_openai_key()
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY ist nicht gesetzt oder leer.")
-    client = OpenAI(api_key=api_key)
-
-    lines_text = "\n".join(
-        [f'- {l.get("description","")} (unit_price={l.get("unit_price")}, qty={l.get("quantity")}, unit={l.get("unit")})'
-         for l in lines]
-    ) if lines else "- (keine)"
-
-    user_context = (
-        f"TITLE: {title}\n"
-        f"VENDOR: {vendor}\n"
-        f"ORDER_LINES:\n{lines_text}\n\n"
-        "Wähle die passendste Commodity Group aus der Liste. Entscheide nach dem ZWECK.\n"
-    )
-
-    system_msg = (
-        "Du bist Procurement-Experte und klassifizierst Requests in Commodity Groups.\n\n"
-        "Regeln:\n"
-        "1) Du DARFST NUR eine Commodity Group aus der Liste wählen.\n"
-        "2) '019 – Facility Management – Cleaning' NUR wählen bei echter Reinigungsdienstleistung oder Reinigungs-Verbrauchsmaterial.\n"
-        "   NICHT wählen bei: Begrünung, Mooswand, Interior-Elemente, Dekoration, Branding, Schilder, Acryl-Logo-Platten.\n"
-        "3) Interior / Büro-Ausstattung / feste Elemente: häufig '015 – Office Equipment'.\n"
-        "4) Logo/Branding/Promo-Material: häufig '043 – Promotional Materials'.\n"
-        "5) reasoning_short: 1 Satz.\n\n"
-        "LISTE:\n"
-        f"{COMMODITY_TEXT}"
-    )
-
-    resp = client.responses.parse(
-        model="gpt-4o-2024-08-06",
-        input=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_context},
-        ],
-        text_format=CommodityPick,
-    )
-    pick = resp.output_parsed
-
-    valid_ids = {c["id"] for c in COMMODITY_GROUPS}
-    if pick.commodity_group_id not in valid_ids:
-        raise RuntimeError("KI hat eine ungültige Commodity Group ID geliefert (nicht in der Liste).")
-    return pick
-
-def simple_commodity_group_guess(title: str, vendor: str, lines: list[dict]) -> tuple[str, str]:
-    text = (title + " " + vendor + " " + " ".join([l.get("description", "") for l in lines])).lower()
-    if any(k in text for k in ["logo", "acryl", "schild", "wand", "moos", "begrünung", "deko", "decor"]):
-        return ("015", "Facility Management – Office Equipment")
-    if any(k in text for k in ["license", "licence", "subscription", "adobe", "software"]):
-        return ("031", "Information Technology – Software")
-    if any(k in text for k in ["laptop", "notebook", "server", "hardware"]):
-        return ("029", "Information Technology – Hardware")
-    if any(k in text for k in ["consulting", "berater", "beratung"]):
-        return ("004", "General Services – Consulting")
-    return ("009", "General Services – Miscellaneous Services")
-
-
-# -----------------------------
-# SQLite: Migration + CRUD
-# -----------------------------
-def get_conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
-
-def ensure_column(conn: sqlite3.Connection, table: str, col: str, coltype: str):
-    cur = conn.cursor()
-    cur.execute(f"PRAGMA table_info({table})")
-    cols = [r[1] for r in cur.fetchall()]
-    if col not in cols:
-        cur.execute(f"ALTER TABLE {table} ADD COLUMN {col} {coltype}")
-        conn.commit()
-
-def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS requests (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        requestor_name TEXT NOT NULL,
-        department TEXT NOT NULL,
-        title TEXT NOT NULL,
-        vendor_name TEXT NOT NULL,
-        vendor_vat_id TEXT NOT NULL,
-        commodity_group_id TEXT,
-        commodity_group_name TEXT,
-        total_cost REAL NOT NULL,
-        currency TEXT NOT NULL,
-        submit_status TEXT NOT NULL,
-        process_status TEXT NOT NULL,
-        created_at TEXT NOT NULL
-    )
-    """)
-
-    ensure_column(conn, "requests", "positions_net", "REAL")
-    ensure_column(conn, "requests", "shipping_net", "REAL")
-    ensure_column(conn, "requests", "tax_amount", "REAL")
-    ensure_column(conn, "requests", "total_is_gross", "TEXT")
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS order_lines (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        request_id INTEGER NOT NULL,
-        description TEXT NOT NULL,
-        unit_price REAL NOT NULL,
-        quantity REAL NOT NULL,
-        unit TEXT,
-        line_total REAL NOT NULL,
-        FOREIGN KEY(request_id) REFERENCES requests(id)
-    )
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS status_history (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        request_id INTEGER NOT NULL,
-        old_status TEXT,
-        new_status TEXT NOT NULL,
-        changed_at TEXT NOT NULL,
-        note TEXT,
-        FOREIGN KEY(request_id) REFERENCES requests(id)
-    )
-    """)
-
-    conn.commit()
-    conn.close()
-
-def insert_request(header: dict, lines: list[dict]) -> int:
-    conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute("""
-        INSERT INTO requests
-        (requestor_name, department, title, vendor_name, vendor_vat_id,
-         commodity_group_id, commodity_group_name,
-         total_cost, currency, submit_status, process_status, created_at,
-         positions_net, shipping_net, tax_amount, total_is_gross)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        header["requestor_name"],
-        header["department"],
-        header["title"],
-        header["vendor_name"],
-        header["vendor_vat_id"],
-        header.get("commodity_group_id"),
-        header.get("commodity_group_name"),
-        header["total_cost"],
-        header["currency"],
-        header["submit_status"],
-        header["process_status"],
-        header["created_at"],
-        header.get("positions_net"),
-        header.get("shipping_net"),
-        header.get("tax_amount"),
-        header.get("total_is_gross", "yes"),
-    ))
-
-    request_id = cur.lastrowid
-
-    for l in lines:
-        cur.execute("""
-            INSERT INTO order_lines
-            (request_id, description, unit_price, quantity, unit, line_total)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            request_id,
-            l["description"],
-            l["unit_price"],
-            l["quantity"],
-            l.get("unit", ""),
-            l["line_total"],
-        ))
-
-    cur.execute("""
-        INSERT INTO status_history (request_id, old_status, new_status, changed_at, note)
-        VALUES (?, ?, ?, ?, ?)
-    """, (
-        request_id,
-        None,
-        header["process_status"],
-        header["created_at"],
-        "Initial status",
-    ))
-
-    conn.commit()
-    conn.close()
-    return request_id
-
-def load_requests():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, title, vendor_name, total_cost, currency, submit_status, process_status, created_at,
-               commodity_group_id, commodity_group_name,
-               positions_net, shipping_net, tax_amount, total_is_gross
-        FROM requests
-        ORDER BY id DESC
-    """)
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def load_order_lines(request_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT description, unit_price, quantity, unit, line_total
-        FROM order_lines
-        WHERE request_id = ?
-        ORDER BY id ASC
-    """, (request_id,))
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def get_request_status(request_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT process_status FROM requests WHERE id = ?", (request_id,))
-    row = cur.fetchone()
-    conn.close()
-    return row[0] if row else None
-
-def update_request_status(request_id: int, new_status: str, note: str = ""):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT process_status FROM requests WHERE id = ?", (request_id,))
-    row = cur.fetchone()
-    old_status = row[0] if row else None
-
-    if old_status is None:
-        conn.close()
-        return False, None
-
-    if new_status == old_status:
-        conn.close()
-        return True, old_status
-
-    cur.execute("UPDATE requests SET process_status = ? WHERE id = ?", (new_status, request_id))
-
-    cur.execute("""
-        INSERT INTO status_history
-        (request_id, old_status, new_status, changed_at, note)
-        VALUES (?, ?, ?, ?, ?)
-    """, (
-        request_id,
-        old_status,
-        new_status,
-        datetime.now().isoformat(timespec="seconds"),
-        note.strip()
-    ))
-
-    conn.commit()
-    conn.close()
-    return True, old_status
-
-def load_status_history(request_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT old_status, new_status, changed_at, note
-        FROM status_history
-        WHERE request_id = ?
-        ORDER BY id ASC
-    """, (request_id,))
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-
-# -----------------------------
-# Lines: Summe berechnen
-# -----------------------------
-def calc_lines(lines: list[dict]) -> tuple[list[dict], float]:
-    cleaned = []
-    total_sum = 0.0
-    for l in lines:
-        desc = str(l.get("description", "")).strip()
-        unit_price = float(l.get("unit_price", 0) or 0)
-        qty = float(l.get("quantity", 0) or 0)
-        unit = str(l.get("unit", "")).strip()
-
-        line_total = round(unit_price * qty, 2)
-        total_sum += line_total
-        cleaned.append({
-            "description": desc,
-            "unit_price": unit_price,
-            "quantity": qty,
-            "unit": unit,
-            "line_total": line_total
-        })
-    return cleaned, round(total_sum, 2)
-
-
-def validate_for_submit(header: dict, lines: list[dict], lines_sum: float) -> list[str]:
-    errors = []
-    for f in ["requestor_name", "department", "title", "vendor_name", "vendor_vat_id"]:
-        if not header.get(f, "").strip():
-            errors.append(f"Pflichtfeld fehlt: {f}")
-
-    vat = header.get("vendor_vat_id", "").strip()
-    if len(vat) < 8:
-        errors.append("VAT ID wirkt zu kurz (bitte prüfen).")
-
-    if not lines:
-        errors.append("Mindestens eine Order Line ist nötig.")
-    for i, l in enumerate(lines, start=1):
-        if not str(l.get("description", "")).strip():
-            errors.append(f"Order Line {i}: Beschreibung fehlt.")
-        if float(l.get("unit_price", 0) or 0) <= 0:
-            errors.append(f"Order Line {i}: Unit Price muss > 0 sein.")
-        if float(l.get("quantity", 0) or 0) <= 0:
-            errors.append(f"Order Line {i}: Quantity muss > 0 sein.")
-
-    total = float(header.get("total_cost", 0) or 0)
-    if total <= 0:
-        errors.append("Total Cost muss > 0 sein.")
-    if total < round(lines_sum, 2):
-        errors.append("Total Cost ist kleiner als Summe der Positionen. Bitte prüfen (Versand/Steuer fehlen?).")
-
-    return errors
+from intake import (
+    COMMODITY_GROUPS,
+    parse_de_number_to_float,
+    pick_commodity_group,
+    simple_commodity_group_guess,
+    calc_lines,
+    validate_for_submit,
+)
+from autofill_jobs import JOB_UI_POLL_S, enqueue_file, enqueue_text, get_job, start_workers
+from document_text import DocumentTooLargeError
+import metrics
+from ai_backends import AI_BACKEND, ai_available
+from ai_gateway import gateway_stats
+from db import (
+    OVERVIEW_PAGE_SIZE,
+    SEARCH_RANK_MAX_HITS,
+    init_db,
+    insert_request,
+    load_requests_page,
+    count_requests,
+    page_cursor,
+    update_request_status,
+    update_request_statuses,
+    load_request_detail,
+    load_spend,
+    search_ranked,
+    search_requests,
+    count_search_hits,
+    find_vendor,
+)
 
 
 # -----------------------------
@@ -627,8 +43,14 @@ st.set_page_config(page_title="Procurement Request System", layout="wide")
 st.title("Procurement Request System (MVP)")
 
 init_db()
+# Auto-Fill-Worker laufen im Hintergrund (einmal pro Server-Prozess, AUTOFILL_WORKERS=0 → externer Worker)
+start_workers()
+# Prometheus-Scrape-Endpunkt nur mit METRICS_PORT
+metrics.start_http_server()
 
-tab_intake, tab_overview = st.tabs(["1) Intake (Neu)", "2) Overview (Procurement)"])
+tab_intake, tab_overview, tab_analytics, tab_admin = st.tabs(
+    ["1) Intake (Neu)", "2) Overview (Procurement)", "3) Analytics (Spend)", "4) Admin (Metriken)"]
+)
 
 defaults = {
     "requestor_name": "",
@@ -652,10 +74,127 @@ for k, v in defaults.items():
 
 st.session_state.setdefault("lines", [{"description": "", "unit_price": 0.0, "quantity": 1.0, "unit": "pcs"}])
 
+
+def fill_streamed_field(field: str, value, applied: dict):
+    # Nur leere oder noch vom vorigen Teilergebnis stammende Werte überschreiben – Eingaben während des Jobs bleiben
+    current = st.session_state.get(field)
+    if current in ("", None) or current == applied.get(field):
+        st.session_state[field] = value
+        applied[field] = value
+
+
+def merge_streamed_lines(streamed: list[dict], applied: dict):
+    """
+    Gestreamte Positionen in den Editor übernehmen, ohne dessen Inhalt zu ersetzen: neue Positionen
+    werden angehängt, vom Nutzer geänderte oder hinzugefügte Zeilen bleiben stehen. Beginnt die
+    Antwort neu (Retry) bzw. weicht das Endergebnis ab, werden nur unveränderte gestreamte Zeilen getauscht.
+    """
+    previous = applied.get("lines", [])
+    current = [l for l in st.session_state["lines"] if (l.get("description") or "").strip()]
+    if streamed[:len(previous)] == previous:
+        new_lines = streamed[len(previous):]
+    else:
+        current = [l for l in current if l not in previous]
+        new_lines = streamed
+    st.session_state["lines"] = current + new_lines
+    applied["lines"] = list(streamed)
+
+
+def apply_autofill_result(result, applied: Optional[dict] = None):
+    """applied: was Teilergebnisse dieses Jobs schon ins Formular geschrieben haben (None = nicht gestreamt)."""
+    extracted = result.extracted
+
+    for field in ("vendor_name", "vendor_vat_id", "department"):
+        value = getattr(extracted, field)
+        if value and applied is not None:
+            fill_streamed_field(field, value, applied)
+        elif value:
+            st.session_state[field] = value
+    if extracted.currency in ["EUR", "USD", "GBP"]:
+        st.session_state["currency"] = extracted.currency
+
+    st.session_state["positions_net"] = parse_de_number_to_float(extracted.positions_net)
+    st.session_state["shipping_net"] = parse_de_number_to_float(extracted.shipping_net)
+    st.session_state["tax_amount"] = parse_de_number_to_float(extracted.tax_amount)
+    st.session_state["total_gross"] = parse_de_number_to_float(extracted.total_gross)
+
+    if result.lines and applied is not None:
+        merge_streamed_lines(result.lines, applied)
+    elif result.lines:
+        st.session_state["lines"] = result.lines
+
+    if not st.session_state.get("title", "").strip():
+        st.session_state["title"] = result.title
+
+    if result.pick:
+        st.session_state["cg_id"] = result.pick.commodity_group_id
+        st.session_state["cg_name"] = result.pick.commodity_group_name
+        st.session_state["cg_conf"] = float(result.pick.confidence)
+        st.session_state["cg_reason"] = result.pick.reasoning_short
+        st.session_state["cg_source"] = result.pick_source
+
+
+def apply_autofill_partial(partial: dict, applied: dict):
+    # Gestreamtes Teilergebnis: nur was schon fertig ist; Summen, Titel und Commodity Group kommen mit dem Endergebnis
+    for field in ("vendor_name", "vendor_vat_id", "department"):
+        if partial.get(field):
+            fill_streamed_field(field, partial[field], applied)
+    if partial.get("lines"):
+        merge_streamed_lines(partial["lines"], applied)
+
+
+def start_autofill_job(job_id: int, label: str):
+    # Nur die Job-ID liegt in der Session → Reruns während der Extraktion verlieren nichts
+    st.session_state["autofill_job"] = {"id": job_id, "label": label}
+    st.session_state.pop("autofill_notice", None)
+
+
+@st.fragment(run_every=JOB_UI_POLL_S)
+def autofill_job_status():
+    # Pollt nur diesen Bereich; neues Teilergebnis oder fertig → ins Formular und einmal komplett neu rendern
+    pending = st.session_state.get("autofill_job")
+    if not pending:
+        return
+    job = get_job(pending["id"])
+    if job is None:
+        st.session_state.pop("autofill_job", None)
+        return
+    if job["status"] in ("queued", "running"):
+        partial = job["partial_json"]
+        if job["status"] == "running" and partial and partial != pending.get("partial"):
+            pending["partial"] = partial
+            apply_autofill_partial(json.loads(partial), pending.setdefault("applied", {}))
+            st.rerun()
+        attempt = f" · Versuch {job['attempts']}/{job['max_attempts']}" if job["attempts"] > 1 else ""
+        progress = ""
+        if partial:
+            n_lines = len(json.loads(partial).get("lines") or [])
+            progress = f" · Teilergebnis im Formular ({n_lines} Position(en))"
+        st.info(f"⏳ Auto-Fill {pending['label']} läuft im Hintergrund{attempt}{progress} – "
+                "du kannst das Formular währenddessen weiter ausfüllen.")
+        return
+
+    st.session_state.pop("autofill_job", None)
+    if job["status"] == "done":
+        from ai_service import AutoFillResult
+
+        result = AutoFillResult.model_validate_json(job["result_json"])
+        apply_autofill_result(result, pending.get("applied"))
+        how = " (lokal erkannt, ohne KI-Extraktion)" if result.mode == "local" else ""
+        st.session_state["autofill_notice"] = ("success", f"Auto-Fill {pending['label']} erfolgreich{how}. "
+                                                          "Formular wurde gefüllt.", None)
+    else:
+        st.session_state["autofill_notice"] = ("error", f"Auto-Fill {pending['label']} hat nicht geklappt.",
+                                               job["error"])
+    st.rerun()
+
+
 with tab_intake:
     st.subheader("Neuen Request erstellen")
 
-    if get_clean_openai_key():
+    if AI_BACKEND == "standin":
+        st.caption("🧪 KI-Stand-in aktiv (AI_BACKEND=standin) – KI-Antworten sind simuliert.")
+    elif ai_available():
         st.caption("✅ OPENAI_API_KEY gefunden.")
     else:
         st.caption("⚠️ OPENAI_API_KEY nicht gefunden. KI-Funktionen sind dann deaktiviert.")
@@ -679,57 +218,12 @@ with tab_intake:
             elif uploaded is None:
                 st.error("Bitte zuerst ein Dokument auswählen.")
             else:
-                raw_text = extract_text_from_uploaded_file(uploaded)
-                raw_text = normalize_offer_text(raw_text)
-
-                if not raw_text.strip():
-                    st.error("Aus dem Dokument konnte kein Text gelesen werden (vermutlich Scan-PDF ohne OCR).")
-                else:
-                    try:
-                        # DSGVO: Redaction vor KI
-                        redacted_text = redact_personal_data(raw_text)
-
-                        extracted = extract_offer_with_openai(redacted_text)
-
-                        if extracted.vendor_name:
-                            st.session_state["vendor_name"] = extracted.vendor_name
-                        if extracted.vendor_vat_id:
-                            st.session_state["vendor_vat_id"] = extracted.vendor_vat_id
-                        if extracted.department:
-                            st.session_state["department"] = extracted.department
-                        if extracted.currency in ["EUR", "USD", "GBP"]:
-                            st.session_state["currency"] = extracted.currency
-
-                        st.session_state["positions_net"] = parse_de_number_to_float(extracted.positions_net)
-                        st.session_state["shipping_net"] = parse_de_number_to_float(extracted.shipping_net)
-                        st.session_state["tax_amount"] = parse_de_number_to_float(extracted.tax_amount)
-                        st.session_state["total_gross"] = parse_de_number_to_float(extracted.total_gross)
-
-                        new_lines = []
-                        for ol in extracted.order_lines or []:
-                            new_lines.append({
-                                "description": ol.description or "",
-                                "unit_price": float(parse_de_number_to_float(ol.unit_price) or 0.0),
-                                "quantity": float(parse_de_number_to_float(ol.quantity) or 0.0),
-                                "unit": (ol.unit or "").strip() or "pcs",
-                            })
-                        if new_lines:
-                            st.session_state["lines"] = new_lines
-
-                        # Title generieren (neu)
-                        if not st.session_state.get("title", "").strip():
-                            st.session_state["title"] = generate_title_with_openai(
-                                vendor=st.session_state.get("vendor_name", ""),
-                                lines=st.session_state.get("lines", []),
-                                department=st.session_state.get("department", ""),
-                            )
-
-                        st.success("Auto-Fill aus Datei erfolgreich. Formular wurde gefüllt.")
-                        st.rerun()
-                    except Exception as e:
-                        st.error("Auto-Fill aus Datei hat nicht geklappt.")
-                        st.caption("Details (ohne Dokumentinhalt):")
-                        st.write(str(e))
+                try:
+                    # Parsen, Redaction (DSGVO: vor KI) und Extraktion laufen im Worker
+                    job_id = enqueue_file(uploaded.name, uploaded.getvalue(), st.session_state.get("title", ""))
+                    start_autofill_job(job_id, "aus Datei")
+                except DocumentTooLargeError as e:
+                    st.error(str(e))
 
     # ---------- Optional: Copy/Paste Auto-Fill ----------
     with st.expander("📄 Angebot einfügen (Copy/Paste) – optional", expanded=False):
@@ -740,50 +234,18 @@ with tab_intake:
             elif not offer_text.strip():
                 st.error("Bitte zuerst Text einfügen.")
             else:
-                try:
-                    raw_text = normalize_offer_text(offer_text)
-                    redacted_text = redact_personal_data(raw_text)
-
-                    extracted = extract_offer_with_openai(redacted_text)
-
-                    if extracted.vendor_name:
-                        st.session_state["vendor_name"] = extracted.vendor_name
-                    if extracted.vendor_vat_id:
-                        st.session_state["vendor_vat_id"] = extracted.vendor_vat_id
-                    if extracted.department:
-                        st.session_state["department"] = extracted.department
-                    if extracted.currency in ["EUR", "USD", "GBP"]:
-                        st.session_state["currency"] = extracted.currency
-
-                    st.session_state["positions_net"] = parse_de_number_to_float(extracted.positions_net)
-                    st.session_state["shipping_net"] = parse_de_number_to_float(extracted.shipping_net)
-                    st.session_state["tax_amount"] = parse_de_number_to_float(extracted.tax_amount)
-                    st.session_state["total_gross"] = parse_de_number_to_float(extracted.total_gross)
-
-                    new_lines = []
-                    for ol in extracted.order_lines or []:
-                        new_lines.append({
-                            "description": ol.description or "",
-                            "unit_price": float(parse_de_number_to_float(ol.unit_price) or 0.0),
-                            "quantity": float(parse_de_number_to_float(ol.quantity) or 0.0),
-                            "unit": (ol.unit or "").strip() or "pcs",
-                        })
-                    if new_lines:
-                        st.session_state["lines"] = new_lines
-
-                    if not st.session_state.get("title", "").strip():
-                        st.session_state["title"] = generate_title_with_openai(
-                            vendor=st.session_state.get("vendor_name", ""),
-                            lines=st.session_state.get("lines", []),
-                            department=st.session_state.get("department", ""),
-                        )
-
-                    st.success("Auto-Fill aus Text erfolgreich.")
-                    st.rerun()
-                except Exception as e:
-                    st.error("Extraktion hat nicht geklappt.")
-                    st.caption("Details (ohne Dokumentinhalt):")
-                    st.write(str(e))
+                start_autofill_job(enqueue_text(offer_text, st.session_state.get("title", "")), "aus Text")
+
+    autofill_job_status()
+    notice = st.session_state.pop("autofill_notice", None)
+    if notice:
+        kind, message, details = notice
+        if kind == "success":
+            st.success(message)
+        else:
+            st.error(message)
+            st.caption("Details (ohne Dokumentinhalt):")
+            st.write(details)
 
     st.caption("Tipp: Requestor Name ist intern und wird nicht aus Angeboten extrahiert.")
 
@@ -798,6 +260,13 @@ with tab_intake:
     with col3:
         vendor_name = st.text_input("Vendor Name *", key="vendor_name")
         vendor_vat_id = st.text_input("Umsatzsteuer-ID (VAT ID) *", key="vendor_vat_id", placeholder="z.B. DE987654321")
+        if vendor_name.strip() or vendor_vat_id.strip():
+            known = find_vendor(vendor_name, vendor_vat_id)
+            if known is None:
+                st.caption("Neuer Vendor")
+            else:
+                via = {"vat": "USt-Id", "name": "Name"}.get(known["match"], f'ähnlichen Namen ({known["score"]:.0%})')
+                st.caption(f'Bekannter Vendor #{known["id"]} „{known["display_name"]}“ (über {via})')
 
     st.markdown("### Order Lines (Positionen)")
     edited = st.data_editor(
@@ -842,12 +311,12 @@ with tab_intake:
 
     if st.button("Commodity Group automatisch bestimmen (KI)"):
         try:
-            pick = pick_commodity_group_with_openai(title, vendor_name, cleaned_lines)
+            pick, pick_source = pick_commodity_group(title, vendor_name, cleaned_lines)
             st.session_state["cg_id"] = pick.commodity_group_id
             st.session_state["cg_name"] = pick.commodity_group_name
             st.session_state["cg_conf"] = float(pick.confidence)
             st.session_state["cg_reason"] = pick.reasoning_short
-            st.session_state["cg_source"] = "KI"
+            st.session_state["cg_source"] = pick_source
             st.rerun()
         except Exception:
             st.session_state["cg_id"] = fallback_id
@@ -857,7 +326,10 @@ with tab_intake:
 
     cg_id = st.session_state["cg_id"] or fallback_id
     cg_name = st.session_state["cg_name"] or fallback_name
+    cg_source = st.session_state["cg_source"] if st.session_state["cg_id"] else "Fallback"
     st.write(f"**Vorschlag:** {cg_id} – {cg_name}")
+    if st.session_state["cg_conf"] is not None:
+        st.caption(f'Quelle: {st.session_state["cg_source"]} · Konfidenz {st.session_state["cg_conf"]:.0%}')
 
     def build_header(submit_status: str):
         return {
@@ -868,6 +340,7 @@ with tab_intake:
             "vendor_vat_id": vendor_vat_id.strip(),
             "commodity_group_id": cg_id,
             "commodity_group_name": cg_name,
+            "commodity_group_source": cg_source,
             "total_cost": float(total_cost),
             "currency": currency,
             "submit_status": submit_status,
@@ -899,9 +372,63 @@ with tab_intake:
 
 with tab_overview:
     st.subheader("Requests (Overview)")
-    rows = load_requests()
+
+    search_q = st.text_input("Suche (Titel, Vendor, Positionen)", key="ov_search",
+                             placeholder="z.B. mooswand grünwerk")
+
+    with st.expander("🔎 Filter", expanded=False):
+        f1, f2, f3 = st.columns(3)
+        with f1:
+            f_process = st.selectbox("Status", ["", "Open", "In Progress", "Closed"], key="ov_process_status")
+            f_submit = st.selectbox("Submit", ["", "Draft", "Submitted"], key="ov_submit_status")
+        with f2:
+            f_vendor = st.text_input("Vendor (Name oder USt-Id)", key="ov_vendor_name")
+            # Alle Schreibweisen über den Vendor-Stammsatz; unbekannt → exakter Name wie erfasst
+            ov_vendor = find_vendor(f_vendor, f_vendor) if f_vendor.strip() else None
+            if ov_vendor is not None:
+                st.caption(f'→ Vendor #{ov_vendor["id"]} „{ov_vendor["display_name"]}“')
+            f_department = st.text_input("Department (exakt)", key="ov_department")
+        with f3:
+            cg_labels = {c["id"]: f'{c["id"]} – {c["group"]}' for c in COMMODITY_GROUPS}
+            f_cg = st.selectbox("Commodity Group", [""] + list(cg_labels), key="ov_commodity_group_id",
+                                format_func=lambda x: cg_labels.get(x, "(alle)"))
+            d1, d2 = st.columns(2)
+            with d1:
+                f_from = st.date_input("Erstellt ab", value=None, key="ov_created_from")
+            with d2:
+                f_to = st.date_input("Erstellt bis", value=None, key="ov_created_to")
+
+    ov_filters = {
+        "process_status": f_process,
+        "submit_status": f_submit,
+        "vendor_id": ov_vendor["id"] if ov_vendor else None,
+        "vendor_name": f_vendor.strip() if ov_vendor is None else None,
+        "department": f_department.strip(),
+        "commodity_group_id": f_cg,
+        "created_from": f_from.isoformat() if f_from else None,
+        "created_to": (f_to + timedelta(days=1)).isoformat() if f_to else None,
+    }
+    # Filter geändert → zurück auf Seite 1 (Cursor-Stack der Keyset-Pagination leeren)
+    if st.session_state.get("ov_filters") != ov_filters:
+        st.session_state["ov_filters"] = ov_filters
+        st.session_state["ov_cursors"] = []
+    cursors = st.session_state["ov_cursors"]
+
+    if search_q.strip():
+        # Volltextsuche: beste Treffer (eine Seite), Filter gelten zusätzlich
+        # Über SEARCH_RANK_MAX_HITS reicht "mehr als …" – häufige Begriffe nicht komplett durchzählen
+        total_count = count_search_hits(search_q, limit=SEARCH_RANK_MAX_HITS + 1)
+        rows = search_requests(search_q, ov_filters, limit=OVERVIEW_PAGE_SIZE)
+    else:
+        total_count = count_requests(ov_filters)
+        rows = load_requests_page(ov_filters, after=cursors[-1] if cursors else None)
     if not rows:
-        st.info("Noch keine Requests gespeichert.")
+        if search_q.strip():
+            st.info("Keine Treffer für diese Suche.")
+        elif any(ov_filters.values()):
+            st.info("Keine Requests für diese Filter gefunden.")
+        else:
+            st.info("Noch keine Requests gespeichert.")
     else:
         table = []
         for r in rows:
@@ -921,9 +448,49 @@ with tab_overview:
             })
         st.dataframe(table, use_container_width=True)
 
+        if search_q.strip():
+            order = "nach Relevanz" if search_ranked(search_q, total_count) else "neueste zuerst"
+            if total_count <= SEARCH_RANK_MAX_HITS:
+                st.caption(f"{len(rows)} von {total_count} Treffern ({order})")
+            else:
+                st.caption(f"{len(rows)} von mehr als {SEARCH_RANK_MAX_HITS} Treffern ({order})")
+        else:
+            page_no = len(cursors) + 1
+            page_count = max(1, -(-total_count // OVERVIEW_PAGE_SIZE))
+            p1, p2, p3 = st.columns([1, 1, 4])
+            with p1:
+                if st.button("◀ Zurück", disabled=page_no == 1):
+                    cursors.pop()
+                    st.rerun()
+            with p2:
+                if st.button("Weiter ▶", disabled=page_no >= page_count):
+                    cursors.append(page_cursor(rows))
+                    st.rerun()
+            with p3:
+                st.caption(f"Seite {page_no} von {page_count} · {total_count} Requests")
+
+        with st.expander("Mehrere Requests verschieben", expanded=False):
+            page_ids = [int(r[0]) for r in rows]
+            bulk_ids = st.multiselect("Requests (diese Seite)", page_ids, key="ov_bulk_ids",
+                                      format_func=lambda i: f"{i} – {next(r[1] for r in rows if r[0] == i)}")
+            b1, b2 = st.columns(2)
+            with b1:
+                bulk_from = st.selectbox("Nur wenn Status", ["", "Open", "In Progress", "Closed"], key="ov_bulk_from",
+                                         format_func=lambda x: x or "(beliebig)")
+            with b2:
+                bulk_to = st.selectbox("Neuer Status", ["Open", "In Progress", "Closed"], key="ov_bulk_to")
+            bulk_note = st.text_input("Kommentar (optional)", key="ov_bulk_note")
+            if st.button("Status für Auswahl setzen", disabled=not bulk_ids):
+                changed = update_request_statuses(bulk_ids, bulk_to, bulk_note, expected_status=bulk_from or None)
+                skipped = len(bulk_ids) - len(changed)
+                st.success(f"{len(changed)} Requests → {bulk_to}" + (f" ({skipped} unverändert)" if skipped else ""))
+                st.rerun()
+
         st.markdown("### Request-Details anzeigen")
         selected_id = st.number_input("Request ID", min_value=1, step=1, value=int(rows[0][0]))
-        lines = load_order_lines(int(selected_id))
+        # Kopf + Positionen + Historie in einem Aufruf, aus dem Cache solange nichts geschrieben wurde
+        detail = load_request_detail(int(selected_id))
+        lines = detail["lines"] if detail else []
         if lines:
             st.dataframe(
                 [{"Description": l[0], "Unit Price": l[1], "Qty": l[2], "Unit": l[3], "Line Total": l[4]} for l in lines],
@@ -933,19 +500,25 @@ with tab_overview:
             st.info("Keine Order Lines gefunden (oder falsche ID).")
 
         st.markdown("### Status ändern (Procurement)")
-        current_status = get_request_status(int(selected_id))
+        current_status = detail["process_status"] if detail else None
+        # Status, den der Nutzer beim letzten Render gesehen hat → Compare-and-set beim Speichern
+        seen_status = st.session_state.setdefault("ov_seen_status", {})
+        expected_status = seen_status.get(int(selected_id), current_status)
+        seen_status[int(selected_id)] = current_status
         if current_status:
             options = ["Open", "In Progress", "Closed"]
             new_status = st.selectbox("Neuer Status", options, index=options.index(current_status) if current_status in options else 0)
             note = st.text_input("Kommentar (optional)", placeholder="z.B. Prüfung gestartet")
             if st.button("Status speichern"):
-                ok, old_status = update_request_status(int(selected_id), new_status, note)
+                ok, old_status = update_request_status(int(selected_id), new_status, note, expected_status=expected_status)
                 if ok and old_status != new_status:
                     st.success(f"Status geändert: {old_status} → {new_status}")
                     st.rerun()
+                elif not ok:
+                    st.warning(f"Status wurde inzwischen von jemand anderem geändert (jetzt: {old_status}). Bitte prüfen.")
 
         st.markdown("### Status-Historie")
-        history = load_status_history(int(selected_id))
+        history = detail["history"] if detail else []
         if history:
             st.dataframe(
                 [{"Von": h[0], "Zu": h[1], "Zeitpunkt": h[2], "Kommentar": h[3]} for h in history],
@@ -953,3 +526,113 @@ with tab_overview:
             )
         else:
             st.info("Noch keine Statusänderungen.")
+
+
+# =========================================================
+# TAB 3: ANALYTICS (nur vorverdichtete spend_summary-Zeilen)
+# =========================================================
+with tab_analytics:
+    st.subheader("Spend-Analytics")
+
+    spend_dims = {
+        "commodity_group_id": "Commodity Group",
+        "vendor_name": "Vendor",
+        "department": "Department",
+        "month": "Monat",
+    }
+    a1, a2, a3, a4 = st.columns(4)
+    with a1:
+        group_by = st.selectbox("Gruppieren nach", list(spend_dims), format_func=spend_dims.get, key="an_group_by")
+    with a2:
+        an_submit = st.selectbox("Submit", ["Submitted", "Draft", ""], key="an_submit_status",
+                                 format_func=lambda x: x or "(alle)")
+    with a3:
+        an_from = st.text_input("Monat ab (YYYY-MM)", key="an_month_from")
+    with a4:
+        an_to = st.text_input("Monat bis (YYYY-MM)", key="an_month_to")
+
+    spend_rows = load_spend(group_by, {
+        "submit_status": an_submit,
+        "month_from": an_from.strip(),
+        "month_to": an_to.strip(),
+    })
+    if not spend_rows:
+        st.info("Keine Ausgaben für diese Auswahl.")
+    else:
+        cg_names = {c["id"]: c["group"] for c in COMMODITY_GROUPS}
+
+        def spend_label(value: str) -> str:
+            if group_by == "commodity_group_id":
+                return f"{value} – {cg_names.get(value, '')}" if value else "(ohne)"
+            return value or "(ohne)"
+
+        st.dataframe(
+            [{
+                spend_dims[group_by]: spend_label(r[0]),
+                "Währung": r[1],
+                "Requests": r[2],
+                "Gesamt (brutto)": round(r[3], 2),
+                "Positionen netto": round(r[4], 2),
+                "Steuer": round(r[5], 2),
+            } for r in spend_rows],
+            use_container_width=True
+        )
+        currencies = sorted({r[1] for r in spend_rows})
+        chart_currency = currencies[0]
+        if len(currencies) > 1:
+            chart_currency = st.radio("Diagramm-Währung", currencies, horizontal=True, key="an_chart_currency")
+        st.bar_chart(
+            [{"Gruppe": spend_label(r[0]), "Gesamt": r[3]} for r in spend_rows if r[1] == chart_currency],
+            x="Gruppe", y="Gesamt"
+        )
+
+
+# =========================================================
+# TAB 4: ADMIN – Laufzeiten pro Stufe (Parsen, Redaction, KI, DB)
+# =========================================================
+with tab_admin:
+    st.subheader("Metriken (dieser Server-Prozess)")
+
+    if not metrics.METRICS_ENABLED:
+        st.info("Metriken sind abgeschaltet (METRICS_ENABLED=0).")
+    else:
+        stage_groups = {"": "(alle)", "parse": "Parsen", "redact": "Redaction", "llm": "KI", "db": "Datenbank"}
+        m1, m2 = st.columns([3, 1])
+        with m1:
+            stage_group = st.selectbox("Stufe", list(stage_groups), format_func=stage_groups.get, key="metrics_group")
+        with m2:
+            if st.button("Zurücksetzen"):
+                metrics.reset()
+
+        gw = gateway_stats()
+        if gw is not None:
+            breaker = {"closed": "✅ KI erreichbar", "half_open": "🟡 Probe läuft",
+                       "open": "🔴 Circuit Breaker offen – Fallbacks aktiv"}[gw["breaker"]]
+            st.caption(f"KI-Gateway ({AI_BACKEND}): {breaker} · Aufrufe {gw['calls']} · zusammengelegt {gw['coalesced']} · "
+                       f"Wiederholungen {gw['retries']} · 429 {gw['rate_limited']} · abgewiesen {gw['rejected']} · "
+                       f"frei {gw['requests_available']:.0f} Req / {gw['tokens_available']:,} Tokens")
+
+        stats = [s for s in metrics.stage_stats() if not stage_group or s["stage"].split(".")[0] == stage_group]
+        if not stats:
+            st.info("Noch keine Messungen – Auto-Fill oder Overview einmal benutzen.")
+        else:
+            st.dataframe(
+                [{
+                    "Stufe": s["stage"],
+                    "Aufrufe": s["count"],
+                    "Fehler": s["errors"],
+                    "p50 (ms)": round(s["p50_ms"], 2),
+                    "p95 (ms)": round(s["p95_ms"], 2),
+                    "max (ms)": round(s["max_ms"], 2),
+                    "Tokens in": s["tokens_in"],
+                    "Tokens out": s["tokens_out"],
+                } for s in stats],
+                use_container_width=True
+            )
+            st.caption(f"p50/p95 über die letzten {metrics.METRICS_WINDOW} Messungen pro Stufe. "
+                       "Ein externer Worker-Prozess zählt separat (METRICS_PORT).")
+
+        with st.expander("Prometheus-Format", expanded=False):
+            prom = metrics.prometheus_text()
+            st.download_button("metrics.txt herunterladen", prom, file_name="metrics.txt", mime="text/plain")
+            st.code(prom, language="text")
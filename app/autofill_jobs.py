@@ -0,0 +1,224 @@
+"""
+Auto-Fill als Hintergrund-Job (SQLite-Queue, Tabelle autofill_jobs).
+
+Die UI legt nur einen Job an (enqueue_file/enqueue_text) und pollt dessen Status;
+Worker-Threads arbeiten die Queue ab: Datei → Text → normalisieren → redigieren →
+Extraktion → Titel ∥ Commodity Group (ai_service.autofill). Das Ergebnis landet als
+AutoFillResult-JSON in der Tabelle. Jobs überleben damit Streamlit-Reruns; stirbt ein
+Worker (Neustart), vergibt der abgelaufene Lease den Job neu.
+
+Schon während der (gestreamten) Extraktion stehen fertige Felder und Positionen in
+partial_json; die UI übernimmt sie beim nächsten Poll (JOB_UI_POLL_S).
+
+Fehler werden mit exponentiellem Backoff bis max_attempts wiederholt, außer sie sind
+endgültig (zu großes Dokument, kein Text, kein API-Key und lokal nicht erkannt).
+
+Eigener Worker-Prozess statt Threads im Streamlit-Server:
+    AUTOFILL_WORKERS=0 streamlit run app/app.py
+    python app/autofill_jobs.py --workers 4
+"""
+import argparse
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+import db
+import metrics
+from ai_backends import get_backend
+from document_text import DocumentTooLargeError, check_document_size, iter_document_text
+from intake import normalize_offer_text
+from redaction import redact_personal_data, redact_stream
+
+JOB_WORKERS = int(os.getenv("AUTOFILL_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("AUTOFILL_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_S = 2.0
+# Länger als ein KI-Aufruf dauern kann (OpenAI-Client-Timeout), sonst läuft ein Job doppelt
+JOB_LEASE_S = 600
+JOB_POLL_S = 1.0
+# UI-Poll, solange ein Job läuft: gestreamte Felder sollen ohne spürbare Verzögerung im Formular landen
+JOB_UI_POLL_S = float(os.getenv("AUTOFILL_UI_POLL_S", "0.25"))
+JOB_KEEP_DAYS = 7
+PURGE_EVERY_N_JOBS = 100
+MAX_ERROR_CHARS = 500
+
+
+class PermanentJobError(Exception):
+    """Wiederholen bringt nichts → Job sofort auf 'failed'."""
+
+
+# -----------------------------
+# Einreihen (UI)
+# -----------------------------
+def enqueue_file(filename: str, data: bytes, title: str = "") -> int:
+    check_document_size(len(data))
+    job_id = db.enqueue_job("file", filename, data, title, JOB_MAX_ATTEMPTS)
+    _notify_workers()
+    return job_id
+
+
+def enqueue_text(text: str, title: str = "") -> int:
+    job_id = db.enqueue_job("text", None, text.encode("utf-8"), title, JOB_MAX_ATTEMPTS)
+    _notify_workers()
+    return job_id
+
+
+def get_job(job_id: int) -> Optional[dict]:
+    return db.get_job(job_id)
+
+
+# -----------------------------
+# Ausführen (Worker)
+# -----------------------------
+def job_text(job: dict) -> str:
+    # Redaction vor der KI (DSGVO) – wie bisher im UI, nur jetzt im Worker
+    if job["source_kind"] == "text":
+        return redact_personal_data(normalize_offer_text(job["payload"].decode("utf-8", errors="ignore")))
+    # Parsen und Redaction laufen verschränkt (Stream) → getrennt messen, Parse-Zeit abziehen
+    pages = metrics.timed_iter("parse.stream", iter_document_text(job["source_name"], job["payload"]))
+    chunks = (normalize_offer_text(c) + "\n" for c in pages)
+    return "".join(metrics.timed_iter("redact.stream", redact_stream(chunks), inner=pages))
+
+
+def run_job(job: dict) -> str:
+    """Ein Job → AutoFillResult-JSON; PermanentJobError, wenn ein neuer Versuch sinnlos ist."""
+    try:
+        text = job_text(job)
+    except DocumentTooLargeError as e:
+        raise PermanentJobError(str(e)) from e
+    if not text.strip():
+        raise PermanentJobError("Aus dem Dokument konnte kein Text gelesen werden (vermutlich Scan-PDF ohne OCR).")
+    # Ohne KI-Backend (z.B. kein API-Key) geht nur der lokale Schnellpfad (strukturierte ERP-Angebote);
+    # Parser erst hier laden, die kompilierten Regexe kosten sonst Startzeit
+    from offer_parser import parse_offer_locally
+
+    backend = get_backend()
+    if not backend.available() and parse_offer_locally(text)[0] is None:
+        raise PermanentJobError(f"{backend.unavailable_reason()} "
+                                "(Das Angebot ließ sich auch nicht lokal erkennen.)")
+
+    from ai_service import autofill
+
+    def on_partial(partial: dict):
+        db.update_job_partial(job["id"], json.dumps(partial, ensure_ascii=False))
+
+    return autofill(text, title=job["title"], on_partial=on_partial).model_dump_json()
+
+
+def retry_delay(attempts: int) -> float:
+    return JOB_RETRY_BASE_S * 2 ** (attempts - 1)
+
+
+def process_job(job: dict):
+    try:
+        result_json = run_job(job)
+    except PermanentJobError as e:
+        db.fail_job(job["id"], str(e)[:MAX_ERROR_CHARS])
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"[:MAX_ERROR_CHARS]
+        if job["attempts"] < job["max_attempts"]:
+            # Circuit Breaker offen → frühestens nach dessen Abkühlzeit erneut versuchen
+            delay = max(retry_delay(job["attempts"]), getattr(e, "retry_after", 0.0))
+            db.retry_job(job["id"], error, delay)
+        else:
+            db.fail_job(job["id"], error)
+    else:
+        db.finish_job(job["id"], result_json)
+
+
+class JobWorkers:
+    def __init__(self, n_workers: int = JOB_WORKERS, poll_s: float = JOB_POLL_S):
+        self.poll_s = poll_s
+        self._stop = threading.Event()
+        self._wake = threading.Condition()
+        self._processed = 0
+        self._threads = [
+            threading.Thread(target=self._run, name=f"autofill-worker-{i}", daemon=True)
+            for i in range(n_workers)
+        ]
+
+    def start(self) -> "JobWorkers":
+        for t in self._threads:
+            t.start()
+        return self
+
+    def notify(self):
+        with self._wake:
+            self._wake.notify()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+
+    def _idle(self):
+        with self._wake:
+            self._wake.wait(self.poll_s)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = db.claim_job(JOB_LEASE_S)
+            except Exception:
+                # z.B. DB kurz gelockt → beim nächsten Poll erneut versuchen
+                job = None
+            if job is None:
+                self._idle()
+                continue
+            process_job(job)
+            self._processed += 1
+            if self._processed % PURGE_EVERY_N_JOBS == 0:
+                purge_old_jobs()
+
+
+def purge_old_jobs(keep_days: int = JOB_KEEP_DAYS) -> int:
+    cutoff = (datetime.now() - timedelta(days=keep_days)).isoformat(timespec="seconds")
+    return db.purge_jobs(cutoff)
+
+
+# -----------------------------
+# Worker pro Prozess (einmal gestartet, von allen Sessions geteilt)
+# -----------------------------
+_workers: Optional[JobWorkers] = None
+_workers_lock = threading.Lock()
+
+
+def start_workers(n_workers: int = JOB_WORKERS) -> Optional[JobWorkers]:
+    global _workers
+    if n_workers <= 0:
+        return None
+    if _workers is None:
+        with _workers_lock:
+            if _workers is None:
+                db.init_db()
+                _workers = JobWorkers(n_workers).start()
+    return _workers
+
+
+def _notify_workers():
+    # Worker im selben Prozess sofort wecken statt bis zum nächsten Poll zu warten
+    if _workers is not None:
+        _workers.notify()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Auto-Fill-Jobs aus der SQLite-Queue abarbeiten")
+    ap.add_argument("--workers", type=int, default=max(1, JOB_WORKERS))
+    args = ap.parse_args()
+
+    workers = start_workers(args.workers)
+    metrics.start_http_server()
+    print(f"{args.workers} Auto-Fill-Worker laufen auf {db.DB_PATH} (Strg+C beendet)")
+    try:
+        while True:
+            threading.Event().wait(60)
+            print(f"Jobs: {db.job_counts()}")
+    except KeyboardInterrupt:
+        workers.stop(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
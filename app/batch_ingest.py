@@ -0,0 +1,213 @@
+"""
+Batch-Import: Ordner mit Angeboten (PDF/DOCX/TXT) → Draft-Requests.
+
+Datei-Parsing läuft parallel in einem Prozess-Pool, die KI-Schritte
+(Extraktion, Titel, Commodity Group) mit begrenzter Parallelität in einem Thread-Pool.
+Bereits verarbeitete Dateien (Inhalts-Hash in ingest_log) werden beim
+nächsten Lauf übersprungen → Abbruch/Neustart ist jederzeit möglich.
+
+Aufruf:
+    python app/batch_ingest.py <ordner> [--workers 4] [--ai-concurrency 4]
+                               [--requestor "Batch-Import"] [--base-url http://localhost:8000/v1]
+                               [--mode oneshot] [--backend standin]
+
+--backend standin nimmt den deterministischen KI-Stand-in im Prozess (AI_BACKEND, siehe ai_backends),
+--base-url zeigt den OpenAI-Client auf einen Stand-in-Server (python app/ai_standin.py --port 8000);
+beides testet ohne echte API-Calls.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from db import init_db, insert_request, load_ingested_hashes, record_ingest
+from document_text import SUPPORTED_SUFFIXES, iter_document_text
+from intake import (
+    AUTOFILL_MODES,
+    calc_lines,
+    normalize_offer_text,
+    parse_de_number_to_float,
+    simple_commodity_group_guess,
+)
+from redaction import redact_stream
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def parse_file(path: str) -> tuple[str, float]:
+    # Läuft im Prozess-Pool: Datei → normalisierter, redigierter Text
+    # Seiten seriell: der Batch verteilt schon ganze Dateien auf Prozesse
+    t0 = time.perf_counter()
+    with open(path, "rb") as f:
+        chunks = (normalize_offer_text(c) + "\n" for c in iter_document_text(path, f, parallel=False))
+        text = "".join(redact_stream(chunks))
+    return text, time.perf_counter() - t0
+
+
+def build_draft(redacted_text: str, requestor: str, mode: Optional[str] = None) -> tuple[dict, list[dict]]:
+    # Läuft im Thread-Pool: KI-Extraktion, dann Titel + Commodity Group parallel (ein geteilter Client)
+    # openai/pydantic erst hier laden: --help und die Parse-Prozesse brauchen sie nicht
+    from ai_service import autofill
+
+    result = autofill(redacted_text, mode=mode)
+    extracted = result.extracted
+    cleaned_lines, sum_lines = calc_lines(result.lines)
+
+    vendor = (extracted.vendor_name or "").strip()
+    department = (extracted.department or "").strip()
+    title = result.title
+    if result.pick:
+        cg_id, cg_name = result.pick.commodity_group_id, result.pick.commodity_group_name
+        cg_source = result.pick_source
+    else:
+        cg_id, cg_name = simple_commodity_group_guess(title, vendor, cleaned_lines)
+        cg_source = "Fallback"
+    total_gross = parse_de_number_to_float(extracted.total_gross)
+
+    header = {
+        "requestor_name": requestor,
+        "department": department,
+        "title": title,
+        "vendor_name": vendor,
+        "vendor_vat_id": (extracted.vendor_vat_id or "").strip(),
+        "commodity_group_id": cg_id,
+        "commodity_group_name": cg_name,
+        "commodity_group_source": cg_source,
+        "total_cost": float(total_gross or sum_lines),
+        "currency": extracted.currency if extracted.currency in ["EUR", "USD", "GBP"] else "EUR",
+        "submit_status": "Draft",
+        "process_status": "Open",
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "positions_net": parse_de_number_to_float(extracted.positions_net),
+        "shipping_net": parse_de_number_to_float(extracted.shipping_net),
+        "tax_amount": parse_de_number_to_float(extracted.tax_amount),
+        "total_is_gross": "yes",
+    }
+    return header, cleaned_lines
+
+
+def timed_build_draft(redacted_text: str, requestor: str, mode: Optional[str] = None):
+    t0 = time.perf_counter()
+    header, lines = build_draft(redacted_text, requestor, mode)
+    return header, lines, time.perf_counter() - t0
+
+
+def collect_files(folder: Path) -> list[Path]:
+    return sorted(p for p in folder.rglob("*") if p.is_file() and p.suffix.lower() in SUPPORTED_SUFFIXES)
+
+
+def run_batch(folder: Path, workers: int, ai_concurrency: int, requestor: str,
+              mode: Optional[str] = None) -> list[dict]:
+    init_db()
+    done_hashes = load_ingested_hashes()
+
+    todo = []
+    for path in collect_files(folder):
+        h = file_sha256(path)
+        if h in done_hashes:
+            print(f"skip  {path.name} (bereits importiert)")
+            continue
+        todo.append((path, h))
+
+    # Erst hier: concurrent.futures.process zieht multiprocessing nach (~20 ms beim Import)
+    from concurrent.futures import ProcessPoolExecutor
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as parse_pool, \
+            ThreadPoolExecutor(max_workers=ai_concurrency) as ai_pool:
+        parse_futs = {parse_pool.submit(parse_file, str(p)): (p, h) for p, h in todo}
+        ai_futs = {}
+        pending = set(parse_futs)
+
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                if fut in parse_futs:
+                    path, h = parse_futs[fut]
+                    try:
+                        text, parse_s = fut.result()
+                    except Exception as e:
+                        results.append(finish(path, h, error=f"Parsing: {e}"))
+                        continue
+                    if not text.strip():
+                        results.append(finish(path, h, error="Kein Text (Scan-PDF ohne OCR?)", parse_s=parse_s))
+                        continue
+                    ai_fut = ai_pool.submit(timed_build_draft, text, requestor, mode)
+                    ai_futs[ai_fut] = (path, h, parse_s)
+                    pending.add(ai_fut)
+                else:
+                    path, h, parse_s = ai_futs[fut]
+                    try:
+                        header, lines, ai_s = fut.result()
+                    except Exception as e:
+                        results.append(finish(path, h, error=f"KI: {e}", parse_s=parse_s))
+                        continue
+                    # Schreiben nur im Haupt-Thread → keine konkurrierenden Writer
+                    try:
+                        request_id = insert_request(header, lines)
+                    except Exception as e:
+                        # z.B. DB gesperrt/Constraint: nur diese Datei als Fehler loggen, der Batch läuft weiter
+                        results.append(finish(path, h, error=f"DB: {e}", parse_s=parse_s, ai_s=ai_s))
+                        continue
+                    results.append(finish(path, h, request_id=request_id, parse_s=parse_s, ai_s=ai_s))
+    return results
+
+
+def finish(path: Path, file_hash: str, request_id=None, error=None, parse_s=0.0, ai_s=0.0) -> dict:
+    status = "done" if error is None else "error"
+    record_ingest(file_hash, path.name, status, request_id=request_id, error=error)
+    if error is None:
+        print(f"ok    {path.name} → Request {request_id}  (parse {parse_s:.2f}s, KI {ai_s:.2f}s)")
+    else:
+        print(f"FEHLER {path.name}: {error}")
+    return {"file": path.name, "status": status, "request_id": request_id, "parse_s": parse_s, "ai_s": ai_s}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Angebote aus einem Ordner als Draft-Requests importieren.")
+    ap.add_argument("folder", type=Path)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Prozesse für Datei-Parsing")
+    ap.add_argument("--ai-concurrency", type=int, default=4, help="max. parallele KI-Requests")
+    ap.add_argument("--requestor", default="Batch-Import")
+    ap.add_argument("--base-url", help="alternativer OpenAI-Endpunkt (z.B. lokaler Stand-in)")
+    ap.add_argument("--backend", choices=("openai", "standin"), help="KI-Backend (Default: AI_BACKEND)")
+    ap.add_argument("--mode", choices=AUTOFILL_MODES, help="oneshot = ein KI-Aufruf pro Angebot (Default: AUTOFILL_MODE)")
+    args = ap.parse_args()
+
+    if args.base_url:
+        os.environ["OPENAI_BASE_URL"] = args.base_url
+    if args.backend:
+        # ai_backends wird erst im Thread-Pool geladen und liest AI_BACKEND dann
+        os.environ["AI_BACKEND"] = args.backend
+    if not args.folder.is_dir():
+        print(f"Ordner nicht gefunden: {args.folder}")
+        return 2
+
+    t0 = time.perf_counter()
+    results = run_batch(args.folder, args.workers, args.ai_concurrency, args.requestor, args.mode)
+    wall = time.perf_counter() - t0
+
+    ok = [r for r in results if r["status"] == "done"]
+    print(f"\n{len(ok)}/{len(results)} Dateien importiert in {wall:.1f}s", end="")
+    if results and wall > 0:
+        print(f"  ({len(results) / wall * 60:.1f} Dateien/min)")
+    else:
+        print()
+    if ok:
+        print(f"Ø parse {sum(r['parse_s'] for r in ok) / len(ok):.2f}s, Ø KI {sum(r['ai_s'] for r in ok) / len(ok):.2f}s pro Datei")
+    return 0 if len(ok) == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
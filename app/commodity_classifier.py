@@ -0,0 +1,167 @@
+"""
+Lokaler Commodity-Group-Klassifikator, trainiert auf gespeicherten Requests.
+
+Multinomial Naive Bayes über Tokens aus Title, Vendor und Order-Line-Beschreibungen.
+Zählt nur Häufigkeiten → neue Requests lassen sich inkrementell nachtrainieren.
+Die Konfidenz wird per Temperature Scaling auf einem Holdout kalibriert; nur
+unterhalb von LOCAL_CONFIDENCE_THRESHOLD wird die KI (OpenAI) gefragt.
+"""
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+
+import db
+
+LOCAL_CONFIDENCE_THRESHOLD = 0.8
+MIN_TRAINING_EXAMPLES = 50
+REFRESH_INTERVAL_S = 60
+ALPHA = 0.5  # Laplace-Glättung
+TEMPERATURE_GRID = [0.5, 1, 1.5, 2, 3, 4, 6, 8, 12, 16, 24, 32]
+
+TOKEN_RE = re.compile(r"[a-zäöüß0-9]{2,}")
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = TOKEN_RE.findall(text.lower())
+    # Deutsche Komposita ("Mooswand", "Acrylplatte"): zusätzlich Präfix/Suffix langer Wörter
+    extra = [f"{t[:5]}*" for t in tokens if len(t) > 7] + [f"*{t[-5:]}" for t in tokens if len(t) > 7]
+    return tokens + extra
+
+
+def example_text(title: str, vendor: str, descriptions: str) -> str:
+    return f"{title or ''} {vendor or ''} {descriptions or ''}"
+
+
+def scores_to_proba(scores: dict[str, float], temperature: float) -> dict[str, float]:
+    if not scores:
+        return {}
+    top = max(scores.values())
+    exp = {k: math.exp((s - top) / temperature) for k, s in scores.items()}
+    z = sum(exp.values())
+    return {k: e / z for k, e in exp.items()}
+
+
+class CommodityClassifier:
+    def __init__(self):
+        self.class_docs: Counter = Counter()
+        self.token_counts: dict[str, Counter] = defaultdict(Counter)
+        self.class_totals: Counter = Counter()
+        self.vocab: set[str] = set()
+        self.temperature = 1.0
+        self.last_request_id = 0
+
+    @property
+    def n_examples(self) -> int:
+        return sum(self.class_docs.values())
+
+    def add(self, label: str, text: str):
+        tokens = tokenize(text)
+        self.class_docs[label] += 1
+        self.token_counts[label].update(tokens)
+        self.class_totals[label] += len(tokens)
+        self.vocab.update(tokens)
+
+    def log_scores(self, text: str) -> dict[str, float]:
+        tokens = [t for t in tokenize(text) if t in self.vocab]
+        n = self.n_examples
+        v = len(self.vocab) or 1
+        scores = {}
+        for label, docs in list(self.class_docs.items()):
+            counts = self.token_counts[label]
+            denom = math.log(self.class_totals[label] + ALPHA * v)
+            s = math.log(docs / n)
+            for t in tokens:
+                s += math.log(counts.get(t, 0) + ALPHA) - denom
+            scores[label] = s
+        return scores
+
+    def predict_proba(self, text: str) -> dict[str, float]:
+        return scores_to_proba(self.log_scores(text), self.temperature)
+
+    def predict(self, text: str) -> tuple[Optional[str], float]:
+        proba = self.predict_proba(text)
+        if not proba:
+            return None, 0.0
+        label = max(proba, key=proba.get)
+        return label, proba[label]
+
+    def fit_temperature(self, holdout: list[tuple[str, str]]):
+        # Temperatur mit minimalem Log-Loss auf dem Holdout → Konfidenz ≈ Trefferquote
+        scored = [(label, self.log_scores(text)) for label, text in holdout]
+        best_t, best_loss = 1.0, float("inf")
+        for t in TEMPERATURE_GRID:
+            loss = 0.0
+            for label, scores in scored:
+                loss -= math.log(max(scores_to_proba(scores, t).get(label, 0.0), 1e-12))
+            if loss < best_loss:
+                best_t, best_loss = t, loss
+        self.temperature = best_t
+
+
+def train_from_db(holdout_share: float = 0.2, seed: int = 42) -> CommodityClassifier:
+    rows = db.load_training_examples(after_id=0)
+    examples = [(label, example_text(title, vendor, desc)) for _, label, title, vendor, desc in rows]
+
+    clf = CommodityClassifier()
+    if len(examples) >= MIN_TRAINING_EXAMPLES:
+        shuffled = examples[:]
+        random.Random(seed).shuffle(shuffled)
+        cut = int(len(shuffled) * (1 - holdout_share))
+        calib = CommodityClassifier()
+        for label, text in shuffled[:cut]:
+            calib.add(label, text)
+        calib.fit_temperature(shuffled[cut:])
+        clf.temperature = calib.temperature
+
+    for label, text in examples:
+        clf.add(label, text)
+    clf.last_request_id = rows[-1][0] if rows else 0
+    return clf
+
+
+def update_from_db(clf: CommodityClassifier) -> int:
+    # Inkrementell: nur Requests nach dem zuletzt gesehenen, Temperatur bleibt
+    rows = db.load_training_examples(after_id=clf.last_request_id)
+    for _, label, title, vendor, desc in rows:
+        clf.add(label, example_text(title, vendor, desc))
+    if rows:
+        clf.last_request_id = rows[-1][0]
+    return len(rows)
+
+
+# -----------------------------
+# Prozessweite Instanz
+# -----------------------------
+_clf: Optional[CommodityClassifier] = None
+_clf_refreshed_at = 0.0
+_clf_lock = threading.Lock()
+
+
+def get_classifier() -> CommodityClassifier:
+    global _clf, _clf_refreshed_at
+    now = time.monotonic()
+    if _clf is not None and now - _clf_refreshed_at < REFRESH_INTERVAL_S:
+        return _clf
+    with _clf_lock:
+        if _clf is None:
+            _clf = train_from_db()
+        elif now - _clf_refreshed_at >= REFRESH_INTERVAL_S:
+            update_from_db(_clf)
+        _clf_refreshed_at = now
+    return _clf
+
+
+def classify_locally(title: str, vendor: str, lines: list[dict]) -> tuple[Optional[str], float]:
+    """(commodity_group_id, kalibrierte Konfidenz); (None, 0.0) solange zu wenig Trainingsdaten."""
+    try:
+        clf = get_classifier()
+    except Exception:
+        return None, 0.0
+    if clf.n_examples < MIN_TRAINING_EXAMPLES:
+        return None, 0.0
+    descriptions = " ".join(str(l.get("description", "")) for l in lines or [])
+    return clf.predict(example_text(title, vendor, descriptions))
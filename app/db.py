@@ -0,0 +1,1597 @@
+import json
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from metrics import timed
+from vendors import VENDOR_MATCH_THRESHOLD, canonical_name, names_compatible, name_trigrams, normalize_vat_id
+
+DB_PATH = "procurement.db"
+
+
+# -----------------------------
+# SQLite: Verbindungen (Pool + WAL)
+# -----------------------------
+# WAL: Leser blockieren den schreibenden Intake nicht mehr (und umgekehrt).
+# synchronous=NORMAL ist im WAL-Modus sicher gegen Korruption, spart aber fsyncs.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",      # ca. 16 MB Page-Cache pro Verbindung
+    "PRAGMA mmap_size=134217728",    # 128 MB memory-mapped I/O
+    "PRAGMA busy_timeout=5000",      # bei Lock bis zu 5 s warten statt sofort "database is locked"
+    "PRAGMA temp_store=MEMORY",
+)
+
+POOL_MAX_IDLE = 8
+
+
+def open_conn(path: str) -> sqlite3.Connection:
+    # check_same_thread=False: Streamlit führt jeden Rerun in einem anderen Thread aus,
+    # der Pool gibt eine Verbindung aber immer nur an einen Thread gleichzeitig heraus.
+    conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """
+    Hält offene Verbindungen zu einer DB-Datei und verteilt sie an Threads/Sessions.
+    Statt pro Query neu zu verbinden, wird eine freie Verbindung wiederverwendet.
+    """
+
+    def __init__(self, path: str, max_idle: int = POOL_MAX_IDLE):
+        self.path = path
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=max_idle)
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return open_conn(self.path)
+
+    def release(self, conn: sqlite3.Connection):
+        # Offene Transaktion nie an den nächsten Nutzer weiterreichen
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    # Nach DB_PATH gekeyed, damit Tools/Benchmarks DB_PATH umbiegen können
+    pool = _pools.get(DB_PATH)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(DB_PATH, ConnectionPool(DB_PATH))
+    return pool
+
+
+@contextmanager
+def get_conn():
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+def close_all_connections():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
+
+
+# -----------------------------
+# SQLite: Schema-Migrationen (PRAGMA user_version)
+# -----------------------------
+# Jede Migration läuft genau einmal pro DB-Datei, in aufsteigender Reihenfolge.
+# Neue Schema-Änderungen (Tabellen, Spalten, Indizes) werden NUR hinten angehängt,
+# bestehende Schritte werden nie nachträglich geändert.
+def ensure_column(conn: sqlite3.Connection, table: str, col: str, coltype: str):
+    cur = conn.cursor()
+    cur.execute(f"PRAGMA table_info({table})")
+    cols = [r[1] for r in cur.fetchall()]
+    if col not in cols:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {col} {coltype}")
+
+def migrate_001_base_tables(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        requestor_name TEXT NOT NULL,
+        department TEXT NOT NULL,
+        title TEXT NOT NULL,
+        vendor_name TEXT NOT NULL,
+        vendor_vat_id TEXT NOT NULL,
+        commodity_group_id TEXT,
+        commodity_group_name TEXT,
+        total_cost REAL NOT NULL,
+        currency TEXT NOT NULL,
+        submit_status TEXT NOT NULL,
+        process_status TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    """)
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS order_lines (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        request_id INTEGER NOT NULL,
+        description TEXT NOT NULL,
+        unit_price REAL NOT NULL,
+        quantity REAL NOT NULL,
+        unit TEXT,
+        line_total REAL NOT NULL,
+        FOREIGN KEY(request_id) REFERENCES requests(id)
+    )
+    """)
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS status_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        request_id INTEGER NOT NULL,
+        old_status TEXT,
+        new_status TEXT NOT NULL,
+        changed_at TEXT NOT NULL,
+        note TEXT,
+        FOREIGN KEY(request_id) REFERENCES requests(id)
+    )
+    """)
+
+def migrate_002_cost_columns(conn: sqlite3.Connection):
+    # Alte DBs (vor user_version) haben die Spalten evtl. schon → ensure_column bleibt idempotent
+    ensure_column(conn, "requests", "positions_net", "REAL")
+    ensure_column(conn, "requests", "shipping_net", "REAL")
+    ensure_column(conn, "requests", "tax_amount", "REAL")
+    ensure_column(conn, "requests", "total_is_gross", "TEXT")
+
+def migrate_003_indexes(conn: sqlite3.Connection):
+    # Detail-Ansicht: Positionen/Historie pro Request (rowid hängt implizit hinten an → ORDER BY id ohne Sortierung)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_lines_request ON order_lines(request_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_status_history_request ON status_history(request_id)")
+    # Overview: Sortierung nach Erstellzeit + Filter (jeweils mit created_at für sortierte Treffer)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_requests_created ON requests(created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_requests_process_status ON requests(process_status, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_requests_submit_status ON requests(submit_status, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_requests_vendor ON requests(vendor_name, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_requests_commodity ON requests(commodity_group_id, created_at)")
+    conn.execute("ANALYZE")
+
+def migrate_004_department_index(conn: sqlite3.Connection):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_requests_department ON requests(department, created_at)")
+
+def migrate_005_ingest_log(conn: sqlite3.Connection):
+    # Batch-Import: welche Datei (per Inhalts-Hash) wurde schon zu welchem Draft verarbeitet
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS ingest_log (
+        file_hash TEXT PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        status TEXT NOT NULL,
+        request_id INTEGER,
+        error TEXT,
+        processed_at TEXT NOT NULL,
+        FOREIGN KEY(request_id) REFERENCES requests(id)
+    )
+    """)
+
+def migrate_006_extraction_cache(conn: sqlite3.Connection):
+    # Nur strukturiertes ExtractedOffer-JSON, nie der (redigierte) Angebotstext selbst (DSGVO)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS extraction_cache (
+        cache_key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        prompt_version TEXT NOT NULL,
+        offer_json TEXT NOT NULL,
+        size_bytes INTEGER NOT NULL,
+        hit_count INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT NOT NULL,
+        last_used_at TEXT NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_used ON extraction_cache(last_used_at)")
+
+def migrate_007_spend_summary(conn: sqlite3.Connection):
+    # Vorverdichtete Ausgaben pro Monat × Commodity Group × Vendor × Department × Währung × Status.
+    # Trigger auf requests halten sie bei JEDEM Schreibpfad aktuell (Einzel-/Bulk-Insert, Statuswechsel).
+    # NULL-Dimensionen werden zu '' → der Primärschlüssel greift auch für das Upsert.
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS spend_summary (
+        {", ".join(f"{c} TEXT NOT NULL" for c in SPEND_KEY_COLUMNS)},
+        request_count INTEGER NOT NULL,
+        total_cost REAL NOT NULL,
+        positions_net REAL NOT NULL,
+        tax_amount REAL NOT NULL,
+        PRIMARY KEY ({", ".join(SPEND_KEY_COLUMNS)})
+    ) WITHOUT ROWID
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_requests_spend_insert AFTER INSERT ON requests
+    BEGIN
+        {spend_delta_sql("NEW", 1)}
+    END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_requests_spend_delete AFTER DELETE ON requests
+    BEGIN
+        {spend_delta_sql("OLD", -1)}
+    END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_requests_spend_update
+    AFTER UPDATE OF {", ".join(SPEND_SOURCE_COLUMNS)} ON requests
+    BEGIN
+        {spend_delta_sql("OLD", -1)}
+        {spend_delta_sql("NEW", 1)}
+    END
+    """)
+    conn.execute("DELETE FROM spend_summary")
+    conn.execute(f"INSERT INTO spend_summary {SQL_SPEND_RECOMPUTE}")
+
+
+def migrate_008_search_index(conn: sqlite3.Connection):
+    # FTS5-Volltextindex: ein Dokument pro Request (rowid = request_id) aus Titel, Vendor
+    # und allen Order-Line-Beschreibungen → alle Suchbegriffe in EINEM MATCH, bm25 pro Request.
+    conn.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS request_search USING fts5(
+        title, vendor, description,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """)
+    # rank = bm25 mit Gewichten: Titel vor Vendor vor Positionstext
+    conn.execute("INSERT INTO request_search(request_search, rank) VALUES('rank', 'bm25(10.0, 5.0, 1.0)')")
+
+    # Trigger merken nur, WELCHE Requests neu indiziert werden müssen (billig, auch bei Bulk-Inserts);
+    # refresh_search_index() baut deren Dokumente dann mit je einem Statement neu auf.
+    conn.execute("CREATE TABLE IF NOT EXISTS search_dirty (request_id INTEGER PRIMARY KEY)")
+    for name, event, ids in (
+        ("requests_search_insert", "INSERT ON requests", ["NEW.id"]),
+        ("requests_search_update", "UPDATE OF title, vendor_name ON requests", ["NEW.id"]),
+        ("requests_search_delete", "DELETE ON requests", ["OLD.id"]),
+        ("order_lines_search_insert", "INSERT ON order_lines", ["NEW.request_id"]),
+        ("order_lines_search_update", "UPDATE OF request_id, description ON order_lines",
+         ["OLD.request_id", "NEW.request_id"]),
+        ("order_lines_search_delete", "DELETE ON order_lines", ["OLD.request_id"]),
+    ):
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{name} AFTER {event}
+        BEGIN
+            INSERT OR IGNORE INTO search_dirty (request_id) VALUES {", ".join(f"({i})" for i in ids)};
+        END
+        """)
+
+    conn.execute("DELETE FROM request_search")
+    conn.execute("INSERT OR IGNORE INTO search_dirty (request_id) SELECT id FROM requests")
+    refresh_search_index(conn)
+    conn.execute("INSERT INTO request_search(request_search) VALUES('optimize')")
+
+def migrate_009_autofill_jobs(conn: sqlite3.Connection):
+    # Auto-Fill im Hintergrund: UI legt Jobs an, Worker holen sie sich per Lease.
+    # payload = Datei-Bytes bzw. eingefügter Text; wird bei Abschluss gelöscht (DSGVO).
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS autofill_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        status TEXT NOT NULL,
+        source_kind TEXT NOT NULL,
+        source_name TEXT,
+        payload BLOB,
+        title TEXT NOT NULL DEFAULT '',
+        result_json TEXT,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        run_after TEXT NOT NULL,
+        locked_until TEXT,
+        created_at TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_autofill_jobs_queue ON autofill_jobs(status, run_after)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_autofill_jobs_lease ON autofill_jobs(status, locked_until)")
+
+def migrate_010_job_partial(conn: sqlite3.Connection):
+    # Gestreamte Teilergebnisse (Lieferant, Positionen …) während der Job läuft → Formular füllt sich schrittweise
+    ensure_column(conn, "autofill_jobs", "partial_json", "TEXT")
+
+def migrate_011_vendors(conn: sqlite3.Connection):
+    # Vendor-Stammdaten: ein Eintrag pro Lieferant, eindeutig über die normalisierte USt-Id.
+    # vendor_names = alle bisher zugeordneten Schreibweisen (kanonisch), vendor_trigrams =
+    # invertierter Index Trigramm → Schreibweise für den unscharfen Namensabgleich.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS vendors (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        vat_id TEXT,
+        display_name TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_vendors_vat ON vendors(vat_id) WHERE vat_id IS NOT NULL")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS vendor_names (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        vendor_id INTEGER NOT NULL REFERENCES vendors(id),
+        canonical_name TEXT NOT NULL,
+        trigram_count INTEGER NOT NULL,
+        UNIQUE (canonical_name, vendor_id)
+    )
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS vendor_trigrams (
+        trigram TEXT NOT NULL,
+        name_id INTEGER NOT NULL REFERENCES vendor_names(id),
+        PRIMARY KEY (trigram, name_id)
+    ) WITHOUT ROWID
+    """)
+    ensure_column(conn, "requests", "vendor_id", "INTEGER REFERENCES vendors(id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_requests_vendor_id ON requests(vendor_id, created_at)")
+
+    # Spend-Trigger neu: Vendor-Dimension = Vendor-Stammsatz statt Schreibweise im Angebot.
+    # Vorher weg, sonst feuert der Update-Trigger beim Backfill für jede Zeile.
+    for name in ("insert", "delete", "update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_requests_spend_{name}")
+    link_vendors(conn)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_requests_spend_insert AFTER INSERT ON requests
+    BEGIN
+        {spend_delta_sql_by_vendor("NEW", 1)}
+    END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_requests_spend_delete AFTER DELETE ON requests
+    BEGIN
+        {spend_delta_sql_by_vendor("OLD", -1)}
+    END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_requests_spend_update
+    AFTER UPDATE OF {", ".join(SPEND_SOURCE_COLUMNS_BY_VENDOR)} ON requests
+    BEGIN
+        {spend_delta_sql_by_vendor("OLD", -1)}
+        {spend_delta_sql_by_vendor("NEW", 1)}
+    END
+    """)
+    conn.execute("DELETE FROM spend_summary")
+    conn.execute(f"INSERT INTO spend_summary {SQL_SPEND_RECOMPUTE_BY_VENDOR}")
+
+def migrate_012_commodity_source(conn: sqlite3.Connection):
+    # Woher die Commodity Group stammt ("KI", "Lokal", "Fallback"): der lokale Klassifikator lernt nur
+    # aus KI-Labels, nicht aus eigenen oder Heuristik-Vorschlägen. Alte Requests: NULL (unbekannt)
+    ensure_column(conn, "requests", "commodity_group_source", "TEXT")
+
+
+# -----------------------------
+# Spend-Analytics: Dimensionen + Trigger-SQL (von migrate_007 genutzt)
+# -----------------------------
+SPEND_KEY_COLUMNS = (
+    "month", "commodity_group_id", "vendor_name", "department", "currency", "submit_status", "process_status",
+)
+SPEND_MEASURES = ("total_cost", "positions_net", "tax_amount")
+
+# Spalten von requests, deren Änderung die Summary betrifft
+SPEND_SOURCE_COLUMNS = (
+    "created_at", "commodity_group_id", "vendor_name", "department", "currency",
+    "submit_status", "process_status", *SPEND_MEASURES,
+)
+
+
+def spend_key_exprs(ref: str) -> list[str]:
+    return [
+        f"substr({ref}.created_at, 1, 7)",
+        f"COALESCE({ref}.commodity_group_id, '')",
+        f"COALESCE({ref}.vendor_name, '')",
+        f"COALESCE({ref}.department, '')",
+        f"COALESCE({ref}.currency, '')",
+        f"COALESCE({ref}.submit_status, '')",
+        f"COALESCE({ref}.process_status, '')",
+    ]
+
+
+def spend_delta_sql(ref: str, sign: int) -> str:
+    # Upsert der Zeile von NEW (+1) bzw. OLD (-1); leere Gruppen werden danach entfernt
+    keys = spend_key_exprs(ref)
+    measures = [f"{sign} * COALESCE({ref}.{m}, 0)" for m in SPEND_MEASURES]
+    sql = f"""
+        INSERT INTO spend_summary ({", ".join(SPEND_KEY_COLUMNS)}, request_count, {", ".join(SPEND_MEASURES)})
+        VALUES ({", ".join(keys)}, {sign}, {", ".join(measures)})
+        ON CONFLICT ({", ".join(SPEND_KEY_COLUMNS)}) DO UPDATE SET
+            request_count = request_count + excluded.request_count,
+            {", ".join(f"{m} = {m} + excluded.{m}" for m in SPEND_MEASURES)};
+    """
+    if sign < 0:
+        sql += f"""
+        DELETE FROM spend_summary
+        WHERE {" AND ".join(f"{c} = {k}" for c, k in zip(SPEND_KEY_COLUMNS, keys))}
+          AND request_count = 0;
+        """
+    return sql
+
+
+# Vollständige Neuberechnung aus requests (Backfill + Konsistenzprüfung)
+SQL_SPEND_RECOMPUTE = f"""
+    SELECT {", ".join(spend_key_exprs("r"))},
+           COUNT(*), {", ".join(f"SUM(COALESCE(r.{m}, 0))" for m in SPEND_MEASURES)}
+    FROM requests r
+    GROUP BY {", ".join(str(i + 1) for i in range(len(SPEND_KEY_COLUMNS)))}
+"""
+
+
+# -----------------------------
+# Spend-Analytics ab migrate_011: Vendor-Dimension über den Vendor-Stammsatz
+# -----------------------------
+# Die Helfer oben bleiben auf dem Stand von migrate_007 (vendor_name wie erfasst). Ändert sich
+# die Spend-Logik erneut: diesen Stand ebenso stehen lassen und eine neue Migration anhängen.
+SPEND_SOURCE_COLUMNS_BY_VENDOR = (*SPEND_SOURCE_COLUMNS, "vendor_id")
+
+
+def spend_key_exprs_by_vendor(ref: str) -> list[str]:
+    # Name aus dem Vendor-Stammsatz ("Muster GmbH" und "MUSTER GmbH." = eine Gruppe);
+    # Requests ohne Vendor-Zuordnung behalten ihren erfassten Namen
+    vendor = (f"COALESCE((SELECT v.display_name FROM vendors v WHERE v.id = {ref}.vendor_id), "
+              f"{ref}.vendor_name, '')")
+    return [vendor if c == "vendor_name" else e for c, e in zip(SPEND_KEY_COLUMNS, spend_key_exprs(ref))]
+
+
+def spend_delta_sql_by_vendor(ref: str, sign: int) -> str:
+    # Wie spend_delta_sql, nur mit der Vendor-Dimension aus spend_key_exprs_by_vendor
+    keys = spend_key_exprs_by_vendor(ref)
+    measures = [f"{sign} * COALESCE({ref}.{m}, 0)" for m in SPEND_MEASURES]
+    sql = f"""
+        INSERT INTO spend_summary ({", ".join(SPEND_KEY_COLUMNS)}, request_count, {", ".join(SPEND_MEASURES)})
+        VALUES ({", ".join(keys)}, {sign}, {", ".join(measures)})
+        ON CONFLICT ({", ".join(SPEND_KEY_COLUMNS)}) DO UPDATE SET
+            request_count = request_count + excluded.request_count,
+            {", ".join(f"{m} = {m} + excluded.{m}" for m in SPEND_MEASURES)};
+    """
+    if sign < 0:
+        sql += f"""
+        DELETE FROM spend_summary
+        WHERE {" AND ".join(f"{c} = {k}" for c, k in zip(SPEND_KEY_COLUMNS, keys))}
+          AND request_count = 0;
+        """
+    return sql
+
+
+# Neuberechnung nach aktuellem Schema (migrate_011, check_spend_summary, rebuild_spend_summary)
+SQL_SPEND_RECOMPUTE_BY_VENDOR = f"""
+    SELECT {", ".join(spend_key_exprs_by_vendor("r"))},
+           COUNT(*), {", ".join(f"SUM(COALESCE(r.{m}, 0))" for m in SPEND_MEASURES)}
+    FROM requests r
+    GROUP BY {", ".join(str(i + 1) for i in range(len(SPEND_KEY_COLUMNS)))}
+"""
+
+
+MIGRATIONS = [
+    (1, migrate_001_base_tables),
+    (2, migrate_002_cost_columns),
+    (3, migrate_003_indexes),
+    (4, migrate_004_department_index),
+    (5, migrate_005_ingest_log),
+    (6, migrate_006_extraction_cache),
+    (7, migrate_007_spend_summary),
+    (8, migrate_008_search_index),
+    (9, migrate_009_autofill_jobs),
+    (10, migrate_010_job_partial),
+    (11, migrate_011_vendors),
+    (12, migrate_012_commodity_source),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+_migrated_paths: set[str] = set()
+_migrate_lock = threading.Lock()
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn: sqlite3.Connection) -> int:
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+
+    # BEGIN IMMEDIATE: nur ein Prozess migriert, die anderen warten (busy_timeout)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        current = get_schema_version(conn)
+        for version, step in MIGRATIONS:
+            if version > current:
+                step(conn)
+                current = version
+        conn.execute(f"PRAGMA user_version = {current}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return current
+
+@timed("db")
+def init_db():
+    # Streamlit ruft das bei jedem Rerun auf → nach dem ersten Lauf nur noch ein Set-Lookup
+    if DB_PATH in _migrated_paths:
+        return
+    with _migrate_lock:
+        if DB_PATH in _migrated_paths:
+            return
+        with get_conn() as conn:
+            migrate(conn)
+        _migrated_paths.add(DB_PATH)
+
+
+# -----------------------------
+# Vendor-Stammdaten (Normalisierung + Trigramme: vendors.py)
+# -----------------------------
+VENDOR_CANDIDATE_LIMIT = 5
+
+SQL_VENDOR_BY_VAT = "SELECT id, display_name, vat_id FROM vendors WHERE vat_id = ?"
+SQL_VENDOR_BY_NAME = """
+    SELECT v.id, v.display_name, v.vat_id
+    FROM vendor_names n JOIN vendors v ON v.id = n.vendor_id
+    WHERE n.canonical_name = ?
+    ORDER BY n.vendor_id
+"""
+# Jaccard = gemeinsame / (eigene + fremde − gemeinsame) Trigramme; gezählt wird nur über die
+# Index-Einträge der Trigramme des gesuchten Namens, nicht über alle Schreibweisen
+SQL_VENDOR_CANDIDATES = """
+    SELECT v.id, v.display_name, v.vat_id, n.canonical_name,
+           CAST(t.shared AS REAL) / (n.trigram_count + ? - t.shared) AS score
+    FROM (
+        SELECT name_id, COUNT(*) AS shared
+        FROM vendor_trigrams
+        WHERE trigram IN (SELECT value FROM json_each(?))
+        GROUP BY name_id
+    ) t
+    JOIN vendor_names n ON n.id = t.name_id
+    JOIN vendors v ON v.id = n.vendor_id
+    WHERE score >= ?
+    ORDER BY score DESC, v.id
+    LIMIT ?
+"""
+SQL_INSERT_VENDOR = "INSERT INTO vendors (vat_id, display_name, created_at) VALUES (?, ?, ?)"
+SQL_INSERT_VENDOR_NAME = """
+    INSERT OR IGNORE INTO vendor_names (vendor_id, canonical_name, trigram_count) VALUES (?, ?, ?)
+"""
+SQL_INSERT_VENDOR_TRIGRAM = "INSERT INTO vendor_trigrams (trigram, name_id) VALUES (?, ?)"
+SQL_SET_VENDOR_VAT = "UPDATE vendors SET vat_id = ? WHERE id = ? AND vat_id IS NULL"
+SQL_UNLINKED_REQUESTS = """
+    SELECT id, vendor_name, vendor_vat_id, created_at FROM requests WHERE vendor_id IS NULL ORDER BY id
+"""
+SQL_LINK_REQUEST_VENDOR = "UPDATE requests SET vendor_id = ? WHERE id = ?"
+
+
+def vendor_match(row: tuple, match: str, score: float) -> dict:
+    return {"id": row[0], "display_name": row[1], "vat_id": row[2], "match": match, "score": round(score, 3)}
+
+
+def match_vendor(conn: sqlite3.Connection, name: Optional[str], vat_id: Optional[str]) -> Optional[dict]:
+    """
+    Bekannter Vendor zu Name/USt-Id: erst über die USt-Id, dann eine bekannte Schreibweise, dann
+    unscharf über die Trigramme. Verschiedene USt-Ids passen nie zusammen. None = neuer Vendor.
+    """
+    vat = normalize_vat_id(vat_id)
+    if vat is not None:
+        row = conn.execute(SQL_VENDOR_BY_VAT, (vat,)).fetchone()
+        if row is not None:
+            return vendor_match(row, "vat", 1.0)
+    canonical = canonical_name(name)
+    if not canonical:
+        return None
+    for row in conn.execute(SQL_VENDOR_BY_NAME, (canonical,)).fetchall():
+        if vat is None or row[2] is None:
+            return vendor_match(row, "name", 1.0)
+    grams = name_trigrams(canonical)
+    candidates = conn.execute(SQL_VENDOR_CANDIDATES, (
+        len(grams), json.dumps(sorted(grams)), VENDOR_MATCH_THRESHOLD, VENDOR_CANDIDATE_LIMIT,
+    )).fetchall()
+    for row in candidates:
+        if (vat is None or row[2] is None) and names_compatible(canonical, row[3]):
+            return vendor_match(row, "fuzzy", row[4])
+    return None
+
+
+def add_vendor_name(conn: sqlite3.Connection, vendor_id: int, canonical: str):
+    if not canonical:
+        return
+    grams = name_trigrams(canonical)
+    cur = conn.execute(SQL_INSERT_VENDOR_NAME, (vendor_id, canonical, len(grams)))
+    if cur.rowcount:
+        conn.executemany(SQL_INSERT_VENDOR_TRIGRAM, ((g, cur.lastrowid) for g in grams))
+
+
+def resolve_vendor_id(conn: sqlite3.Connection, name: Optional[str], vat_id: Optional[str],
+                      created_at: str) -> Optional[int]:
+    """Vendor-ID für einen Request; legt Vendor/Schreibweise bei Bedarf an (in der Transaktion des Aufrufers)."""
+    vat, canonical = normalize_vat_id(vat_id), canonical_name(name)
+    if vat is None and not canonical:
+        return None
+    match = match_vendor(conn, name, vat_id)
+    if match is None:
+        vendor_id = conn.execute(SQL_INSERT_VENDOR, (vat, (name or "").strip() or vat, created_at)).lastrowid
+    else:
+        vendor_id = match["id"]
+        # Vendor bisher nur über den Namen bekannt → USt-Id nachtragen, ab jetzt eindeutig
+        if vat is not None and match["vat_id"] is None:
+            conn.execute(SQL_SET_VENDOR_VAT, (vat, vendor_id))
+    # Neue Schreibweise merken: die nächste Variante davon findet den Vendor direkt bzw. unscharf
+    if match is None or match["match"] != "name":
+        add_vendor_name(conn, vendor_id, canonical)
+    return vendor_id
+
+
+def link_vendors(conn: sqlite3.Connection) -> int:
+    # Requests ohne vendor_id in Erfassungsreihenfolge zuordnen: der älteste Eintrag prägt den Vendor-Namen
+    resolved, links = {}, []
+    for request_id, name, vat_id, created_at in conn.execute(SQL_UNLINKED_REQUESTS).fetchall():
+        key = (name, vat_id)
+        if key not in resolved:
+            resolved[key] = resolve_vendor_id(conn, name, vat_id, created_at)
+        if resolved[key] is not None:
+            links.append((resolved[key], request_id))
+    conn.executemany(SQL_LINK_REQUEST_VENDOR, links)
+    return len(links)
+
+
+@timed("db")
+def find_vendor(name: Optional[str], vat_id: Optional[str] = None) -> Optional[dict]:
+    """Nur nachschlagen (Intake-Hinweis, Overview-Filter): {id, display_name, vat_id, match, score} oder None."""
+    with get_conn() as conn:
+        return match_vendor(conn, name, vat_id)
+
+
+@timed("db")
+def backfill_vendors() -> dict:
+    """Einmalig bzw. nach Importen am Schreibpfad vorbei: alle Requests ohne vendor_id zuordnen."""
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            vendors_before = conn.execute("SELECT COUNT(*) FROM vendors").fetchone()[0]
+            linked = link_vendors(conn)
+            vendors_after = conn.execute("SELECT COUNT(*) FROM vendors").fetchone()[0]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return {"linked": linked, "new_vendors": vendors_after - vendors_before}
+
+
+# -----------------------------
+# SQLite: CRUD
+# -----------------------------
+REQUEST_INSERT_COLUMNS = (
+    "requestor_name", "department", "title", "vendor_name", "vendor_vat_id",
+    "commodity_group_id", "commodity_group_name",
+    "total_cost", "currency", "submit_status", "process_status", "created_at",
+    "positions_net", "shipping_net", "tax_amount", "total_is_gross", "vendor_id", "commodity_group_source",
+)
+ORDER_LINE_INSERT_COLUMNS = ("request_id", "description", "unit_price", "quantity", "unit", "line_total")
+
+SQL_INSERT_REQUEST = f"""
+    INSERT INTO requests ({", ".join(REQUEST_INSERT_COLUMNS)})
+    VALUES ({", ".join("?" * len(REQUEST_INSERT_COLUMNS))})
+"""
+
+SQL_INSERT_ORDER_LINE = f"""
+    INSERT INTO order_lines ({", ".join(ORDER_LINE_INSERT_COLUMNS)})
+    VALUES ({", ".join("?" * len(ORDER_LINE_INSERT_COLUMNS))})
+"""
+
+SQL_INSERT_STATUS_HISTORY = """
+    INSERT INTO status_history
+    (request_id, old_status, new_status, changed_at, note)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+
+def request_row(header: dict, vendor_id: Optional[int] = None) -> tuple:
+    return (
+        header["requestor_name"],
+        header["department"],
+        header["title"],
+        header["vendor_name"],
+        header["vendor_vat_id"],
+        header.get("commodity_group_id"),
+        header.get("commodity_group_name"),
+        header["total_cost"],
+        header["currency"],
+        header["submit_status"],
+        header["process_status"],
+        header["created_at"],
+        header.get("positions_net"),
+        header.get("shipping_net"),
+        header.get("tax_amount"),
+        header.get("total_is_gross", "yes"),
+        vendor_id,
+        header.get("commodity_group_source"),
+    )
+
+
+def order_line_row(request_id: int, l: dict) -> tuple:
+    return (request_id, l["description"], l["unit_price"], l["quantity"], l.get("unit", ""), l["line_total"])
+
+
+def insert_via_staging(conn: sqlite3.Connection, table: str, columns: tuple, rows: Iterable[tuple]) -> int:
+    # Erst per executemany in eine Temp-Tabelle (ohne Trigger), dann EIN INSERT ... SELECT:
+    # die Trigger auf requests/order_lines laufen so in einem Statement statt in einem pro Zeile.
+    # ORDER BY rowid: Ziel-IDs werden in Eingabe-Reihenfolge vergeben.
+    staging, cols = f"temp.{table}_staging", ", ".join(columns)
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {table}_staging ({cols})")
+    conn.execute(f"DELETE FROM {staging}")
+    conn.executemany(f"INSERT INTO {staging} ({cols}) VALUES ({', '.join('?' * len(columns))})", rows)
+    n = conn.execute(f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {staging} ORDER BY rowid").rowcount
+    conn.execute(f"DELETE FROM {staging}")
+    return n
+
+
+@timed("db")
+def insert_requests(items: Iterable[tuple[dict, list[dict]]]) -> list[int]:
+    """
+    Viele Requests (Header + Order Lines + initialer Status) in EINER Transaktion.
+    Alles oder nichts: bei einem Fehler wird der ganze Batch zurückgerollt.
+    Gibt die neuen Request-IDs in Eingabe-Reihenfolge zurück.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    with get_conn() as conn:
+        # BEGIN IMMEDIATE: Schreib-Lock ab hier → die neuen IDs sind lückenlos fortlaufend
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.execute("SELECT COALESCE(MAX(id), 0) FROM requests").fetchone()[0]
+            # Ein Lookup pro Schreibweise, nicht pro Request (Batch-Import: viele Angebote desselben Vendors)
+            vendor_ids = {}
+            for h, _ in items:
+                key = (h["vendor_name"], h["vendor_vat_id"])
+                if key not in vendor_ids:
+                    vendor_ids[key] = resolve_vendor_id(conn, *key, h["created_at"])
+            insert_via_staging(conn, "requests", REQUEST_INSERT_COLUMNS, (
+                request_row(h, vendor_ids[h["vendor_name"], h["vendor_vat_id"]]) for h, _ in items
+            ))
+            last = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            first = last - len(items) + 1
+            if first <= before:
+                raise RuntimeError(f"Request-IDs nicht fortlaufend (vor Insert max. {before}, jetzt {first}..{last}).")
+            ids = list(range(first, last + 1))
+
+            insert_via_staging(conn, "order_lines", ORDER_LINE_INSERT_COLUMNS, (
+                order_line_row(rid, l) for rid, (_, lines) in zip(ids, items) for l in lines
+            ))
+            conn.executemany(SQL_INSERT_STATUS_HISTORY, (
+                (rid, None, h["process_status"], h["created_at"], "Initial status")
+                for rid, (h, _) in zip(ids, items)
+            ))
+            refresh_search_index(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    invalidate_request_details(ids)
+    return ids
+
+
+# Ohne @timed: wird als db.insert_requests gemessen (sonst zählt jeder Insert doppelt)
+def insert_request(header: dict, lines: list[dict]) -> int:
+    return insert_requests([(header, lines)])[0]
+
+
+SQL_LOAD_REQUESTS = """
+    SELECT id, title, vendor_name, total_cost, currency, submit_status, process_status, created_at,
+           commodity_group_id, commodity_group_name,
+           positions_net, shipping_net, tax_amount, total_is_gross
+    FROM requests
+    ORDER BY id DESC
+"""
+
+SQL_LOAD_ORDER_LINES = """
+    SELECT description, unit_price, quantity, unit, line_total
+    FROM order_lines
+    WHERE request_id = ?
+    ORDER BY id ASC
+"""
+
+SQL_GET_REQUEST_STATUS = "SELECT process_status FROM requests WHERE id = ?"
+
+SQL_LOAD_STATUS_HISTORY = """
+    SELECT old_status, new_status, changed_at, note
+    FROM status_history
+    WHERE request_id = ?
+    ORDER BY id ASC
+"""
+
+@timed("db")
+def load_requests():
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(SQL_LOAD_REQUESTS)
+        return cur.fetchall()
+
+# -----------------------------
+# Overview: Keyset-Pagination + Filter (serverseitig)
+# -----------------------------
+OVERVIEW_PAGE_SIZE = 50
+
+# Filter-Key → (SQL-Bedingung); alles andere wird ignoriert (kein SQL aus User-Input)
+REQUEST_FILTERS = {
+    "process_status": "process_status = ?",
+    "submit_status": "submit_status = ?",
+    "vendor_name": "vendor_name = ?",
+    "vendor_id": "vendor_id = ?",        # alle Schreibweisen eines Vendors (find_vendor)
+    "commodity_group_id": "commodity_group_id = ?",
+    "department": "department = ?",
+    "created_from": "created_at >= ?",   # ISO-Datum/-Zeit, inklusiv
+    "created_to": "created_at < ?",      # ISO-Datum/-Zeit, exklusiv
+}
+
+# Qualifiziert, damit die Liste auch im JOIN mit request_search (eigene title-Spalte) eindeutig ist
+REQUEST_LIST_COLUMNS = ", ".join(f"requests.{c}" for c in (
+    "id", "title", "vendor_name", "total_cost", "currency", "submit_status", "process_status", "created_at",
+    "commodity_group_id", "commodity_group_name",
+    "positions_net", "shipping_net", "tax_amount", "total_is_gross",
+))
+
+def build_request_filters(filters: Optional[dict]) -> tuple[list[str], list]:
+    where, params = [], []
+    for key, cond in REQUEST_FILTERS.items():
+        val = (filters or {}).get(key)
+        if val not in (None, ""):
+            where.append(cond)
+            params.append(val)
+    return where, params
+
+def build_requests_page_query(filters: Optional[dict] = None, after: Optional[tuple] = None,
+                              page_size: int = OVERVIEW_PAGE_SIZE) -> tuple[str, list]:
+    where, params = build_request_filters(filters)
+    if after is not None:
+        # Keyset: alles "älter" als die letzte Zeile der vorigen Seite (created_at, id)
+        where.append("(created_at, id) < (?, ?)")
+        params.extend(after)
+    sql = f"SELECT {REQUEST_LIST_COLUMNS} FROM requests"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(int(page_size))
+    return sql, params
+
+def page_cursor(rows) -> Optional[tuple]:
+    # Cursor für die nächste Seite = (created_at, id) der letzten Zeile
+    return (rows[-1][7], rows[-1][0]) if rows else None
+
+@timed("db")
+def load_requests_page(filters: Optional[dict] = None, after: Optional[tuple] = None,
+                       page_size: int = OVERVIEW_PAGE_SIZE):
+    sql, params = build_requests_page_query(filters, after, page_size)
+    with get_conn() as conn:
+        return conn.execute(sql, params).fetchall()
+
+def build_count_query(filters: Optional[dict] = None) -> tuple[str, list]:
+    where, params = build_request_filters(filters)
+    sql = "SELECT COUNT(*) FROM requests"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql, params
+
+@timed("db")
+def count_requests(filters: Optional[dict] = None) -> int:
+    sql, params = build_count_query(filters)
+    with get_conn() as conn:
+        return conn.execute(sql, params).fetchone()[0]
+
+# -----------------------------
+# Volltextsuche (FTS5, request_search)
+# -----------------------------
+SEARCH_TERM_RE = re.compile(r"\w{2,}")
+SEARCH_MAX_TERMS = 8
+SEARCH_LIMIT = 50
+# Bis zu so vielen Treffern wird nach bm25 sortiert; darüber "neueste zuerst" → FTS5 bricht nach
+# LIMIT Treffern ab, statt für jeden Treffer den Rang zu berechnen (häufige Begriffe wie "laptop")
+SEARCH_RANK_MAX_HITS = 2000
+SEARCH_SHORT_TERM_CHARS = 3
+
+SQL_SEARCH_DIRTY_EXISTS = "SELECT EXISTS (SELECT 1 FROM search_dirty)"
+
+SQL_SEARCH_DELETE_DIRTY = """
+    DELETE FROM request_search WHERE rowid IN (SELECT request_id FROM search_dirty)
+"""
+
+SQL_SEARCH_INSERT_DIRTY = """
+    INSERT INTO request_search (rowid, title, vendor, description)
+    SELECT r.id, r.title, r.vendor_name,
+           (SELECT group_concat(l.description, char(10)) FROM order_lines l WHERE l.request_id = r.id)
+    FROM search_dirty d
+    JOIN requests r ON r.id = d.request_id
+"""
+
+SQL_SEARCH_COUNT = "SELECT COUNT(*) FROM request_search WHERE request_search MATCH ?"
+# Zählt höchstens bis zum Limit: FTS5 hört dann auf, statt jeden Treffer eines häufigen Begriffs zu besuchen
+SQL_SEARCH_COUNT_UPTO = "SELECT COUNT(*) FROM (SELECT 1 FROM request_search WHERE request_search MATCH ? LIMIT ?)"
+
+def refresh_search_index(conn: sqlite3.Connection) -> int:
+    # Läuft in der Transaktion des Aufrufers: gemerkte Requests neu indizieren (gelöschte fallen raus)
+    conn.execute(SQL_SEARCH_DELETE_DIRTY)
+    n = conn.execute(SQL_SEARCH_INSERT_DIRTY).rowcount
+    conn.execute("DELETE FROM search_dirty")
+    return n
+
+def refresh_search_index_if_dirty(conn: sqlite3.Connection):
+    # Nachzügler aus Schreibpfaden ohne refresh (z.B. manuelle Korrekturen direkt in der DB);
+    # im Normalfall nur ein EXISTS auf der (leeren) search_dirty in der Verbindung der Suche
+    if not conn.execute(SQL_SEARCH_DIRTY_EXISTS).fetchone()[0]:
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        refresh_search_index(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+@timed("db")
+def ensure_search_index():
+    with get_conn() as conn:
+        refresh_search_index_if_dirty(conn)
+
+def search_terms(query: str) -> list[str]:
+    return SEARCH_TERM_RE.findall((query or "").lower())[:SEARCH_MAX_TERMS]
+
+def search_match_query(query: str) -> str:
+    # Jedes Wort als Präfix-Phrase ("moos"*), in Anführungszeichen → keine FTS5-Syntax aus User-Input.
+    # Mehrere Phrasen = UND, egal ob in Titel, Vendor oder einer Order Line.
+    return " ".join(f'"{t}"*' for t in search_terms(query))
+
+def search_short_terms_only(query: str) -> bool:
+    # Nur kurze Präfixe ("sch"): treffen fast immer sehr viele Requests und bm25 unterscheidet
+    # kaum → ohne Zähl-Probe direkt die neuesten über den Präfix-Index (prefix = '2 3')
+    return all(len(t) <= SEARCH_SHORT_TERM_CHARS for t in search_terms(query))
+
+def search_ranked(query: str, hits: int) -> bool:
+    """Sortiert search_requests nach Relevanz (sonst neueste zuerst)?"""
+    return not search_short_terms_only(query) and hits <= SEARCH_RANK_MAX_HITS
+
+def build_search_query(match: str, filters: Optional[dict] = None, ranked: bool = True,
+                       limit: int = SEARCH_LIMIT) -> tuple[str, list]:
+    where, params = build_request_filters(filters)
+    sql = f"""
+        SELECT {REQUEST_LIST_COLUMNS}
+        FROM request_search
+        JOIN requests ON requests.id = request_search.rowid
+        WHERE request_search MATCH ?
+    """
+    for cond in where:
+        sql += f" AND {cond}"
+    sql += " ORDER BY request_search.rank" if ranked else " ORDER BY request_search.rowid DESC"
+    sql += " LIMIT ?"
+    return sql, [match, *params, int(limit)]
+
+@timed("db")
+def count_search_hits(query: str, limit: Optional[int] = None) -> int:
+    """Anzahl Treffer; mit limit höchstens limit (genügt für "mehr als N")."""
+    match = search_match_query(query)
+    if not match:
+        return 0
+    with get_conn() as conn:
+        refresh_search_index_if_dirty(conn)
+        if limit is None:
+            return conn.execute(SQL_SEARCH_COUNT, (match,)).fetchone()[0]
+        return conn.execute(SQL_SEARCH_COUNT_UPTO, (match, int(limit))).fetchone()[0]
+
+@timed("db")
+def search_requests(query: str, filters: Optional[dict] = None, limit: int = SEARCH_LIMIT):
+    """
+    Requests (Spalten wie load_requests_page), deren Titel/Vendor/Order Lines alle Suchbegriffe enthalten.
+    Bis SEARCH_RANK_MAX_HITS Treffer nach Relevanz (bm25), darüber die neuesten zuerst.
+    """
+    match = search_match_query(query)
+    if not match:
+        return []
+    with get_conn() as conn:
+        refresh_search_index_if_dirty(conn)
+        ranked = False
+        if not search_short_terms_only(query):
+            # Nur prüfen, ob es mehr als SEARCH_RANK_MAX_HITS sind – nicht alle Treffer zählen
+            hits = conn.execute(SQL_SEARCH_COUNT_UPTO, (match, SEARCH_RANK_MAX_HITS + 1)).fetchone()[0]
+            ranked = search_ranked(query, hits)
+        sql, params = build_search_query(match, filters, ranked, limit)
+        return conn.execute(sql, params).fetchall()
+
+@timed("db")
+def load_order_lines(request_id: int):
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(SQL_LOAD_ORDER_LINES, (request_id,))
+        return cur.fetchall()
+
+@timed("db")
+def get_request_status(request_id: int):
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(SQL_GET_REQUEST_STATUS, (request_id,))
+        row = cur.fetchone()
+    return row[0] if row else None
+
+# Compare-and-set: ändert nur, wenn der Status noch der erwartete ist (kein Lost Update zwischen zwei Einkäufern)
+SQL_CAS_REQUEST_STATUS = """
+    UPDATE requests SET process_status = ?
+    WHERE id = ? AND process_status = ?
+"""
+
+# Bulk: History zuerst aus dem aktuellen Stand (old_status), danach derselbe Filter im UPDATE.
+# Beide laufen in einer BEGIN-IMMEDIATE-Transaktion → dazwischen kann niemand schreiben.
+SQL_BULK_STATUS_HISTORY = """
+    INSERT INTO status_history (request_id, old_status, new_status, changed_at, note)
+    SELECT id, process_status, ?, ?, ?
+    FROM requests
+    WHERE id IN (SELECT value FROM json_each(?))
+      AND process_status != ?
+      AND (? IS NULL OR process_status = ?)
+"""
+
+SQL_BULK_UPDATE_STATUS = """
+    UPDATE requests SET process_status = ?
+    WHERE id IN (SELECT value FROM json_each(?))
+      AND process_status != ?
+      AND (? IS NULL OR process_status = ?)
+    RETURNING id
+"""
+
+
+@timed("db")
+def update_request_status(request_id: int, new_status: str, note: str = "",
+                          expected_status: Optional[str] = None) -> tuple[bool, Optional[str]]:
+    """
+    Atomarer Statuswechsel inkl. History-Eintrag in einer kurzen Schreib-Transaktion.
+    expected_status = der Status, den der Nutzer gesehen hat; None = aktueller Stand.
+    Rückgabe (ok, old_status); bei Konflikt (False, tatsächlicher Status), unbekannte ID → (False, None).
+    """
+    with get_conn() as conn:
+        # BEGIN IMMEDIATE: Schreib-Lock sofort holen statt mitten in der Transaktion auf "locked" zu laufen
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if expected_status is None:
+                row = conn.execute(SQL_GET_REQUEST_STATUS, (request_id,)).fetchone()
+                if row is None:
+                    conn.rollback()
+                    return False, None
+                expected_status = row[0]
+
+            if new_status == expected_status:
+                row = conn.execute(SQL_GET_REQUEST_STATUS, (request_id,)).fetchone()
+                conn.rollback()
+                current = row[0] if row else None
+                return current == expected_status, current
+
+            if conn.execute(SQL_CAS_REQUEST_STATUS, (new_status, request_id, expected_status)).rowcount != 1:
+                row = conn.execute(SQL_GET_REQUEST_STATUS, (request_id,)).fetchone()
+                conn.rollback()
+                # Konflikt = jemand anders hat geschrieben → gecachtes Detail ist veraltet
+                invalidate_request_details([request_id])
+                return False, row[0] if row else None
+
+            conn.execute(SQL_INSERT_STATUS_HISTORY, (
+                request_id,
+                expected_status,
+                new_status,
+                datetime.now().isoformat(timespec="seconds"),
+                note.strip(),
+            ))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    invalidate_request_details([request_id])
+    return True, expected_status
+
+
+@timed("db")
+def update_request_statuses(request_ids: Iterable[int], new_status: str, note: str = "",
+                            expected_status: Optional[str] = None) -> list[int]:
+    """
+    Mehrere Requests auf einmal verschieben (eine Transaktion, zwei Statements).
+    Nur Requests, die noch expected_status haben (None = beliebig) und nicht schon new_status.
+    Gibt die tatsächlich geänderten IDs zurück.
+    """
+    ids_json = json.dumps(sorted({int(i) for i in request_ids}))
+    if ids_json == "[]":
+        return []
+    changed_at = datetime.now().isoformat(timespec="seconds")
+    cond = (new_status, expected_status, expected_status)
+
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(SQL_BULK_STATUS_HISTORY, (new_status, changed_at, note.strip(), ids_json) + cond)
+            changed = [r[0] for r in conn.execute(SQL_BULK_UPDATE_STATUS, (new_status, ids_json) + cond)]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    invalidate_request_details(changed)
+    return sorted(changed)
+
+
+@timed("db")
+def load_status_history(request_id: int):
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(SQL_LOAD_STATUS_HISTORY, (request_id,))
+        return cur.fetchall()
+
+
+# -----------------------------
+# Request-Details: ein Aufruf + In-Process-LRU (Invalidierung durch die Schreib-Helfer)
+# -----------------------------
+DETAIL_CACHE_SIZE = 256
+# Sicherheitsnetz für Schreiber außerhalb dieses Prozesses (z.B. Batch-CLI parallel zur App)
+DETAIL_CACHE_TTL_S = 60
+
+SQL_LOAD_REQUEST_HEADER = f"SELECT {REQUEST_LIST_COLUMNS} FROM requests WHERE requests.id = ?"
+
+_detail_cache: "OrderedDict[tuple[str, int], tuple[float, dict]]" = OrderedDict()
+_detail_cache_lock = threading.Lock()
+# Generationen: ein Leser, der vor einer Invalidierung angefangen hat, darf seinen (evtl. alten) Snapshot
+# danach nicht mehr ablegen. Pro Key für gezielte Invalidierungen, _detail_epoch für "alles verwerfen".
+_detail_generations: dict[tuple[str, int], int] = {}
+_detail_epoch = 0
+
+def fetch_request_detail(conn: sqlite3.Connection, request_id: int) -> Optional[dict]:
+    # Eine Lese-Transaktion → Kopf, Positionen und Historie aus demselben Snapshot
+    conn.execute("BEGIN")
+    try:
+        header = conn.execute(SQL_LOAD_REQUEST_HEADER, (request_id,)).fetchone()
+        if header is None:
+            return None
+        return {
+            "header": header,
+            "process_status": header[6],
+            "lines": tuple(conn.execute(SQL_LOAD_ORDER_LINES, (request_id,)).fetchall()),
+            "history": tuple(conn.execute(SQL_LOAD_STATUS_HISTORY, (request_id,)).fetchall()),
+        }
+    finally:
+        conn.rollback()
+
+@timed("db")
+def load_request_detail(request_id: int) -> Optional[dict]:
+    """
+    Kopf (Spalten wie load_requests_page), process_status, Order Lines und Status-Historie eines Requests.
+    Aus dem Cache, solange kein Schreib-Helfer den Request geändert hat. Ergebnis nicht verändern (geteilt).
+    """
+    key = (DB_PATH, int(request_id))
+    now = time.monotonic()
+    with _detail_cache_lock:
+        hit = _detail_cache.get(key)
+        if hit is not None and now - hit[0] < DETAIL_CACHE_TTL_S:
+            _detail_cache.move_to_end(key)
+            return hit[1]
+        generation = (_detail_epoch, _detail_generations.get(key, 0))
+
+    with get_conn() as conn:
+        detail = fetch_request_detail(conn, int(request_id))
+    # Unbekannte IDs nicht cachen: der Request kann gleich (auch aus einem anderen Prozess) angelegt werden
+    if detail is not None:
+        with _detail_cache_lock:
+            if generation != (_detail_epoch, _detail_generations.get(key, 0)):
+                # Während des Lesens geändert → Snapshot evtl. veraltet, nächster Aufruf liest neu
+                return detail
+            _detail_cache[key] = (now, detail)
+            _detail_cache.move_to_end(key)
+            while len(_detail_cache) > DETAIL_CACHE_SIZE:
+                _detail_cache.popitem(last=False)
+    return detail
+
+def invalidate_request_details(request_ids: Optional[Iterable[int]] = None):
+    # None = alles verwerfen (z.B. nach Reparaturen direkt an der DB)
+    global _detail_epoch
+    with _detail_cache_lock:
+        if request_ids is None or len(_detail_generations) > 16 * DETAIL_CACHE_SIZE:
+            # Epoch hochzählen statt unbegrenzt viele Zähler pro Key zu halten
+            _detail_epoch += 1
+            _detail_generations.clear()
+        if request_ids is None:
+            _detail_cache.clear()
+            return
+        for rid in request_ids:
+            key = (DB_PATH, int(rid))
+            _detail_generations[key] = _detail_generations.get(key, 0) + 1
+            _detail_cache.pop(key, None)
+
+
+# -----------------------------
+# Batch-Import: Fortschritt (resumable)
+# -----------------------------
+SQL_LOAD_INGESTED_HASHES = "SELECT file_hash FROM ingest_log WHERE status = 'done'"
+
+@timed("db")
+def load_ingested_hashes() -> set[str]:
+    with get_conn() as conn:
+        return {r[0] for r in conn.execute(SQL_LOAD_INGESTED_HASHES)}
+
+@timed("db")
+def record_ingest(file_hash: str, file_name: str, status: str, request_id: Optional[int] = None,
+                  error: Optional[str] = None):
+    with get_conn() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO ingest_log (file_hash, file_name, status, request_id, error, processed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (file_hash, file_name, status, request_id, error, datetime.now().isoformat(timespec="seconds")))
+        conn.commit()
+
+
+# -----------------------------
+# Extraktions-Cache (Policy/Zähler in extraction_cache.py)
+# -----------------------------
+SQL_CACHE_GET = "SELECT offer_json FROM extraction_cache WHERE cache_key = ?"
+SQL_CACHE_TOUCH = "UPDATE extraction_cache SET hit_count = hit_count + ?, last_used_at = ? WHERE cache_key = ?"
+SQL_CACHE_EVICT_AGE = "DELETE FROM extraction_cache WHERE last_used_at < ?"
+# Alles jenseits des Byte-Budgets fliegt raus, die zuletzt genutzten Einträge bleiben
+SQL_CACHE_EVICT_SIZE = """
+    DELETE FROM extraction_cache WHERE cache_key IN (
+        SELECT cache_key FROM (
+            SELECT cache_key, SUM(size_bytes) OVER (ORDER BY last_used_at DESC, cache_key) AS running
+            FROM extraction_cache
+        ) WHERE running > ?
+    )
+"""
+SQL_CACHE_STATS = "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0), COALESCE(SUM(hit_count), 0) FROM extraction_cache"
+
+@timed("db")
+def cache_get(cache_key: str) -> Optional[str]:
+    # Nur lesen: Trefferzähler/last_used_at sammelt extraction_cache und schreibt sie gebündelt (cache_touch)
+    with get_conn() as conn:
+        row = conn.execute(SQL_CACHE_GET, (cache_key,)).fetchone()
+    return row[0] if row is not None else None
+
+@timed("db")
+def cache_touch(touches: Iterable[tuple[int, str, str]]):
+    """(Anzahl Treffer, zuletzt genutzt, cache_key) für mehrere Einträge in einem Commit."""
+    with get_conn() as conn:
+        conn.executemany(SQL_CACHE_TOUCH, touches)
+        conn.commit()
+
+@timed("db")
+def cache_put(cache_key: str, model: str, prompt_version: str, offer_json: str):
+    now = datetime.now().isoformat(timespec="seconds")
+    with get_conn() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO extraction_cache
+            (cache_key, model, prompt_version, offer_json, size_bytes, hit_count, created_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?, 0, ?, ?)
+        """, (cache_key, model, prompt_version, offer_json, len(offer_json.encode("utf-8")), now, now))
+        conn.commit()
+
+@timed("db")
+def cache_evict(max_bytes: int, older_than: str) -> int:
+    with get_conn() as conn:
+        removed = conn.execute(SQL_CACHE_EVICT_AGE, (older_than,)).rowcount
+        removed += conn.execute(SQL_CACHE_EVICT_SIZE, (max_bytes,)).rowcount
+        conn.commit()
+    return removed
+
+@timed("db")
+def cache_stats() -> dict:
+    with get_conn() as conn:
+        entries, size, hits = conn.execute(SQL_CACHE_STATS).fetchone()
+    return {"entries": entries, "bytes": size, "stored_hits": hits}
+
+
+# -----------------------------
+# Trainingsdaten für den lokalen Commodity-Klassifikator
+# -----------------------------
+# Nur abgeschickte Requests mit KI-Label (oder unbekannter Herkunft aus der Zeit vor migrate_012):
+# Drafts, Heuristik-Fallbacks und eigene Vorhersagen des Klassifikators würden sich sonst selbst bestätigen
+TRAINING_LABEL_SOURCES = ("KI",)
+
+SQL_LOAD_TRAINING_EXAMPLES = f"""
+    SELECT r.id, r.commodity_group_id, r.title, r.vendor_name, GROUP_CONCAT(ol.description, ' ')
+    FROM requests r
+    LEFT JOIN order_lines ol ON ol.request_id = r.id
+    WHERE r.id > ? AND r.commodity_group_id IS NOT NULL AND r.commodity_group_id != ''
+      AND +r.submit_status = 'Submitted'  -- "+": über den Primärschlüssel ab id lesen, nicht über den Status-Index
+      AND (r.commodity_group_source IS NULL
+           OR r.commodity_group_source IN ({", ".join(f"'{s}'" for s in TRAINING_LABEL_SOURCES)}))
+    GROUP BY r.id
+    ORDER BY r.id
+"""
+
+@timed("db")
+def load_training_examples(after_id: int = 0):
+    with get_conn() as conn:
+        return conn.execute(SQL_LOAD_TRAINING_EXAMPLES, (after_id,)).fetchall()
+
+
+# -----------------------------
+# Spend-Analytics: Lesen (nur vorverdichtete Zeilen aus spend_summary)
+# -----------------------------
+SPEND_FILTERS = {
+    "month_from": "month >= ?",          # "YYYY-MM", inklusiv
+    "month_to": "month <= ?",            # "YYYY-MM", inklusiv
+    "currency": "currency = ?",
+    "submit_status": "submit_status = ?",
+    "process_status": "process_status = ?",
+    "commodity_group_id": "commodity_group_id = ?",
+    "vendor_name": "vendor_name = ?",
+    "department": "department = ?",
+}
+
+def build_spend_query(group_by: str, filters: Optional[dict] = None) -> tuple[str, list]:
+    # Gruppierung immer zusätzlich nach Währung: EUR und USD werden nie addiert
+    if group_by not in SPEND_KEY_COLUMNS:
+        raise ValueError(f"Unbekannte Dimension: {group_by}")
+    where, params = [], []
+    for key, cond in SPEND_FILTERS.items():
+        val = (filters or {}).get(key)
+        if val not in (None, ""):
+            where.append(cond)
+            params.append(val)
+    sql = f"""
+        SELECT {group_by}, currency, SUM(request_count), {", ".join(f"SUM({m})" for m in SPEND_MEASURES)}
+        FROM spend_summary
+    """
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" GROUP BY {group_by}, currency ORDER BY "
+    sql += f"{group_by}, currency" if group_by == "month" else "SUM(total_cost) DESC"
+    return sql, params
+
+@timed("db")
+def load_spend(group_by: str, filters: Optional[dict] = None):
+    """(dimension, currency, request_count, total_cost, positions_net, tax_amount) pro Gruppe."""
+    sql, params = build_spend_query(group_by, filters)
+    with get_conn() as conn:
+        return conn.execute(sql, params).fetchall()
+
+SQL_SPEND_SUMMARY_ALL = f"""
+    SELECT {", ".join(SPEND_KEY_COLUMNS)}, request_count, {", ".join(SPEND_MEASURES)}
+    FROM spend_summary
+"""
+
+def check_spend_summary(conn: sqlite3.Connection, tolerance: float = 0.005) -> list[str]:
+    """Vergleicht spend_summary mit einer Neuberechnung aus requests; leer = konsistent."""
+    n_keys = len(SPEND_KEY_COLUMNS)
+    stored = {row[:n_keys]: row[n_keys:] for row in conn.execute(SQL_SPEND_SUMMARY_ALL)}
+    expected = {row[:n_keys]: row[n_keys:] for row in conn.execute(SQL_SPEND_RECOMPUTE_BY_VENDOR)}
+    problems = []
+    for key in sorted(stored.keys() | expected.keys()):
+        got, want = stored.get(key), expected.get(key)
+        if got is None or want is None:
+            problems.append(f"{key}: gespeichert {got}, neu berechnet {want}")
+        elif got[0] != want[0] or any(abs(g - w) > tolerance for g, w in zip(got[1:], want[1:])):
+            problems.append(f"{key}: gespeichert {got}, neu berechnet {want}")
+    return problems
+
+def rebuild_spend_summary(conn: sqlite3.Connection):
+    # Reparatur nach manuellen Eingriffen an der DB (Trigger umgangen)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM spend_summary")
+        conn.execute(f"INSERT INTO spend_summary {SQL_SPEND_RECOMPUTE_BY_VENDOR}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# -----------------------------
+# Auto-Fill-Jobs (Queue; Worker + Policy in autofill_jobs.py)
+# -----------------------------
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+SQL_ENQUEUE_JOB = """
+    INSERT INTO autofill_jobs (status, source_kind, source_name, payload, title, max_attempts, run_after, created_at)
+    VALUES ('queued', ?, ?, ?, ?, ?, ?, ?)
+"""
+# Fällige Jobs zuerst nach Alter; "running" mit abgelaufenem Lease = Worker ist gestorben → neu vergeben
+SQL_NEXT_QUEUED_JOB = """
+    SELECT id FROM autofill_jobs WHERE status = 'queued' AND run_after <= ? ORDER BY run_after LIMIT 1
+"""
+SQL_NEXT_EXPIRED_JOB = """
+    SELECT id FROM autofill_jobs WHERE status = 'running' AND locked_until < ? ORDER BY locked_until LIMIT 1
+"""
+SQL_CLAIM_JOB = """
+    UPDATE autofill_jobs
+    SET status = 'running', attempts = attempts + 1, started_at = ?, locked_until = ?, partial_json = NULL
+    WHERE id = ?
+    RETURNING id, source_kind, source_name, payload, title, attempts, max_attempts
+"""
+SQL_FINISH_JOB = """
+    UPDATE autofill_jobs
+    SET status = 'done', result_json = ?, error = NULL, payload = NULL, partial_json = NULL, locked_until = NULL,
+        finished_at = ?
+    WHERE id = ? AND status = 'running'
+"""
+SQL_RETRY_JOB = """
+    UPDATE autofill_jobs
+    SET status = 'queued', error = ?, run_after = ?, locked_until = NULL
+    WHERE id = ? AND status = 'running'
+"""
+SQL_FAIL_JOB = """
+    UPDATE autofill_jobs
+    SET status = 'failed', error = ?, payload = NULL, partial_json = NULL, locked_until = NULL, finished_at = ?
+    WHERE id = ? AND status = 'running'
+"""
+# Nur solange der Job läuft: ein spätes Teilergebnis überschreibt nichts mehr
+SQL_UPDATE_JOB_PARTIAL = """
+    UPDATE autofill_jobs SET partial_json = ? WHERE id = ? AND status = 'running'
+"""
+SQL_GET_JOB = """
+    SELECT id, status, source_kind, source_name, result_json, partial_json, error, attempts, max_attempts,
+           created_at, started_at, finished_at
+    FROM autofill_jobs WHERE id = ?
+"""
+SQL_JOB_COUNTS = "SELECT status, COUNT(*) FROM autofill_jobs GROUP BY status"
+SQL_PURGE_JOBS = "DELETE FROM autofill_jobs WHERE status IN ('done', 'failed') AND finished_at < ?"
+
+@timed("db")
+def enqueue_job(source_kind: str, source_name: Optional[str], payload: bytes, title: str,
+                max_attempts: int) -> int:
+    now = datetime.now().isoformat(timespec="seconds")
+    with get_conn() as conn:
+        cur = conn.execute(SQL_ENQUEUE_JOB, (source_kind, source_name, payload, title, max_attempts, now, now))
+        conn.commit()
+    return cur.lastrowid
+
+@timed("db")
+def claim_job(lease_s: float) -> Optional[dict]:
+    """Nächsten fälligen Job auf 'running' setzen (atomar, auch über Prozesse); None = nichts zu tun."""
+    now = datetime.now()
+    now_s = now.isoformat(timespec="seconds")
+    with get_conn() as conn:
+        # Billiger Lese-Check vorab: leere Queue soll keinen Schreib-Lock nehmen
+        if (conn.execute(SQL_NEXT_QUEUED_JOB, (now_s,)).fetchone() is None
+                and conn.execute(SQL_NEXT_EXPIRED_JOB, (now_s,)).fetchone() is None):
+            return None
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = (conn.execute(SQL_NEXT_QUEUED_JOB, (now_s,)).fetchone()
+                   or conn.execute(SQL_NEXT_EXPIRED_JOB, (now_s,)).fetchone())
+            job = None
+            if row is not None:
+                locked_until = (now + timedelta(seconds=lease_s)).isoformat(timespec="seconds")
+                job = conn.execute(SQL_CLAIM_JOB, (now_s, locked_until, row[0])).fetchone()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    if job is None:
+        return None
+    keys = ("id", "source_kind", "source_name", "payload", "title", "attempts", "max_attempts")
+    return dict(zip(keys, job))
+
+@timed("db")
+def finish_job(job_id: int, result_json: str) -> bool:
+    with get_conn() as conn:
+        ok = conn.execute(SQL_FINISH_JOB, (result_json, datetime.now().isoformat(timespec="seconds"), job_id)).rowcount
+        conn.commit()
+    return bool(ok)
+
+@timed("db")
+def update_job_partial(job_id: int, partial_json: str) -> bool:
+    with get_conn() as conn:
+        ok = conn.execute(SQL_UPDATE_JOB_PARTIAL, (partial_json, job_id)).rowcount
+        conn.commit()
+    return bool(ok)
+
+@timed("db")
+def retry_job(job_id: int, error: str, delay_s: float) -> bool:
+    run_after = (datetime.now() + timedelta(seconds=delay_s)).isoformat(timespec="seconds")
+    with get_conn() as conn:
+        ok = conn.execute(SQL_RETRY_JOB, (error, run_after, job_id)).rowcount
+        conn.commit()
+    return bool(ok)
+
+@timed("db")
+def fail_job(job_id: int, error: str) -> bool:
+    with get_conn() as conn:
+        ok = conn.execute(SQL_FAIL_JOB, (error, datetime.now().isoformat(timespec="seconds"), job_id)).rowcount
+        conn.commit()
+    return bool(ok)
+
+@timed("db")
+def get_job(job_id: int) -> Optional[dict]:
+    with get_conn() as conn:
+        row = conn.execute(SQL_GET_JOB, (job_id,)).fetchone()
+    if row is None:
+        return None
+    keys = ("id", "status", "source_kind", "source_name", "result_json", "partial_json", "error", "attempts",
+            "max_attempts", "created_at", "started_at", "finished_at")
+    return dict(zip(keys, row))
+
+@timed("db")
+def job_counts() -> dict:
+    with get_conn() as conn:
+        counts = dict(conn.execute(SQL_JOB_COUNTS).fetchall())
+    return {s: counts.get(s, 0) for s in JOB_STATUSES}
+
+@timed("db")
+def purge_jobs(older_than: str) -> int:
+    with get_conn() as conn:
+        removed = conn.execute(SQL_PURGE_JOBS, (older_than,)).rowcount
+        conn.commit()
+    return removed
+
+
+# -----------------------------
+# Query-Plan-Prüfung (EXPLAIN QUERY PLAN)
+# -----------------------------
+# Jede Lese-Query der App gehört hier rein. allow_scan nur, wenn ein kompletter
+# Durchlauf fachlich gewollt ist.
+QUERY_PLAN_CHECKS = [
+    # (name, sql, beispiel-parameter, allow_scan)
+    ("load_requests", SQL_LOAD_REQUESTS, (), True),
+    ("load_requests_page", *build_requests_page_query(), False),
+    ("load_requests_page:after", *build_requests_page_query(after=("2024-01-01T00:00:00", 1)), False),
+    *[
+        (f"load_requests_page:{key}", *build_requests_page_query({key: "x"}, after=("2024-01-01T00:00:00", 1)), False)
+        for key in REQUEST_FILTERS
+    ],
+    ("count_requests", *build_count_query(), False),
+    *[(f"count_requests:{key}", *build_count_query({key: "x"}), False) for key in REQUEST_FILTERS],
+    ("load_order_lines", SQL_LOAD_ORDER_LINES, (1,), False),
+    ("get_request_status", SQL_GET_REQUEST_STATUS, (1,), False),
+    ("load_status_history", SQL_LOAD_STATUS_HISTORY, (1,), False),
+    ("load_request_header", SQL_LOAD_REQUEST_HEADER, (1,), False),
+    ("load_ingested_hashes", SQL_LOAD_INGESTED_HASHES, (), True),
+    ("load_training_examples", SQL_LOAD_TRAINING_EXAMPLES, (0,), False),
+    ("cache_get", SQL_CACHE_GET, ("k",), False),
+    ("cache_touch", SQL_CACHE_TOUCH, (1, "2024-01-01", "k"), False),
+    ("cache_evict_age", SQL_CACHE_EVICT_AGE, ("2024-01-01",), False),
+    ("cache_evict_size", SQL_CACHE_EVICT_SIZE, (1,), True),
+    ("cache_stats", SQL_CACHE_STATS, (), True),
+    ("next_queued_job", SQL_NEXT_QUEUED_JOB, ("2024-01-01T00:00:00",), False),
+    ("next_expired_job", SQL_NEXT_EXPIRED_JOB, ("2024-01-01T00:00:00",), False),
+    ("get_job", SQL_GET_JOB, (1,), False),
+    ("job_counts", SQL_JOB_COUNTS, (), False),
+    ("purge_jobs", SQL_PURGE_JOBS, ("2024-01-01T00:00:00",), True),
+    ("vendor_by_vat", SQL_VENDOR_BY_VAT, ("DE123456789",), False),
+    ("vendor_by_name", SQL_VENDOR_BY_NAME, ("muster gmbh",), False),
+    # Gruppierung über die Index-Treffer der Trigramme (json_each = Tabellenfunktion) → Scan gewollt
+    ("vendor_candidates", SQL_VENDOR_CANDIDATES, (7, '["  m", " mu", "mus"]', 0.7, 5), True),
+    # Suche: FTS5-MATCH erscheint im Plan als "SCAN ... VIRTUAL TABLE INDEX n:M" (Index-Zugriff)
+    ("search_requests", *build_search_query('"moos"* "wand"*'), True),
+    ("search_requests:recent", *build_search_query('"moos"*', ranked=False), True),
+    ("search_count", SQL_SEARCH_COUNT, ('"moos"*',), True),
+    ("search_count_upto", SQL_SEARCH_COUNT_UPTO, ('"moos"*', 2001), True),
+    ("search_dirty_exists", SQL_SEARCH_DIRTY_EXISTS, (), True),
+    # spend_summary ist klein (eine Zeile pro Gruppe) → Scan + Gruppierung gewollt
+    *[(f"load_spend:{dim}", *build_spend_query(dim), True) for dim in SPEND_KEY_COLUMNS],
+]
+
+def explain_query_plan(conn: sqlite3.Connection, sql: str, params=()) -> list[str]:
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+def is_full_scan(detail: str) -> bool:
+    # "SCAN t" = Tabellen-Scan, "SCAN t USING INDEX ..." = Index-Scan (ok),
+    # "USE TEMP B-TREE" = Sortierung ohne passenden Index
+    if detail.startswith("SCAN ") and " USING " not in detail:
+        return True
+    return detail.startswith("USE TEMP B-TREE")
+
+def check_query_plans(conn: sqlite3.Connection, checks=None) -> list[tuple[str, str]]:
+    """Gibt (query_name, plan_zeile) für jeden unerwünschten Scan zurück; leer = alles indiziert."""
+    problems = []
+    for name, sql, params, allow_scan in (checks or QUERY_PLAN_CHECKS):
+        if allow_scan:
+            continue
+        for detail in explain_query_plan(conn, sql, params):
+            if is_full_scan(detail):
+                problems.append((name, detail))
+    return problems
@@ -0,0 +1,174 @@
+"""
+Datei → Text (Upload + Batch-Import).
+
+iter_document_text() liefert den Text stückweise (PDF: Seite für Seite,
+DOCX: Absatz für Absatz bzw. Tabellenzeile für Tabellenzeile, in Dokument-Reihenfolge),
+damit Normalisierung und Redaction direkt auf dem Strom arbeiten können.
+Große PDFs werden seitenweise auf einen Prozess-Pool verteilt; DOCX wird aus dem
+Speicher gelesen (keine Temp-Dateien). Zu große Dokumente werden vorher abgewiesen.
+pypdf und python-docx werden erst beim ersten Dokument des jeweiligen Typs geladen.
+"""
+import io
+import os
+import threading
+from typing import TYPE_CHECKING, BinaryIO, Iterator, Optional, Union
+
+from metrics import timed
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+    from docx.table import Table
+
+MAX_DOCUMENT_BYTES = 20 * 1024 * 1024
+MAX_PDF_PAGES = 200
+
+# Unterhalb dieser Seitenzahl lohnt der Prozess-Pool nicht (Start + Übertragung der Bytes)
+PDF_PARALLEL_MIN_PAGES = 8
+PDF_PAGES_PER_TASK = 4
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+
+SUPPORTED_SUFFIXES = (".pdf", ".docx", ".txt")
+# Endet jede PDF-Seite: offer_chunking schneidet lange Angebote an Seitengrenzen (Whitespace für alle anderen)
+PAGE_BREAK = "\f"
+
+
+class DocumentTooLargeError(ValueError):
+    pass
+
+
+def check_document_size(size: int):
+    if size > MAX_DOCUMENT_BYTES:
+        raise DocumentTooLargeError(
+            f"Dokument ist zu groß ({size / 1024 / 1024:.1f} MB, max. {MAX_DOCUMENT_BYTES // 1024 // 1024} MB)."
+        )
+
+
+# -----------------------------
+# PDF
+# -----------------------------
+_pdf_pool: Optional["ProcessPoolExecutor"] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def get_pdf_pool() -> "ProcessPoolExecutor":
+    global _pdf_pool
+    if _pdf_pool is None:
+        with _pdf_pool_lock:
+            if _pdf_pool is None:
+                # Erst beim ersten großen PDF: concurrent.futures.process zieht multiprocessing nach
+                from concurrent.futures import ProcessPoolExecutor
+
+                _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _pdf_pool
+
+
+def _extract_pdf_pages(data: bytes, start: int, stop: int) -> list[str]:
+    # Läuft im Prozess-Pool: jeder Worker öffnet das PDF selbst und liest nur seinen Seitenbereich
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    return [(reader.pages[i].extract_text() or "") + PAGE_BREAK for i in range(start, stop)]
+
+
+def iter_pdf_pages(stream: BinaryIO, parallel: bool = True) -> Iterator[str]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(stream)
+    n_pages = len(reader.pages)
+    if n_pages > MAX_PDF_PAGES:
+        raise DocumentTooLargeError(f"PDF hat zu viele Seiten ({n_pages}, max. {MAX_PDF_PAGES}).")
+
+    if not parallel or PDF_WORKERS < 2 or n_pages < PDF_PARALLEL_MIN_PAGES:
+        for page in reader.pages:
+            yield (page.extract_text() or "") + PAGE_BREAK
+        return
+
+    stream.seek(0)
+    data = stream.read()
+    ranges = [(i, min(i + PDF_PAGES_PER_TASK, n_pages)) for i in range(0, n_pages, PDF_PAGES_PER_TASK)]
+    futs = [get_pdf_pool().submit(_extract_pdf_pages, data, start, stop) for start, stop in ranges]
+    try:
+        # In Seiten-Reihenfolge ausliefern, sobald der jeweils nächste Bereich fertig ist
+        for fut in futs:
+            yield from fut.result()
+    finally:
+        for fut in futs:
+            fut.cancel()
+
+
+# -----------------------------
+# DOCX
+# -----------------------------
+def _table_rows(table: "Table") -> Iterator[str]:
+    for row in table.rows:
+        cells, last_tc = [], None
+        for cell in row.cells:
+            # Verbundene Zellen tauchen in row.cells mehrfach auf → nur einmal übernehmen
+            if cell._tc is last_tc:
+                continue
+            last_tc = cell._tc
+            text = " ".join(p.text.strip() for p in cell.paragraphs if p.text.strip())
+            if text:
+                cells.append(text)
+        if cells:
+            yield " | ".join(cells)
+
+
+def iter_docx_blocks(stream: BinaryIO) -> Iterator[str]:
+    from docx import Document
+    from docx.table import Table
+
+    doc = Document(stream)
+    # Absätze und Tabellen in Dokument-Reihenfolge (Positionen stehen meist in Tabellen)
+    for block in doc.iter_inner_content():
+        if isinstance(block, Table):
+            yield from _table_rows(block)
+        elif block.text:
+            yield block.text
+
+
+# -----------------------------
+# TXT
+# -----------------------------
+def iter_txt_lines(stream: BinaryIO) -> Iterator[str]:
+    for raw in stream:
+        yield raw.decode("utf-8", errors="ignore").rstrip("\r\n")
+
+
+# -----------------------------
+# Einstieg
+# -----------------------------
+def iter_document_text(filename: str, source: Union[bytes, BinaryIO], parallel: bool = True) -> Iterator[str]:
+    """Text-Stücke in Dokument-Reihenfolge; DocumentTooLargeError bei Überschreitung der Limits."""
+    stream = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    stream.seek(0, io.SEEK_END)
+    check_document_size(stream.tell())
+    stream.seek(0)
+
+    name = filename.lower()
+    if name.endswith(".txt"):
+        return iter_txt_lines(stream)
+    if name.endswith(".docx"):
+        return iter_docx_blocks(stream)
+    if name.endswith(".pdf"):
+        # nur Text-PDFs, Scans liefern leere Seiten
+        return iter_pdf_pages(stream, parallel=parallel)
+    return iter(())
+
+
+def iter_uploaded_file_text(uploaded_file) -> Iterator[str]:
+    if uploaded_file is None:
+        return iter(())
+    # UploadedFile ist ein BytesIO → direkt lesen, ohne getvalue()-Kopie
+    return iter_document_text(uploaded_file.name, uploaded_file)
+
+
+@timed("parse", "bytes")
+def extract_text_from_bytes(filename: str, data: bytes, parallel: bool = True) -> str:
+    return "\n".join(iter_document_text(filename, data, parallel=parallel))
+
+
+@timed("parse", "uploaded_file")
+def extract_text_from_uploaded_file(uploaded_file) -> str:
+    return "\n".join(iter_uploaded_file_text(uploaded_file))
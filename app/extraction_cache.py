@@ -0,0 +1,94 @@
+"""
+Inhaltsadressierter Cache für KI-Extraktionen.
+
+Key = sha256(Modell + Prompt-Version + normalisierter, redigierter Text),
+gespeichert wird nur das ExtractedOffer-JSON (kein Angebotstext → DSGVO).
+"""
+import threading
+from datetime import datetime, timedelta
+
+import db
+
+CACHE_MAX_BYTES = 50 * 1024 * 1024
+CACHE_MAX_AGE_DAYS = 90
+EVICT_EVERY_N_PUTS = 50
+# Treffer werden gesammelt und gebündelt geschrieben statt ein UPDATE+COMMIT pro Lesezugriff
+TOUCH_FLUSH_EVERY_N_HITS = 20
+
+_stats = {"hits": 0, "misses": 0, "puts": 0, "evicted": 0, "errors": 0}
+_stats_lock = threading.Lock()
+_touches: dict[str, list] = {}   # cache_key → [Treffer, zuletzt genutzt]
+_touches_lock = threading.Lock()
+
+
+def _count(name: str, n: int = 1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def get(cache_key: str):
+    try:
+        offer_json = db.cache_get(cache_key)
+    except Exception:
+        # Cache darf Auto-Fill nie blockieren (z.B. DB gelockt)
+        offer_json = None
+        _count("errors")
+    _count("hits" if offer_json is not None else "misses")
+    if offer_json is not None:
+        _touch(cache_key)
+    return offer_json
+
+
+def _touch(cache_key: str):
+    now = datetime.now().isoformat(timespec="seconds")
+    with _touches_lock:
+        touch = _touches.setdefault(cache_key, [0, now])
+        touch[0] += 1
+        touch[1] = now
+        due = sum(t[0] for t in _touches.values()) >= TOUCH_FLUSH_EVERY_N_HITS
+    if due:
+        flush_touches()
+
+
+def flush_touches():
+    # Vor dem Aufräumen/der Statistik: LRU-Reihenfolge und Trefferzahl in der DB aktuell halten
+    with _touches_lock:
+        pending = [(n, used_at, key) for key, (n, used_at) in _touches.items()]
+        _touches.clear()
+    if not pending:
+        return
+    try:
+        db.cache_touch(pending)
+    except Exception:
+        _count("errors")
+
+
+def put(cache_key: str, model: str, prompt_version: str, offer_json: str):
+    # Nach einem (bezahlten) KI-Aufruf: Fehler beim Speichern/Aufräumen dürfen Auto-Fill nicht scheitern lassen
+    try:
+        db.cache_put(cache_key, model, prompt_version, offer_json)
+        with _stats_lock:
+            _stats["puts"] += 1
+            due = _stats["puts"] % EVICT_EVERY_N_PUTS == 0
+        if due:
+            evict()
+    except Exception:
+        _count("errors")
+
+
+def evict(max_bytes: int = CACHE_MAX_BYTES, max_age_days: int = CACHE_MAX_AGE_DAYS) -> int:
+    flush_touches()
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat(timespec="seconds")
+    removed = db.cache_evict(max_bytes, cutoff)
+    _count("evicted", removed)
+    return removed
+
+
+def stats() -> dict:
+    flush_touches()
+    with _stats_lock:
+        out = dict(_stats)
+    lookups = out["hits"] + out["misses"]
+    out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else None
+    out.update(db.cache_stats())
+    return out
@@ -0,0 +1,415 @@
+"""
+Fachlogik für das Intake: Commodity Groups, Zahlen/Text normalisieren, Summen,
+Submit-Validierung und die KI-Aufrufe (Prompts + synchrone Wrapper um ai_service).
+
+Bewusst ohne schwere Importe auf Modulebene: openai (über ai_service) wird erst
+beim ersten KI-Aufruf geladen, die pydantic-Schemas (ai_schemas) beim ersten Zugriff auf
+ExtractedOffer & Co. So starten Batch-Tools, Skripte und Tests, die nur
+calc_lines/validate_for_submit brauchen, in Millisekunden.
+"""
+import hashlib
+import os
+import re
+from typing import TYPE_CHECKING, List, Optional
+
+from commodity_classifier import LOCAL_CONFIDENCE_THRESHOLD, classify_locally
+
+if TYPE_CHECKING:
+    from ai_schemas import CommodityPick, ExtractedOffer, ExtractedOrderLine, TitleSuggestion
+
+# Namen aus ai_schemas, die weiterhin über `from intake import ...` erreichbar sind
+_SCHEMA_NAMES = {"ExtractedOrderLine", "ExtractedOffer", "TitleSuggestion", "CommodityPick", "OneShotAutoFill",
+                 "EXTRACTION_PROMPT_VERSION", "EXTRACTION_CHUNK_PROMPT_VERSION", "ONESHOT_PROMPT_VERSION"}
+
+
+def __getattr__(name: str):
+    # Lädt pydantic erst, wenn ein Schema wirklich gebraucht wird
+    if name in _SCHEMA_NAMES:
+        import ai_schemas
+        return getattr(ai_schemas, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# -----------------------------
+# Commodity Groups (aus deiner Tabelle)
+# -----------------------------
+COMMODITY_GROUPS = [
+    {"id": "001", "category": "General Services", "group": "Accommodation Rentals"},
+    {"id": "002", "category": "General Services", "group": "Membership Fees"},
+    {"id": "003", "category": "General Services", "group": "Workplace Safety"},
+    {"id": "004", "category": "General Services", "group": "Consulting"},
+    {"id": "005", "category": "General Services", "group": "Financial Services"},
+    {"id": "006", "category": "General Services", "group": "Fleet Management"},
+    {"id": "007", "category": "General Services", "group": "Recruitment Services"},
+    {"id": "008", "category": "General Services", "group": "Professional Development"},
+    {"id": "009", "category": "General Services", "group": "Miscellaneous Services"},
+    {"id": "010", "category": "General Services", "group": "Insurance"},
+    {"id": "011", "category": "Facility Management", "group": "Electrical Engineering"},
+    {"id": "012", "category": "Facility Management", "group": "Facility Management Services"},
+    {"id": "013", "category": "Facility Management", "group": "Security"},
+    {"id": "014", "category": "Facility Management", "group": "Renovations"},
+    {"id": "015", "category": "Facility Management", "group": "Office Equipment"},
+    {"id": "016", "category": "Facility Management", "group": "Energy Management"},
+    {"id": "017", "category": "Facility Management", "group": "Maintenance"},
+    {"id": "018", "category": "Facility Management", "group": "Cafeteria and Kitchenettes"},
+    {"id": "019", "category": "Facility Management", "group": "Cleaning"},
+    {"id": "020", "category": "Publishing Production", "group": "Audio and Visual Production"},
+    {"id": "021", "category": "Publishing Production", "group": "Books/Videos/CDs"},
+    {"id": "022", "category": "Publishing Production", "group": "Printing Costs"},
+    {"id": "023", "category": "Publishing Production", "group": "Software Development for Publishing"},
+    {"id": "024", "category": "Publishing Production", "group": "Material Costs"},
+    {"id": "025", "category": "Publishing Production", "group": "Shipping for Production"},
+    {"id": "026", "category": "Publishing Production", "group": "Digital Product Development"},
+    {"id": "027", "category": "Publishing Production", "group": "Pre-production"},
+    {"id": "028", "category": "Publishing Production", "group": "Post-production Costs"},
+    {"id": "029", "category": "Information Technology", "group": "Hardware"},
+    {"id": "030", "category": "Information Technology", "group": "IT Services"},
+    {"id": "031", "category": "Information Technology", "group": "Software"},
+    {"id": "032", "category": "Logistics", "group": "Courier, Express, and Postal Services"},
+    {"id": "033", "category": "Logistics", "group": "Warehousing and Material Handling"},
+    {"id": "034", "category": "Transportation Logistics", "group": "Transportation Logistics"},
+    {"id": "035", "category": "Logistics", "group": "Delivery Services"},
+    {"id": "036", "category": "Marketing & Advertising", "group": "Advertising"},
+    {"id": "037", "category": "Marketing & Advertising", "group": "Outdoor Advertising"},
+    {"id": "038", "category": "Marketing & Advertising", "group": "Marketing Agencies"},
+    {"id": "039", "category": "Marketing & Advertising", "group": "Direct Mail"},
+    {"id": "040", "category": "Marketing & Advertising", "group": "Customer Communication"},
+    {"id": "041", "category": "Marketing & Advertising", "group": "Online Marketing"},
+    {"id": "042", "category": "Marketing & Advertising", "group": "Events"},
+    {"id": "043", "category": "Marketing & Advertising", "group": "Promotional Materials"},
+    {"id": "044", "category": "Production", "group": "Warehouse and Operational Equipment"},
+    {"id": "045", "category": "Production", "group": "Production Machinery"},
+    {"id": "046", "category": "Production", "group": "Spare Parts"},
+    {"id": "047", "category": "Production", "group": "Internal Transportation"},
+    {"id": "048", "category": "Production", "group": "Production Materials"},
+    {"id": "049", "category": "Production", "group": "Consumables"},
+    {"id": "050", "category": "Production", "group": "Maintenance and Repairs"},
+]
+
+COMMODITY_BY_ID = {c["id"]: c for c in COMMODITY_GROUPS}
+COMMODITY_TEXT = "\n".join([f'{c["id"]} | {c["category"]} | {c["group"]}' for c in COMMODITY_GROUPS])
+
+
+def _commodity_text_compact() -> str:
+    # Eine Zeile pro Kategorie ("Logistics: 032 Courier, …; 033 …"): Kategorie nur einmal statt in jeder Zeile
+    by_category: dict[str, list[str]] = {}
+    for c in COMMODITY_GROUPS:
+        by_category.setdefault(c["category"], []).append(f'{c["id"]} {c["group"]}')
+    return "\n".join(f"{category}: {'; '.join(groups)}" for category, groups in by_category.items())
+
+COMMODITY_TEXT_COMPACT = _commodity_text_compact()
+
+
+# -----------------------------
+# Utility: API Key säubern
+# -----------------------------
+def get_clean_openai_key() -> str:
+    raw = os.getenv("OPENAI_API_KEY", "")
+    if not raw:
+        return ""
+    k = raw.strip()
+    k = k.strip('"').strip("'")
+    k = k.strip("“").strip("”")
+    k = k.strip('"').strip("“").strip("”").strip()
+    return k
+
+
+# -----------------------------
+# OpenAI: Modell; Client/Backend, Rate-Limit und Retries liegen in ai_backends/ai_gateway
+# -----------------------------
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-2024-08-06")
+
+
+# -----------------------------
+# Utility: Text/Nummern normalisieren
+# -----------------------------
+def normalize_offer_text(t: str) -> str:
+    t = t.replace("“", '"').replace("”", '"')
+    t = t.replace("\u00A0", " ")
+    return t
+
+def parse_de_number_to_float(val) -> Optional[float]:
+    if val is None:
+        return None
+    if isinstance(val, (int, float)):
+        return float(val)
+    s = str(val).strip()
+    if not s:
+        return None
+    s = s.replace("€", "").replace("EUR", "").replace("Euro", "").strip()
+    s = re.sub(r"\s+", "", s)
+    if "," in s:
+        s = s.replace(".", "")
+        s = s.replace(",", ".")
+    try:
+        return float(s)
+    except Exception:
+        return None
+
+
+# -----------------------------
+# Extraktion: Angebot → strukturierte Daten
+# -----------------------------
+EXTRACTION_SYSTEM_PROMPT = (
+    "Du extrahierst Daten aus einem Lieferanten-Angebot/Rechnungstext (Copy/Paste) für einen Procurement Request.\n"
+    "Gib NUR Daten gemäß Schema zurück.\n\n"
+    "Sehr wichtig:\n"
+    "- Der Text ist oft aus PDF kopiert (Zeilenumbrüche). Bitte robust interpretieren.\n"
+    "- total_gross ist die Endsumme/Gesamtbetrag/Endsumme (inkl. Versand & Steuer), NICHT die Positionssumme.\n"
+    "- positions_net ist 'Positionen netto' (ohne Versand, ohne Steuer).\n"
+    "- shipping_net ist 'Versandkosten netto'.\n"
+    "- tax_amount ist die SUMME aller Steuerbeträge (z.B. USt auf Positionen + USt auf Versand).\n"
+    "- Zahlen bitte als reine Zahlen (ohne €). Dezimalkomma ist erlaubt.\n"
+    "- quantity darf Dezimal sein (z.B. 1,28).\n"
+    "- Wenn etwas nicht sicher erkennbar ist: None.\n"
+)
+
+def build_extraction_input(offer_text: str) -> list[dict]:
+    offer_text = normalize_offer_text(offer_text)
+    return [
+        {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+        {"role": "user", "content": offer_text},
+    ]
+
+# Lange Angebote: ein Aufruf pro Teil (offer_chunking), die Ergebnisse führt ai_service zusammen
+EXTRACTION_CHUNK_SYSTEM_PROMPT = (
+    EXTRACTION_SYSTEM_PROMPT
+    + "\nDer Text ist nur ein AUSSCHNITT eines längeren Angebots (Teil x von y):\n"
+    "- order_lines: nur die Positionen, die in diesem Ausschnitt stehen.\n"
+    "- Vendor, USt-Id, Abteilung und Summenfelder nur, wenn sie in diesem Ausschnitt stehen, sonst None.\n"
+    "- Überträge und Seiten-Zwischensummen sind KEINE positions_net/total_gross.\n"
+)
+
+def build_extraction_chunk_input(chunk_text: str, part: int, parts: int) -> list[dict]:
+    return [
+        {"role": "system", "content": EXTRACTION_CHUNK_SYSTEM_PROMPT},
+        {"role": "user", "content": f"[Teil {part} von {parts}]\n{normalize_offer_text(chunk_text)}"},
+    ]
+
+def extraction_cache_key(offer_text: str, model: str = OPENAI_MODEL, prompt_version: Optional[str] = None) -> str:
+    from ai_schemas import EXTRACTION_PROMPT_VERSION
+
+    # Whitespace-Unterschiede (PDF-Umbrüche, erneutes Einfügen) sollen denselben Key ergeben
+    normalized = " ".join(normalize_offer_text(offer_text).split())
+    raw = f"{model}\n{prompt_version or EXTRACTION_PROMPT_VERSION}\n{normalized}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def extract_offer_with_openai(offer_text: str) -> "ExtractedOffer":
+    # Synchroner Zugang für Skripte; läuft über denselben Client + Gateway wie Auto-Fill
+    from ai_service import extract_offer_async, run_ai
+
+    return run_ai(extract_offer_async(offer_text))
+
+def offer_line_from_extraction(ol: "ExtractedOrderLine") -> dict:
+    # Eine Position im Format des Order-Lines-Editors (auch für gestreamte Teilergebnisse)
+    return {
+        "description": ol.description or "",
+        "unit_price": float(parse_de_number_to_float(ol.unit_price) or 0.0),
+        "quantity": float(parse_de_number_to_float(ol.quantity) or 0.0),
+        "unit": (ol.unit or "").strip() or "pcs",
+    }
+
+def offer_lines_from_extraction(extracted: "ExtractedOffer") -> list[dict]:
+    # ExtractedOffer → Zeilen im Format des Order-Lines-Editors
+    return [offer_line_from_extraction(ol) for ol in extracted.order_lines or []]
+
+
+# -----------------------------
+# NEU: Title/Short Description generieren (weil im Angebot oft nicht vorhanden)
+# -----------------------------
+def title_fallback(vendor: str, lines: List[dict]) -> str:
+    # Fallback ohne KI
+    first = (lines[0].get("description", "") if lines else "").strip()
+    base = first[:50] if first else vendor
+    return (base or "Procurement Request").strip()
+
+def build_title_input(vendor: str, lines: List[dict], department: str = "") -> list[dict]:
+    # Nur wenig Kontext senden (Datenminimierung)
+    short_lines = []
+    for l in (lines or [])[:5]:
+        short_lines.append(str(l.get("description", "")).strip()[:80])
+    lines_text = "; ".join([x for x in short_lines if x])
+
+    user_msg = (
+        "Erstelle einen kurzen Titel für einen Procurement Request.\n"
+        "Regeln: kurz, verständlich, keine personenbezogenen Daten.\n"
+        f"Vendor: {vendor}\n"
+        f"Department: {department}\n"
+        f"Items: {lines_text}\n"
+    )
+    return [{"role": "user", "content": user_msg}]
+
+def clean_title(suggestion: "TitleSuggestion") -> str:
+    t = (suggestion.title or "").strip()
+    # Safety: begrenzen
+    return t[:80] if t else "Procurement Request"
+
+def generate_title_with_openai(vendor: str, lines: List[dict], department: str = "") -> str:
+    from ai_service import generate_title_async, run_ai
+
+    return run_ai(generate_title_async(vendor, lines, department))
+
+
+# -----------------------------
+# Commodity Group Auswahl (Ausschlusslogik + Zweck)
+# -----------------------------
+COMMODITY_RULES = (
+    "1) Du DARFST NUR eine Commodity Group aus der Liste wählen.\n"
+    "2) '019 – Facility Management – Cleaning' NUR wählen bei echter Reinigungsdienstleistung oder Reinigungs-Verbrauchsmaterial.\n"
+    "   NICHT wählen bei: Begrünung, Mooswand, Interior-Elemente, Dekoration, Branding, Schilder, Acryl-Logo-Platten.\n"
+    "3) Interior / Büro-Ausstattung / feste Elemente: häufig '015 – Office Equipment'.\n"
+    "4) Logo/Branding/Promo-Material: häufig '043 – Promotional Materials'.\n"
+    "5) reasoning_short: 1 Satz.\n"
+)
+
+def build_commodity_input(title: str, vendor: str, lines: list[dict]) -> list[dict]:
+    lines_text = "\n".join(
+        [f'- {l.get("description","")} (unit_price={l.get("unit_price")}, qty={l.get("quantity")}, unit={l.get("unit")})'
+         for l in lines]
+    ) if lines else "- (keine)"
+
+    user_context = (
+        f"TITLE: {title}\n"
+        f"VENDOR: {vendor}\n"
+        f"ORDER_LINES:\n{lines_text}\n\n"
+        "Wähle die passendste Commodity Group aus der Liste. Entscheide nach dem ZWECK.\n"
+    )
+
+    system_msg = (
+        "Du bist Procurement-Experte und klassifizierst Requests in Commodity Groups.\n\n"
+        "Regeln:\n"
+        f"{COMMODITY_RULES}\n"
+        "LISTE:\n"
+        f"{COMMODITY_TEXT}"
+    )
+
+    return [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": user_context},
+    ]
+
+def validate_commodity_pick(pick: "CommodityPick") -> "CommodityPick":
+    valid_ids = {c["id"] for c in COMMODITY_GROUPS}
+    if pick.commodity_group_id not in valid_ids:
+        raise RuntimeError("KI hat eine ungültige Commodity Group ID geliefert (nicht in der Liste).")
+    return pick
+
+def pick_commodity_group_with_openai(title: str, vendor: str, lines: list[dict]) -> "CommodityPick":
+    from ai_service import pick_commodity_group_async, run_ai
+
+    return run_ai(pick_commodity_group_async(title, vendor, lines))
+
+def local_commodity_pick(title: str, vendor: str, lines: list[dict]) -> Optional["CommodityPick"]:
+    from ai_schemas import CommodityPick
+
+    # Lokaler Klassifikator (frühere Requests); None = zu unsicher → KI fragen
+    cg_id, confidence = classify_locally(title, vendor, lines)
+    if cg_id not in COMMODITY_BY_ID or confidence < LOCAL_CONFIDENCE_THRESHOLD:
+        return None
+    c = COMMODITY_BY_ID[cg_id]
+    return CommodityPick(
+        commodity_group_id=cg_id,
+        commodity_group_name=f'{c["category"]} – {c["group"]}',
+        confidence=round(confidence, 3),
+        reasoning_short="Lokal aus ähnlichen früheren Requests bestimmt.",
+    )
+
+def pick_commodity_group(title: str, vendor: str, lines: list[dict]) -> tuple["CommodityPick", str]:
+    # (pick, quelle): erst lokal (< 1 ms), die KI nur bei niedriger Konfidenz
+    pick = local_commodity_pick(title, vendor, lines)
+    if pick is not None:
+        return pick, "Lokal"
+    return pick_commodity_group_with_openai(title, vendor, lines), "KI"
+
+
+# -----------------------------
+# One-Shot: Extraktion + Titel + Commodity Group in EINER Antwort (AUTOFILL_MODE=oneshot)
+# -----------------------------
+AUTOFILL_MODES = ("multi", "oneshot")
+AUTOFILL_MODE = os.getenv("AUTOFILL_MODE", "multi").strip().lower()
+
+# Ein Aufruf statt drei: Angebotstext und Positionen gehen nur einmal raus. Der Mehrschritt-Pfad schickt
+# Angebot und Gruppenliste aber auch nur je einmal – gespart werden v.a. die Round-Trips; die Eingabe
+# schrumpft nur um die wiederholten Positionen und die kompakte Gruppenliste (COMMODITY_TEXT_COMPACT)
+ONESHOT_SYSTEM_PROMPT = (
+    EXTRACTION_SYSTEM_PROMPT
+    + "\nZusätzlich in derselben Antwort:\n"
+    "- title: kurzer Titel (max. ca. 70 Zeichen), keine personenbezogenen Daten; aus Vendor und Positionen.\n"
+    "- commodity: die passendste Commodity Group nach dem ZWECK der Positionen.\n\n"
+    "Regeln für commodity:\n"
+    + COMMODITY_RULES
+    + "\nLISTE (Kategorie: ID Gruppe; …):\n"
+    + COMMODITY_TEXT_COMPACT
+)
+
+def build_oneshot_input(offer_text: str) -> list[dict]:
+    return [
+        {"role": "system", "content": ONESHOT_SYSTEM_PROMPT},
+        {"role": "user", "content": normalize_offer_text(offer_text)},
+    ]
+
+
+def simple_commodity_group_guess(title: str, vendor: str, lines: list[dict]) -> tuple[str, str]:
+    text = (title + " " + vendor + " " + " ".join([l.get("description", "") for l in lines])).lower()
+    if any(k in text for k in ["logo", "acryl", "schild", "wand", "moos", "begrünung", "deko", "decor"]):
+        return ("015", "Facility Management – Office Equipment")
+    if any(k in text for k in ["license", "licence", "subscription", "adobe", "software"]):
+        return ("031", "Information Technology – Software")
+    if any(k in text for k in ["laptop", "notebook", "server", "hardware"]):
+        return ("029", "Information Technology – Hardware")
+    if any(k in text for k in ["consulting", "berater", "beratung"]):
+        return ("004", "General Services – Consulting")
+    return ("009", "General Services – Miscellaneous Services")
+
+
+# -----------------------------
+# Lines: Summe berechnen
+# -----------------------------
+def calc_lines(lines: list[dict]) -> tuple[list[dict], float]:
+    cleaned = []
+    total_sum = 0.0
+    for l in lines:
+        desc = str(l.get("description", "")).strip()
+        unit_price = float(l.get("unit_price", 0) or 0)
+        qty = float(l.get("quantity", 0) or 0)
+        unit = str(l.get("unit", "")).strip()
+
+        line_total = round(unit_price * qty, 2)
+        total_sum += line_total
+        cleaned.append({
+            "description": desc,
+            "unit_price": unit_price,
+            "quantity": qty,
+            "unit": unit,
+            "line_total": line_total
+        })
+    return cleaned, round(total_sum, 2)
+
+
+def validate_for_submit(header: dict, lines: list[dict], lines_sum: float) -> list[str]:
+    errors = []
+    for f in ["requestor_name", "department", "title", "vendor_name", "vendor_vat_id"]:
+        if not header.get(f, "").strip():
+            errors.append(f"Pflichtfeld fehlt: {f}")
+
+    vat = header.get("vendor_vat_id", "").strip()
+    if len(vat) < 8:
+        errors.append("VAT ID wirkt zu kurz (bitte prüfen).")
+
+    if not lines:
+        errors.append("Mindestens eine Order Line ist nötig.")
+    for i, l in enumerate(lines, start=1):
+        if not str(l.get("description", "")).strip():
+            errors.append(f"Order Line {i}: Beschreibung fehlt.")
+        if float(l.get("unit_price", 0) or 0) <= 0:
+            errors.append(f"Order Line {i}: Unit Price muss > 0 sein.")
+        if float(l.get("quantity", 0) or 0) <= 0:
+            errors.append(f"Order Line {i}: Quantity muss > 0 sein.")
+
+    total = float(header.get("total_cost", 0) or 0)
+    if total <= 0:
+        errors.append("Total Cost muss > 0 sein.")
+    if total < round(lines_sum, 2):
+        errors.append("Total Cost ist kleiner als Summe der Positionen. Bitte prüfen (Versand/Steuer fehlen?).")
+
+    return errors
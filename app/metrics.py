@@ -0,0 +1,265 @@
+"""
+Leichte Laufzeitmessung für die heißen Pfade: Dokument parsen, Redaction,
+KI-Aufrufe (inkl. Token-Verbrauch) und DB-Helfer.
+
+Jede Stufe ("parse", "redact", "llm.extract", "db.load_requests", …) hält die
+letzten METRICS_WINDOW Messungen in einem Ringpuffer (für p50/p95) plus
+Gesamtzähler (für Prometheus). Alles liegt im Prozess: die Streamlit-App sieht
+UI und eingebaute Worker, ein externer Worker (autofill_jobs.py) zählt für sich –
+METRICS_PORT stellt die Prometheus-Ausgabe dann per HTTP bereit, standardmäßig nur auf
+127.0.0.1 (METRICS_HOST=0.0.0.0 für einen Scraper auf einem anderen Rechner).
+
+METRICS_ENABLED=0 schaltet alles ab: timed() gibt die Funktion unverändert zurück,
+span()/timed_iter() kosten nur noch einen Funktionsaufruf.
+"""
+import functools
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Iterable, Iterator, Optional
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1000"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Interne Laufzeiten nicht auf allen Interfaces anbieten: nur lokal, außer ausdrücklich anders gesetzt
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+PROMETHEUS_PREFIX = "procurement"
+QUANTILES = (0.5, 0.95)
+
+_NOOP = nullcontext()
+_lock = threading.Lock()
+_windows: dict[str, deque] = {}
+# Stufe → [Anzahl, Summe ms, Fehler]
+_totals: dict[str, list] = {}
+# Stufe → [Input-Tokens, Output-Tokens]
+_tokens: dict[str, list] = {}
+
+
+# -----------------------------
+# Erfassen
+# -----------------------------
+def record(stage: str, ms: float, ok: bool = True):
+    with _lock:
+        window = _windows.get(stage)
+        if window is None:
+            window = _windows[stage] = deque(maxlen=METRICS_WINDOW)
+            _totals[stage] = [0, 0.0, 0]
+        window.append(ms)
+        totals = _totals[stage]
+        totals[0] += 1
+        totals[1] += ms
+        if not ok:
+            totals[2] += 1
+
+
+def record_tokens(stage: str, usage) -> None:
+    # usage aus der OpenAI-Antwort (Responses API: input_tokens/output_tokens); fehlt bei Stand-ins oft
+    if not METRICS_ENABLED or usage is None:
+        return
+    tokens_in = getattr(usage, "input_tokens", None) or 0
+    tokens_out = getattr(usage, "output_tokens", None) or 0
+    with _lock:
+        counts = _tokens.setdefault(stage, [0, 0])
+        counts[0] += tokens_in
+        counts[1] += tokens_out
+
+
+class _Span:
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.stage, (time.perf_counter() - self.t0) * 1000, exc_type is None)
+        return False
+
+
+def span(stage: str):
+    """with span("llm.extract"): … – misst den Block, Exceptions zählen als Fehler."""
+    return _Span(stage) if METRICS_ENABLED else _NOOP
+
+
+def timed(group: str, name: Optional[str] = None):
+    """Decorator: Stufe "<group>.<Funktionsname>"; ohne Metriken bleibt die Funktion unverändert."""
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+        stage = f"{group}.{name or fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            ok = False
+            t0 = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                record(stage, (time.perf_counter() - t0) * 1000, ok)
+        return wrapper
+    return decorate
+
+
+class TimedIter:
+    """
+    Misst die Zeit in next() eines Generators (z.B. Seiten aus dem PDF) und
+    bucht sie beim Ende als eine Messung. `inner` = vorgelagerter TimedIter,
+    dessen Zeit abgezogen wird – so trennen sich Parsen und Redaction, obwohl
+    redact_stream die Seiten erst beim Iterieren anfordert.
+    """
+
+    def __init__(self, stage: str, iterable: Iterable, inner: Optional["TimedIter"] = None):
+        self.stage = stage
+        self.ms = 0.0
+        self._it = iter(iterable)
+        self._inner = inner
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        try:
+            item = next(self._it)
+        except StopIteration:
+            self.ms += (time.perf_counter() - t0) * 1000
+            self._finish(True)
+            raise
+        except BaseException:
+            self.ms += (time.perf_counter() - t0) * 1000
+            self._finish(False)
+            raise
+        self.ms += (time.perf_counter() - t0) * 1000
+        return item
+
+    def _finish(self, ok: bool):
+        if not self._done:
+            self._done = True
+            record(self.stage, self.ms - (self._inner.ms if self._inner else 0.0), ok)
+
+
+def timed_iter(stage: str, iterable: Iterable, inner=None) -> Iterator:
+    if not METRICS_ENABLED:
+        return iter(iterable)
+    return TimedIter(stage, iterable, inner if isinstance(inner, TimedIter) else None)
+
+
+def reset():
+    with _lock:
+        _windows.clear()
+        _totals.clear()
+        _tokens.clear()
+
+
+# -----------------------------
+# Auswerten
+# -----------------------------
+def quantile(sorted_values: list[float], q: float) -> float:
+    # Nearest-Rank: bei wenigen Messungen ehrlicher als Interpolation
+    if not sorted_values:
+        return 0.0
+    idx = max(0, min(len(sorted_values) - 1, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+def stage_stats() -> list[dict]:
+    with _lock:
+        snapshot = {stage: (sorted(w), list(_totals[stage])) for stage, w in _windows.items()}
+        tokens = {stage: list(t) for stage, t in _tokens.items()}
+    rows = []
+    for stage in sorted(snapshot):
+        values, (count, sum_ms, errors) = snapshot[stage]
+        tokens_in, tokens_out = tokens.get(stage, (0, 0))
+        rows.append({
+            "stage": stage,
+            "count": count,
+            "errors": errors,
+            "p50_ms": quantile(values, 0.5),
+            "p95_ms": quantile(values, 0.95),
+            "max_ms": values[-1] if values else 0.0,
+            "total_ms": sum_ms,
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+        })
+    return rows
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text() -> str:
+    """Prometheus-Textformat (0.0.4): Summary pro Stufe, Fehler- und Token-Zähler."""
+    stats = stage_stats()
+    name = f"{PROMETHEUS_PREFIX}_stage_duration_seconds"
+    out = [
+        f"# HELP {name} Laufzeit pro Stufe (Quantile über die letzten {METRICS_WINDOW} Messungen).",
+        f"# TYPE {name} summary",
+    ]
+    for s in stats:
+        stage = _label(s["stage"])
+        for q in QUANTILES:
+            key = "p50_ms" if q == 0.5 else "p95_ms"
+            out.append(f'{name}{{stage="{stage}",quantile="{q}"}} {s[key] / 1000:.6f}')
+        out.append(f'{name}_sum{{stage="{stage}"}} {s["total_ms"] / 1000:.6f}')
+        out.append(f'{name}_count{{stage="{stage}"}} {s["count"]}')
+
+    errors = f"{PROMETHEUS_PREFIX}_stage_errors_total"
+    out += [f"# HELP {errors} Fehlgeschlagene Aufrufe pro Stufe.", f"# TYPE {errors} counter"]
+    out += [f'{errors}{{stage="{_label(s["stage"])}"}} {s["errors"]}' for s in stats]
+
+    tokens = f"{PROMETHEUS_PREFIX}_llm_tokens_total"
+    out += [f"# HELP {tokens} Token-Verbrauch der KI-Aufrufe.", f"# TYPE {tokens} counter"]
+    for s in stats:
+        if s["tokens_in"] or s["tokens_out"]:
+            stage = _label(s["stage"])
+            out.append(f'{tokens}{{stage="{stage}",kind="input"}} {s["tokens_in"]}')
+            out.append(f'{tokens}{{stage="{stage}",kind="output"}} {s["tokens_out"]}')
+    return "\n".join(out) + "\n"
+
+
+# -----------------------------
+# HTTP-Endpunkt für Prometheus (optional, einmal pro Prozess)
+# -----------------------------
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port: int = METRICS_PORT, host: str = METRICS_HOST):
+    """GET /metrics auf `host`:`port`; Port 0 = aus. Mehrfachaufrufe (Streamlit-Reruns) starten nichts neu."""
+    global _server
+    if port <= 0 or not METRICS_ENABLED:
+        return None
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+                class MetricsHandler(BaseHTTPRequestHandler):
+                    def do_GET(self):
+                        if self.path.split("?")[0] != "/metrics":
+                            self.send_error(404)
+                            return
+                        body = prometheus_text().encode("utf-8")
+                        self.send_response(200)
+                        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                        self.send_header("Content-Length", str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+
+                    def log_message(self, *args):
+                        pass
+
+                server = ThreadingHTTPServer((host, port), MetricsHandler)
+                threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+                _server = server
+    return _server
@@ -0,0 +1,249 @@
+"""
+Lange Angebote (Rahmenverträge, 40+ Seiten inkl. AGB) für die KI-Extraktion vorbereiten:
+
+1. Boilerplate entfernen: AGB, Liefer-/Zahlungsbedingungen, Datenschutz, Widerruf usw.
+   ab der Überschrift bis zur nächsten Angebotszeile (Tabellenkopf, Position, Summe),
+   dazu ganze Seiten aus §-Paragraphen ohne Beträge.
+2. In Teile schneiden: an Seitengrenzen (Form-Feed aus document_text bzw. "Seite x von y"),
+   zu große Seiten an Leerzeilen/Tabellengrenzen. Teile, die eine Tabelle fortsetzen,
+   bekommen den letzten Tabellenkopf vorangestellt.
+3. Teilergebnisse zusammenführen (merge_extractions): Positionen in Reihenfolge, doppelte
+   (z.B. wiederholte Übersichtstabelle) nur einmal, wenn erst das zur Nettosumme passt.
+
+Kurze Angebote bleiben ein Teil → ein KI-Aufruf wie bisher (nur ohne Boilerplate).
+Nur Standardbibliothek + offer_parser (dict rein, dict raus); die Schemas validiert ai_service.
+"""
+import os
+import re
+from collections import Counter
+
+from document_text import PAGE_BREAK
+from offer_parser import is_table_header, match_row, match_total
+
+# ≈ 1500 Tokens pro Teil: klein genug für parallele Aufrufe, groß genug für Kontext
+EXTRACT_CHUNK_CHARS = int(os.getenv("EXTRACT_CHUNK_CHARS", "6000"))
+AMOUNT_TOLERANCE = 0.015
+# Diese Summen stehen nach der Tabelle; "Zwischensumme" am Seitenende beendet sie nicht
+TABLE_END_FIELDS = ("tax_amount", "total_gross")
+
+_page_marker = re.compile(r"^\s*Seite\s+\d+\s*(?:von|/)\s*\d+\s*$", re.I)
+_boilerplate_heading = re.compile(
+    r"^\s*(?:[\d.]+\s+|§\s*\d+\s+)?(?:"
+    r"Allgemeine\s+(?:Geschäfts|Liefer|Verkaufs|Vertrags)[a-zäöü-]*bedingungen|AGB|"
+    r"(?:Liefer|Zahlungs|Geschäfts|Vertrags|Verkaufs)(?:-\s*und\s*\w+)?[a-zäöü\s-]{0,15}bedingungen|"
+    r"Datenschutz(?:hinweise?|erklärung|information(?:en)?)?|Widerrufs(?:belehrung|recht)|"
+    r"Haftungs(?:ausschluss|beschränkung)|Gerichtsstand|Eigentumsvorbehalt|Salvatorische\s+Klausel|"
+    r"(?:General\s+)?Terms\s+(?:and|&)\s+Conditions|Privacy\s+(?:Notice|Policy)"
+    r")\b[^:]{0,30}$",
+    re.I,
+)
+_paragraph = re.compile(r"^\s*§\s*\d+")
+_money = re.compile(r"\d,\d{2}(?!\d)")
+_ws = re.compile(r"\s+")
+
+
+# -----------------------------
+# 1. Boilerplate
+# -----------------------------
+def _is_offer_line(line: str) -> bool:
+    return is_table_header(line) or match_row(line) is not None or match_total(line) is not None
+
+
+def split_pages(text: str) -> list[str]:
+    """Seiten an Form-Feeds; ohne Form-Feeds an "Seite x von y"-Zeilen (Marker bleibt am Seitenende)."""
+    if PAGE_BREAK in text:
+        return [p for p in text.split(PAGE_BREAK) if p.strip()]
+    pages, current = [], []
+    for line in text.splitlines():
+        current.append(line)
+        if _page_marker.match(line):
+            pages.append("\n".join(current))
+            current = []
+    if any(line.strip() for line in current):
+        pages.append("\n".join(current))
+    return pages
+
+
+def _is_boilerplate_page(lines: list[str]) -> bool:
+    # Nur Rechtstext: mehrere §-Absätze und keine einzige Angebotszeile
+    return sum(bool(_paragraph.match(line)) for line in lines) >= 3 and not any(_is_offer_line(line) for line in lines)
+
+
+def strip_boilerplate(pages: list[str]) -> tuple[list[str], int]:
+    """(Seiten ohne Boilerplate, entfernte Zeichen). Eine Boilerplate-Überschrift gilt über Seitengrenzen hinweg."""
+    kept, removed = [], 0
+    in_boilerplate = False
+    for page in pages:
+        lines = page.splitlines()
+        if _is_boilerplate_page(lines):
+            removed += len(page)
+            in_boilerplate = True
+            continue
+        out = []
+        for line in lines:
+            if _boilerplate_heading.match(line) and not _money.search(line):
+                in_boilerplate = True
+            elif in_boilerplate and _is_offer_line(line):
+                in_boilerplate = False
+            if in_boilerplate:
+                removed += len(line) + 1
+            else:
+                out.append(line)
+        if any(line.strip() for line in out):
+            kept.append("\n".join(out))
+    return kept, removed
+
+
+# -----------------------------
+# 2. Teile
+# -----------------------------
+def _blocks(page: str, max_chars: int) -> list[str]:
+    # Zu große Seite: an Leerzeilen trennen, zur Not zwischen zwei Zeilen – nie mitten in einer Zeile
+    blocks, current, size = [], [], 0
+    for line in page.splitlines():
+        if current and size + len(line) + 1 > max_chars:
+            blocks.append("\n".join(current))
+            current, size = [], 0
+        if not line.strip() and size > max_chars // 2:
+            blocks.append("\n".join(current))
+            current, size = [], 0
+            continue
+        current.append(line)
+        size += len(line) + 1
+    if any(line.strip() for line in current):
+        blocks.append("\n".join(current))
+    return blocks
+
+
+def split_for_extraction(text: str, max_chars: int = EXTRACT_CHUNK_CHARS) -> tuple[list[str], dict]:
+    """
+    (Teile für die Extraktion, Statistik). Passt das Angebot ohne Boilerplate in einen Teil,
+    gibt es genau einen – dann ändert sich gegenüber dem Einzelaufruf nur der gekürzte Text.
+    """
+    pages = split_pages(text)
+    kept, removed = strip_boilerplate(pages)
+    stats = {"pages": len(pages), "pages_kept": len(kept), "chars_removed": removed}
+    stripped = "\n".join(kept)
+    if len(stripped) <= max_chars:
+        return [stripped], stats
+
+    pieces = []
+    for page in kept:
+        pieces += [page] if len(page) <= max_chars else _blocks(page, max_chars)
+
+    # Gleich große Teile: die Antwortzeit hängt am längsten Teil (Positionen = Ausgabe-Tokens)
+    n_chunks = -(-len(stripped) // max_chars)
+    target = min(max_chars, -(-sum(len(p) + 1 for p in pieces) // n_chunks))
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 1 > target:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+
+    # Fortgesetzte Tabelle: Spaltenkopf mitgeben, sonst fehlt dem Modell die Spaltenbedeutung
+    with_headers, header = [], None
+    for chunk in chunks:
+        if header and not is_table_header(chunk.lstrip().split("\n", 1)[0]):
+            chunk = f"{header}\n{chunk}"
+        with_headers.append(chunk)
+        for line in chunk.splitlines():
+            if is_table_header(line):
+                header = line.strip()
+            elif (match_total(line) or ("",))[0] in TABLE_END_FIELDS:
+                header = None
+    stats["chunks"] = len(with_headers)
+    return with_headers, stats
+
+
+# -----------------------------
+# 3. Zusammenführen
+# -----------------------------
+def _close(a: float, b: float) -> bool:
+    return abs(a - b) <= AMOUNT_TOLERANCE
+
+
+def _line_key(line: dict) -> tuple:
+    return (_ws.sub(" ", str(line.get("description") or "")).strip().lower(),
+            round(float(line.get("unit_price") or 0), 2), round(float(line.get("quantity") or 0), 3))
+
+
+def _lines_sum(lines: list[dict]) -> float:
+    return round(sum(float(l.get("unit_price") or 0) * float(l.get("quantity") or 0) for l in lines), 2)
+
+
+def merge_extractions(parts: list[dict]) -> dict:
+    """
+    ExtractedOffer-dicts der Teile → ein ExtractedOffer-dict.
+
+    - Kopfdaten (Vendor, USt-Id, Abteilung): erster Teil, der sie nennt.
+    - Positionen: alle Teile in Reihenfolge. Nur wenn erst ohne Dubletten die Positionssumme zur
+      genannten Nettosumme passt (z.B. Übersicht auf der letzten Seite), zählt eine Position, die mehrere
+      Teile gleich melden, so oft wie im Teil mit den meisten Vorkommen – echte Wiederholungen bleiben.
+    - Summen: aus dem Teil mit der Endsumme (Seiten-Zwischensummen anderer Teile zählen nicht);
+      positions_net bevorzugt so, dass es zur Positionssumme passt, aber nie im Widerspruch zu
+      Netto + Versand + Steuer = Endsumme; fehlt die Endsumme, wird sie daraus gebildet.
+    """
+    def first(field):
+        return next((p[field] for p in parts if p.get(field)), None)
+
+    all_lines, deduped, max_count = [], [], {}
+    for part in parts:
+        counts = Counter()
+        for line in part.get("order_lines") or []:
+            all_lines.append(line)
+            key = _line_key(line)
+            counts[key] += 1
+            if counts[key] > max_count.get(key, 0):
+                max_count[key] = counts[key]
+                deduped.append(line)
+
+    with_gross = [p for p in parts if p.get("total_gross") is not None]
+    totals = with_gross[-1] if with_gross else {}
+
+    def total_field(field):
+        if totals.get(field) is not None:
+            return totals[field]
+        return next((p[field] for p in reversed(parts) if p.get(field) is not None), None)
+
+    shipping, tax = total_field("shipping_net"), total_field("tax_amount")
+    gross = totals.get("total_gross")
+
+    def fits_gross(net: float) -> bool:
+        # Ohne Endsumme oder Steuer lässt sich nichts gegenprüfen
+        return gross is None or tax is None or _close(net + (shipping or 0) + tax, gross)
+
+    # Genannte Nettosummen (Teil mit der Endsumme zuerst), dazu die aus der Endsumme zurückgerechnete
+    nets = [p["positions_net"] for p in reversed(parts) if p.get("positions_net") is not None]
+    if gross is not None and tax is not None:
+        nets.append(round(gross - (shipping or 0) - tax, 2))
+    nets = [n for n in nets if fits_gross(n)]
+
+    order, positions_net = all_lines, None
+    for lines in (all_lines, deduped):
+        lines_sum = _lines_sum(lines)
+        matching = next((n for n in nets if _close(n, lines_sum)), None)
+        if matching is not None:
+            order, positions_net = lines, matching
+            break
+    if positions_net is None:
+        # Keine Summe passt: alle Positionen behalten, Netto möglichst passend zur Endsumme
+        lines_sum = _lines_sum(all_lines)
+        candidates = ([lines_sum] if all_lines else []) + nets
+        positions_net = next((n for n in candidates if fits_gross(n)), None)
+    if gross is None and positions_net is not None:
+        gross = round(positions_net + (shipping or 0) + (tax or 0), 2)
+
+    return {
+        "vendor_name": first("vendor_name"),
+        "vendor_vat_id": first("vendor_vat_id"),
+        "department": first("department"),
+        "order_lines": order,
+        "positions_net": positions_net,
+        "shipping_net": shipping,
+        "tax_amount": tax,
+        "total_gross": gross,
+        "currency": totals.get("currency") or first("currency") or "EUR",
+    }
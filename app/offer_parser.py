@@ -0,0 +1,231 @@
+"""
+Lokaler Schnellpfad für strukturierte deutsche Angebote (ERP-Vorlagen).
+
+Erkennt Positionstabellen ("Pos / Menge / Einheit / Einzelpreis / Gesamt"),
+Summenblöcke ("Nettobetrag / Versand / USt / Endsumme"), Vendor und USt-IdNr.
+rein regelbasiert – ohne KI, in Millisekunden.
+
+Ergebnis wird nur übernommen, wenn alle Gegenproben stimmen:
+- jede Position: Menge × Einzelpreis = Gesamt,
+- Summe der Positionen = Positionen netto,
+- Positionen + Versand + Steuer = Endsumme,
+- keine Zeile mit Betrag in der Tabelle blieb unerkannt (z.B. Rabatt).
+Sonst liefert parse_offer_locally() None + Gründe, und die KI extrahiert wie bisher.
+"""
+import re
+from typing import Optional
+
+from intake import normalize_offer_text, parse_de_number_to_float
+
+# Toleranz für Rundung (Cent) bei den Gegenproben
+AMOUNT_TOLERANCE = 0.015
+# Vendor steht im Briefkopf
+VENDOR_SEARCH_LINES = 15
+
+MONEY = r"-?(?:\d{1,3}(?:\.\d{3})+|\d+),\d{2}(?!\d)"
+PRICE = r"-?(?:\d{1,3}(?:\.\d{3})+|\d+),\d{2,4}(?!\d)"
+QTY = r"\d+(?:[.,]\d+)?"
+CUR = r"(?:€|EUR|USD|\$|GBP|£)"
+UNIT = (
+    r"(?:Stk\.?|Stück|Stck\.?|St\.|pcs|Pkt\.?|Paket|Set|VE|Rolle[n]?|Karton|"
+    r"h|Std\.?|Stunde[n]?|Tag(?:e)?|Monat(?:e)?|Lizenz(?:en)?|"
+    r"m²|m2|qm|lfm|m|kg|l|Psch\.?|pausch\.?|pauschal)"
+)
+
+_money = re.compile(MONEY)
+_row_desc_first = re.compile(
+    rf"^\s*(?P<pos>\d{{1,3}})[.)]?\s+(?P<desc>.+?)\s+(?P<qty>{QTY})\s*(?P<unit>{UNIT})?\s+"
+    rf"(?:{CUR}\s*)?(?P<price>{PRICE})\s*{CUR}?\s+(?:{CUR}\s*)?(?P<total>{MONEY})\s*{CUR}?\s*$"
+)
+_row_qty_first = re.compile(
+    rf"^\s*(?P<pos>\d{{1,3}})[.)]?\s+(?P<qty>{QTY})\s*(?P<unit>{UNIT})\s+(?P<desc>.+?)\s+"
+    rf"(?:{CUR}\s*)?(?P<price>{PRICE})\s*{CUR}?\s+(?:{CUR}\s*)?(?P<total>{MONEY})\s*{CUR}?\s*$"
+)
+_HEADER_WORDS = ("pos", "menge", "anzahl", "einheit", "beschreibung", "bezeichnung", "artikel",
+                 "einzelpreis", "ep", "gesamt", "gesamtpreis", "gp", "betrag")
+_word = re.compile(r"[a-zäöüß]+")
+
+# Reihenfolge = Priorität: Steuerzeilen enthalten oft "Versand" oder "netto"
+TOTAL_LABELS = (
+    ("tax_amount", r"(?:zzgl\.?\s*)?(?:\d{1,2}(?:,\d+)?\s*%\s*)?(?:USt|MwSt|Mehrwertsteuer|Umsatzsteuer)\b(?!-?Id)"),
+    ("shipping_net", r"(?:zzgl\.?\s*)?(?:Versand(?:kosten)?|Fracht(?:kosten)?|Porto|Liefer(?:kosten|pauschale))\b"),
+    ("total_gross", r"(?:Endsumme|Gesamtbetrag|Gesamtsumme|Rechnungsbetrag|Angebotssumme|Bruttobetrag|"
+                    r"Summe\s+brutto|Gesamt\s+brutto)\b"),
+    ("net", r"(?:Summe\s+Positionen|Positionen\s+netto|Positionssumme|Nettobetrag|Nettosumme|"
+            r"Summe\s+netto|Gesamt\s+netto|Zwischensumme|Warenwert(?:\s+netto)?)\b"),
+)
+_total_line = [(field, re.compile(rf"^\s*{label}[^\n]*?({MONEY})\s*{CUR}?\s*$", re.I)) for field, label in TOTAL_LABELS]
+# Seitenumbruch mitten in der Tabelle
+_carry_line = re.compile(r"^\s*(?:Übertrag|Seite\s+\d+\s*(?:von|/)\s*\d+)", re.I)
+
+_vat_labelled = re.compile(
+    r"(?:USt\.?[-\s]?Id(?:ent)?\.?[-\s]?Nr\.?|USt-?ID|UID(?:-Nr\.?)?|VAT(?:\s*(?:ID|No\.?|Reg\.?\s*No\.?))?|"
+    r"Umsatzsteuer-?Identifikationsnummer)\s*:?\s*(?P<vat>[A-Z]{2}\s?[A-Z]?\s?\d(?:\s?\d){7,11})\b",
+    re.I,
+)
+_vat_plain = re.compile(r"\b(?:DE\d{9}|ATU\d{8})\b")
+_legal_form = re.compile(
+    r"\b(?:GmbH\s*&\s*Co\.\s*KG|GmbH|gGmbH|AG|KGaA|KG|OHG|UG(?:\s*\(haftungsbeschränkt\))?|e\.\s?K\.|GbR|SE|"
+    r"Ltd\.?|Inc\.?|mbH)(?=$|[\s,·|;])"
+)
+_vendor_split = re.compile(r"\s*(?:·|\||;|,|\t|\s{3,})\s*")
+_department = re.compile(r"^\s*(?:Abteilung|Department|Kostenstelle)\s*:\s*(?P<dept>.+?)\s*$", re.I | re.M)
+
+
+def _amount(s: str) -> float:
+    return parse_de_number_to_float(s)
+
+
+def _close(a: float, b: float) -> bool:
+    return abs(a - b) <= AMOUNT_TOLERANCE
+
+
+def is_table_header(line: str) -> bool:
+    words = set(_word.findall(line.lower()))
+    return len(words.intersection(_HEADER_WORDS)) >= 3
+
+
+def match_row(line: str) -> Optional[dict]:
+    m = _row_desc_first.match(line) or _row_qty_first.match(line)
+    if m is None:
+        return None
+    return {
+        "description": m.group("desc").strip(),
+        "unit_price": _amount(m.group("price")),
+        "quantity": _amount(m.group("qty")),
+        "unit": (m.group("unit") or "").strip() or None,
+        "line_total": _amount(m.group("total")),
+    }
+
+
+def match_total(line: str) -> Optional[tuple[str, float]]:
+    for field, rx in _total_line:
+        m = rx.match(line)
+        if m:
+            return field, _amount(m.group(1))
+    return None
+
+
+def find_vendor(lines: list[str]) -> Optional[str]:
+    for line in lines[:VENDOR_SEARCH_LINES]:
+        for part in _vendor_split.split(line.strip()):
+            if _legal_form.search(part) and len(part) <= 80:
+                return part.strip()
+    return None
+
+
+def find_vat_id(text: str) -> Optional[str]:
+    m = _vat_labelled.search(text)
+    if m:
+        return re.sub(r"\s+", "", m.group("vat")).upper()
+    m = _vat_plain.search(text)
+    return m.group(0) if m else None
+
+
+def find_currency(text: str) -> str:
+    if re.search(r"USD|\$", text):
+        return "USD"
+    if re.search(r"GBP|£", text):
+        return "GBP"
+    return "EUR"
+
+
+def parse_table(lines: list[str]) -> tuple[list[dict], dict[str, list[float]], list[str]]:
+    """Positionen, gefundene Summen (Feld → Beträge) und Probleme."""
+    rows, totals, problems = [], {}, []
+    in_table = False
+    # nach einem Seitenumbruch ist Text bis zur nächsten Position Kopf/Fußzeile, keine Beschreibung
+    after_break = False
+    for line in lines:
+        if not line.strip():
+            continue
+        if is_table_header(line):
+            in_table = True
+            continue
+        total = match_total(line)
+        if total is not None:
+            totals.setdefault(total[0], []).append(total[1])
+            in_table = False
+            continue
+        if not in_table:
+            continue
+        row = match_row(line)
+        if row is not None:
+            rows.append(row)
+            after_break = False
+        elif _carry_line.match(line):
+            after_break = True
+        elif _money.search(line):
+            # Betrag ohne erkennbare Position (Rabatt, Zuschlag, anderes Layout) → nicht raten
+            problems.append(f"Tabellenzeile nicht erkannt: {line.strip()[:60]}")
+        elif rows and not after_break:
+            # Fortsetzung der Beschreibung über mehrere Zeilen
+            rows[-1]["description"] += " " + line.strip()
+    return rows, totals, problems
+
+
+def check_amounts(rows: list[dict], totals: dict[str, list[float]]) -> tuple[dict, list[str]]:
+    problems = []
+    for i, r in enumerate(rows, start=1):
+        if not _close(round(r["quantity"] * r["unit_price"], 2), r["line_total"]):
+            problems.append(f"Position {i}: Menge × Einzelpreis ≠ Gesamt")
+    lines_sum = round(sum(r["line_total"] for r in rows), 2)
+
+    shipping = round(sum(totals.get("shipping_net", [])), 2) if "shipping_net" in totals else None
+    tax = round(sum(totals.get("tax_amount", [])), 2) if "tax_amount" in totals else None
+    gross_candidates = totals.get("total_gross", [])
+    gross = gross_candidates[-1] if gross_candidates else None
+
+    positions_net = None
+    for net in totals.get("net", []):
+        if _close(net, lines_sum):
+            positions_net = net
+        elif not _close(net, lines_sum + (shipping or 0)):
+            # "Nettobetrag" inkl. Versand ist ok, alles andere passt nicht zu den Positionen
+            problems.append(f"Netto-Summe {net:.2f} passt nicht zur Positionssumme {lines_sum:.2f}")
+    if totals.get("net") and positions_net is None and not problems:
+        problems.append("Keine Netto-Summe entspricht der Positionssumme")
+
+    if gross is not None:
+        expected = lines_sum + (shipping or 0) + (tax or 0)
+        if not _close(gross, expected):
+            problems.append(f"Endsumme {gross:.2f} ≠ Positionen + Versand + Steuer ({expected:.2f})")
+    elif positions_net is None:
+        problems.append("Weder Netto-Summe noch Endsumme gefunden")
+
+    amounts = {"positions_net": positions_net, "shipping_net": shipping, "tax_amount": tax, "total_gross": gross}
+    return amounts, problems
+
+
+def parse_offer_locally(text: str) -> tuple[Optional[dict], list[str]]:
+    """
+    (ExtractedOffer-Felder als dict, []) wenn das Angebot sicher erkannt wurde,
+    sonst (None, Gründe) → KI-Extraktion.
+    """
+    text = normalize_offer_text(text or "")
+    lines = text.splitlines()
+
+    rows, totals, problems = parse_table(lines)
+    if not rows:
+        return None, ["Keine Positionstabelle gefunden"]
+    amounts, amount_problems = check_amounts(rows, totals)
+    problems += amount_problems
+
+    vendor = find_vendor(lines)
+    if vendor is None:
+        problems.append("Kein Vendor (Firmenname mit Rechtsform) im Briefkopf")
+    if problems:
+        return None, problems
+
+    dept = _department.search(text)
+    offer = {
+        "vendor_name": vendor,
+        "vendor_vat_id": find_vat_id(text),
+        "department": dept.group("dept") if dept else None,
+        "order_lines": [
+            {k: r[k] for k in ("description", "unit_price", "quantity", "unit")} for r in rows
+        ],
+        **amounts,
+        "currency": find_currency(text),
+    }
+    return offer, []
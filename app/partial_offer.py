@@ -0,0 +1,97 @@
+"""
+Teilergebnisse aus einer gestreamten Extraktion (Structured Outputs): solange das JSON
+noch nicht vollständig ist, schon fertige Felder herausholen.
+
+Das Modell schreibt die Felder in Schema-Reihenfolge (vendor_name, vendor_vat_id,
+department, order_lines, Summen …) – beim One-Shot verschachtelt unter "offer". Ein Feld
+gilt als fertig, sobald sein Wert vollständig dasteht (String mit schließendem
+Anführungszeichen, null); eine Position, sobald ihr Objekt mit "}" geschlossen ist.
+Zahlen auf oberster Ebene (Summen) werden nicht vorab gelesen: "12" kann noch "12.5" werden.
+
+Nur Standardbibliothek; validiert wird beim Aufrufer (ai_service), endgültig erst am Ende.
+"""
+import json
+import re
+from typing import Optional
+
+HEADER_FIELDS = ("vendor_name", "vendor_vat_id", "department")
+
+_decoder = json.JSONDecoder()
+_key = {field: re.compile(rf'"{field}"\s*:\s*') for field in HEADER_FIELDS}
+_lines_start = re.compile(r'"order_lines"\s*:\s*\[')
+_skip = re.compile(r"[\s,]*")
+_INCOMPLETE = object()
+
+
+class PartialOfferParser:
+    """
+    feed(bisheriger Antworttext) → Snapshot {Kopffelder, "order_lines": [...]}, wenn seit dem
+    letzten Aufruf ein Feld oder eine Position fertig geworden ist, sonst None.
+    Arbeitet inkrementell: fertige Positionen werden nicht erneut gelesen.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._text = ""
+        self.fields: dict = {}
+        self.order_lines: list[dict] = []
+        self._lines_pos: Optional[int] = None
+        self._lines_done = False
+
+    def feed(self, text: str) -> Optional[dict]:
+        if not text.startswith(self._text):
+            # Neuer Versuch (Retry im Gateway) beginnt wieder bei "{"
+            self.reset()
+        self._text = text
+        changed = False
+        for field in HEADER_FIELDS:
+            if field not in self.fields:
+                value = self._header_value(field)
+                if value is not _INCOMPLETE:
+                    self.fields[field] = value
+                    changed = True
+        if not self._lines_done:
+            changed |= self._scan_lines()
+        return self.snapshot() if changed else None
+
+    def snapshot(self) -> dict:
+        return {**self.fields, "order_lines": list(self.order_lines)}
+
+    def _header_value(self, field: str):
+        m = _key[field].search(self._text)
+        if m is None:
+            # Feld fehlt, die Positionen laufen aber schon → kommt nicht mehr
+            return None if self._lines_pos is not None else _INCOMPLETE
+        try:
+            value, _end = _decoder.raw_decode(self._text, m.end())
+        except json.JSONDecodeError:
+            return _INCOMPLETE
+        return value if isinstance(value, str) or value is None else None
+
+    def _scan_lines(self) -> bool:
+        text = self._text
+        if self._lines_pos is None:
+            m = _lines_start.search(text)
+            if m is None:
+                return False
+            self._lines_pos = m.end()
+        pos, added = self._lines_pos, False
+        while True:
+            pos = _skip.match(text, pos).end()
+            if pos >= len(text):
+                break
+            if text[pos] == "]":
+                self._lines_done = True
+                break
+            try:
+                line, pos = _decoder.raw_decode(text, pos)
+            except json.JSONDecodeError:
+                # Position noch nicht zu Ende gestreamt
+                break
+            if isinstance(line, dict):
+                self.order_lines.append(line)
+                added = True
+            self._lines_pos = pos
+        return added
@@ -0,0 +1,126 @@
+"""
+DSGVO: Redaction (personenbezogene Daten maskieren) in einem Durchlauf.
+
+Alle Muster stecken in EINER vorkompilierten Alternation, der Text wird nur
+einmal gescannt. Die Muster sind so formuliert, dass sie linear bleiben
+(keine verschachtelten, mehrdeutigen Wiederholungen wie früher beim Telefon-Regex).
+redact_stream() arbeitet chunkweise auf gestreamtem Seitentext.
+"""
+import re
+from typing import Iterable, Iterator
+
+from metrics import timed
+
+# Reihenfolge = Priorität bei gleicher Startposition (wie früher die Reihenfolge der re.sub-Pässe)
+REDACTION_PATTERN = re.compile(
+    # E-Mail: Local-Part "atomar" über Lookahead+Rückverweis, Start nur am Anfang eines Local-Parts
+    r"(?P<email>(?i:(?<![A-Z0-9._%+-])(?=(?P<local>[A-Z0-9._%+-]+))(?P=local)@[A-Z0-9.-]+\.[A-Z]{2,}\b))"
+    # Ansprechpartner / Contact Person (einfach); das angeschnittene Token am Fensterende gehört noch dazu,
+    # sonst bleibt der Rest einer IBAN/Telefonnummer stehen (die alten Pässe zählten nach deren Platzhaltern)
+    r"|(?P<person>(?P<person_label>(?i:ansprechpartner|kontakt|bearbeiter))(?i:\s*:\s*)[^\n\r]{1,60}\S*)"
+    # Alle übrigen Muster beginnen an einer Wortgrenze → \b nur einmal prüfen (mitten im Wort sofort weiter)
+    r"|\b(?:"
+    # Telefonnummer (grob): "\d{3,}[\s\-]?\d{2,}" aufgeteilt in "mit Trenner" | "ohne Trenner",
+    # damit eine lange Ziffernfolge nicht an jeder Stelle geteilt wird (quadratisches Backtracking)
+    r"(?P<phone>(?=[+(\d])(?:\+?\d{1,3}[\s\-]?)?(?:\(?\d{2,5}\)?[\s\-]?)?(?:\d{3,}[\s\-]\d{2,}|\d{5,})\b)"
+    # IBAN (DE + allgemein grob)
+    r"|(?P<iban>[A-Z]{2}\d{2}[A-Z0-9]{11,30}\b)"
+    # BIC (8 oder 11 Zeichen)
+    r"|(?P<bic>[A-Z]{4}[A-Z]{2}[A-Z0-9]{2}(?:[A-Z0-9]{3})?\b)"
+    r")"
+)
+
+# E-Mail ohne Lookbehind: nur direkt am Ende eines vorherigen Treffers probiert (siehe _matches)
+EMAIL_TAIL_PATTERN = re.compile(
+    r"(?P<email>(?i:(?=(?P<local>[A-Z0-9._%+-]+))(?P=local)@[A-Z0-9.-]+\.[A-Z]{2,}\b))"
+)
+
+PLACEHOLDERS = {
+    "email": "[EMAIL]",
+    "phone": "[PHONE]",
+    "iban": "[IBAN]",
+    "bic": "[BIC]",
+}
+
+# Beim Streaming bleibt so viel Text im Puffer, bis klar ist, dass kein Treffer über die Chunk-Grenze geht
+STREAM_CARRY = 512
+STREAM_MAX_BUFFER = 64 * STREAM_CARRY
+
+WHITESPACE_CHARS = (" ", "\n", "\t", "\r")
+
+
+def _replacement(m: re.Match) -> str:
+    kind = m.lastgroup
+    if kind == "person":
+        return f'{m.group("person_label")}: [PERSON]'
+    return PLACEHOLDERS[kind]
+
+
+def _matches(text: str) -> Iterator[re.Match]:
+    """
+    Wie REDACTION_PATTERN.finditer, plus E-Mails, die direkt an einen Treffer anschließen.
+    Endet ein Treffer mitten in einem Local-Part-Lauf ("a@x.de+max@y.de", "0171 2345678-max@x.de"),
+    sperrt der Lookbehind jede Startposition im Rest → dort einmal verankert nachprüfen.
+    """
+    m = REDACTION_PATTERN.search(text)
+    while m is not None:
+        yield m
+        m = EMAIL_TAIL_PATTERN.match(text, m.end()) or REDACTION_PATTERN.search(text, m.end())
+
+
+@timed("redact", "text")
+def redact_personal_data(text: str) -> str:
+    """
+    Heuristische Maskierung typischer personenbezogener Daten.
+    Ziel: Datenminimierung, bevor Text an OpenAI geht.
+    """
+    if not text:
+        return ""
+    out, pos = [], 0
+    for m in _matches(text):
+        out.append(text[pos:m.start()])
+        out.append(_replacement(m))
+        pos = m.end()
+    out.append(text[pos:])
+    return "".join(out)
+
+
+def redact_stream(chunks: Iterable[str]) -> Iterator[str]:
+    """Wie redact_personal_data, aber chunkweise (z.B. Seite für Seite aus dem PDF)."""
+    buf = ""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buf += chunk
+        safe = len(buf) - STREAM_CARRY
+        if safe <= 0:
+            continue
+
+        out, pos, cut = [], 0, None
+        for m in _matches(buf):
+            if m.end() > safe:
+                # Treffer reicht in den Puffer-Rest → könnte mit dem nächsten Chunk länger werden
+                cut = m.start()
+                break
+            out.append(buf[pos:m.start()])
+            out.append(_replacement(m))
+            pos = m.end()
+
+        if cut is None:
+            # Nur an Whitespace schneiden: dort hängen \b/Lookbehind nicht vom Zeichen davor ab
+            ws = max(buf.rfind(c, pos, safe) for c in WHITESPACE_CHARS)
+            if ws >= 0:
+                cut = ws + 1
+            elif len(buf) > STREAM_MAX_BUFFER:
+                cut = safe
+            else:
+                cut = pos
+
+        out.append(buf[pos:cut])
+        emitted = "".join(out)
+        if emitted:
+            yield emitted
+        buf = buf[cut:]
+
+    if buf:
+        yield redact_personal_data(buf)
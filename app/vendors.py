@@ -0,0 +1,96 @@
+"""
+Vendor-Stammdaten: Normalisierung und unscharfer Namensabgleich.
+
+"Muster GmbH", "Muster GmbH." und "MUSTER G.m.b.H." sind derselbe Vendor. Zuordnung
+eines Requests (Tabellen vendors/vendor_trigrams und die Lookups liegen in db):
+1. USt-Id, normalisiert (Großbuchstaben, ohne Leer-/Trennzeichen) – eindeutig pro Vendor,
+2. sonst der kanonische Name (klein, Umlaute ausgeschrieben, ohne Satzzeichen),
+3. sonst der ähnlichste bekannte Name: Jaccard-Ähnlichkeit der Trigramme des Kernnamens
+   (ohne Rechtsform) ≥ VENDOR_MATCH_THRESHOLD, jedes Wort hat ein ähnliches Gegenstück, die
+   Rechtsformen widersprechen sich nicht und enthaltene Zahlen sind gleich.
+Jede einem Vendor zugeordnete Schreibweise wird als weiterer Name gemerkt: spätere Varianten
+werden gegen alle bekannten Schreibweisen verglichen, nicht nur gegen die erste.
+Zwei verschiedene USt-Ids sind nie derselbe Vendor, egal wie ähnlich die Namen sind.
+
+Nur Standardbibliothek.
+"""
+import os
+import re
+import unicodedata
+from typing import Optional
+
+# 0.7: Tippfehler in längeren Namen ("Bueroausstatung") passen, "Muster"/"Muster Bau" (0.64) nicht;
+# kurze Namen mit einem Buchstaben Unterschied ("Schmidt"/"Schmitt") bleiben getrennt
+VENDOR_MATCH_THRESHOLD = float(os.getenv("VENDOR_MATCH_THRESHOLD", "0.7"))
+# Pro Wort: ein Tippfehler in "Logistik" (0.55) passt, "Engel"/"Eifel" (0.2) nicht
+WORD_MATCH_THRESHOLD = 0.5
+
+LEGAL_FORMS = frozenset({
+    "gmbh", "mbh", "ag", "kg", "kgaa", "ohg", "gbr", "ug", "haftungsbeschraenkt", "ek", "ev", "se", "co",
+    "ltd", "limited", "inc", "llc", "plc", "corp", "bv", "nv", "sarl", "sa", "srl", "spa", "ab", "oy",
+})
+
+_umlauts = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+_abbrev_dot = re.compile(r"(?<=\w)\.(?=\w)")
+_non_word = re.compile(r"[\W_]+")
+_vat_separators = re.compile(r"[\s.\-/]+")
+_vat_format = re.compile(r"^[A-Z]{2}[0-9A-Z]{2,13}$")
+
+
+def normalize_vat_id(vat_id: Optional[str]) -> Optional[str]:
+    """"de 123.456.789" → "DE123456789"; None, wenn es nicht nach einer USt-Id aussieht (leer, maskiert, "n/a")."""
+    vat = _vat_separators.sub("", vat_id or "").upper()
+    if not _vat_format.match(vat) or not any(c.isdigit() for c in vat):
+        return None
+    return vat
+
+
+def canonical_name(name: Optional[str]) -> str:
+    """Vergleichsschlüssel: "Müller G.m.b.H. & Co. KG" → "mueller gmbh co kg"."""
+    text = unicodedata.normalize("NFKC", name or "").lower().translate(_umlauts)
+    # Übrige Akzente weg (é → e)
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    text = _abbrev_dot.sub("", text)
+    return " ".join(_non_word.sub(" ", text).split())
+
+
+def legal_forms(canonical: str) -> frozenset:
+    return frozenset(w for w in canonical.split() if w in LEGAL_FORMS)
+
+
+def core_name(canonical: str) -> str:
+    # Ohne Rechtsform: "Muster" und "Muster GmbH" sollen sich finden; nur Rechtsform → Name bleibt
+    return " ".join(w for w in canonical.split() if w not in LEGAL_FORMS) or canonical
+
+
+def name_trigrams(canonical: str) -> set[str]:
+    """Trigramme pro Wort des Kernnamens, vorn mit zwei, hinten mit einem Leerzeichen (wie pg_trgm)."""
+    grams = set()
+    for word in core_name(canonical).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def word_similarity(a: str, b: str) -> float:
+    grams_a, grams_b = name_trigrams(a), name_trigrams(b)
+    return len(grams_a & grams_b) / len(grams_a | grams_b) if grams_a or grams_b else 1.0
+
+
+def names_compatible(a: str, b: str) -> bool:
+    """Zusatzbedingungen für den unscharfen Abgleich (Trigramme allein verwechseln diese Fälle)."""
+    # "Muster GmbH" ≠ "Muster AG"; fehlt die Rechtsform auf einer Seite, entscheidet der Name
+    forms_a, forms_b = legal_forms(a), legal_forms(b)
+    if forms_a and forms_b and forms_a != forms_b:
+        return False
+    # Zahlen unterscheiden Firmen ("Lager 1"/"Lager 10", "Büroprofi24"/"Büroprofi25") → müssen gleich sein
+    if _numbers(a) != _numbers(b):
+        return False
+    # Jedes Wort des kürzeren Namens braucht ein ähnliches Gegenstück: ein langes gemeinsames Wort
+    # ("Engel Sicherheitsdienst"/"Eifel Sicherheitsdienst") hebt die Gesamtähnlichkeit sonst über die Schwelle
+    words_a, words_b = sorted((core_name(a).split(), core_name(b).split()), key=len)
+    return all(any(word_similarity(w, v) >= WORD_MATCH_THRESHOLD for v in words_b) for w in words_a)
+
+
+def _numbers(canonical: str) -> list[str]:
+    return re.findall(r"\d+", canonical)
@@ -0,0 +1,126 @@
+"""
+Benchmark: Schreibdurchsatz (Zeilen/s) beim Anlegen vieler Requests.
+
+"vorher"  = alter insert_request: ein execute pro Order Line, ein Commit pro Request
+"nachher" = db.insert_requests: executemany, viele Requests pro Transaktion
+
+Zeilen = Requests + Order Lines + Status-History-Einträge.
+
+Aufruf:  python scripts/bench_bulk_insert.py [--requests 10000] [--lines 50] [--batch 1000]
+                                             [--legacy-requests 10000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import db  # noqa: E402
+
+
+def make_items(n_requests: int, n_lines: int):
+    for i in range(n_requests):
+        header = {
+            "requestor_name": "Bench",
+            "department": "Marketing",
+            "title": f"Request {i}",
+            "vendor_name": f"Vendor {i % 50}",
+            "vendor_vat_id": "DE123456789",
+            "commodity_group_id": "009",
+            "commodity_group_name": "General Services – Miscellaneous Services",
+            "total_cost": 10.0 * n_lines,
+            "currency": "EUR",
+            "submit_status": "Draft",
+            "process_status": "Open",
+            "created_at": "2024-01-01T00:00:00",
+        }
+        lines = [
+            {"description": f"Pos {j}", "unit_price": 10.0, "quantity": 1.0, "unit": "pcs", "line_total": 10.0}
+            for j in range(n_lines)
+        ]
+        yield header, lines
+
+
+# -----------------------------
+# Alter Stand: Zeile für Zeile, ein Commit pro Request
+# -----------------------------
+def legacy_insert_request(header: dict, lines: list[dict]) -> int:
+    with db.get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(db.SQL_INSERT_REQUEST, db.request_row(header))
+        request_id = cur.lastrowid
+        for l in lines:
+            cur.execute(db.SQL_INSERT_ORDER_LINE, db.order_line_row(request_id, l))
+        cur.execute(db.SQL_INSERT_STATUS_HISTORY,
+                    (request_id, None, header["process_status"], header["created_at"], "Initial status"))
+        conn.commit()
+    return request_id
+
+
+def run_legacy(n_requests: int, n_lines: int) -> float:
+    t0 = time.perf_counter()
+    for header, lines in make_items(n_requests, n_lines):
+        legacy_insert_request(header, lines)
+    return time.perf_counter() - t0
+
+
+def run_bulk(n_requests: int, n_lines: int, batch: int) -> float:
+    t0 = time.perf_counter()
+    chunk = []
+    for item in make_items(n_requests, n_lines):
+        chunk.append(item)
+        if len(chunk) >= batch:
+            db.insert_requests(chunk)
+            chunk = []
+    if chunk:
+        db.insert_requests(chunk)
+    return time.perf_counter() - t0
+
+
+def count_rows() -> tuple[int, int, int]:
+    with db.get_conn() as conn:
+        return tuple(
+            conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+            for t in ("requests", "order_lines", "status_history")
+        )
+
+
+def report(label: str, n_requests: int, n_lines: int, seconds: float):
+    rows = n_requests * (n_lines + 2)
+    print(f"{label:<10} {n_requests:>6} Requests  {rows:>8} Zeilen  {seconds:7.2f} s  "
+          f"{rows / seconds:>10,.0f} Zeilen/s  {n_requests / seconds:>8,.0f} Requests/s")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=10_000)
+    ap.add_argument("--lines", type=int, default=50)
+    ap.add_argument("--batch", type=int, default=1000, help="Requests pro Transaktion (bulk)")
+    ap.add_argument("--legacy-requests", type=int, help="weniger Requests für den langsamen Altstand")
+    args = ap.parse_args()
+    legacy_n = args.legacy_requests or args.requests
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "legacy.db")
+        db.init_db()
+        report("vorher", legacy_n, args.lines, run_legacy(legacy_n, args.lines))
+
+        db.DB_PATH = os.path.join(tmp, "bulk.db")
+        db.init_db()
+        report("nachher", args.requests, args.lines, run_bulk(args.requests, args.lines, args.batch))
+
+        expected = (args.requests, args.requests * args.lines, args.requests)
+        got = count_rows()
+        db.close_all_connections()
+
+    if got != expected:
+        print(f"FEHLER: erwartet {expected} Zeilen (requests, order_lines, status_history), gefunden {got}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
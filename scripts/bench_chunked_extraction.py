@@ -0,0 +1,205 @@
+"""
+Benchmark: KI-Extraktion langer Angebote – ein Aufruf mit dem ganzen Dokument vs.
+Boilerplate entfernen + Map-Reduce über Teile (app/offer_chunking.py).
+
+Erzeugt einen Rahmenvertrag mit --pages Seiten (Deckblatt, Positionstabelle über mehrere
+Seiten mit Seitenfuß, Summenblock, danach AGB/Datenschutz) mit Seitenumbrüchen wie aus
+document_text und extrahiert ihn gegen den KI-Stand-in im Prozess. Der Stand-in rechnet
+Zeit pro Token wie ein echtes Modell (--ms-per-output-token, --ms-per-1k-input-tokens),
+Tokens ≈ Zeichen / 4 inkl. Schema.
+
+"vorher"  = ein Aufruf mit dem ganzen Text (bisheriges extract_offer_with_openai)
+"nachher" = extract_offer_async: Boilerplate raus, Teile parallel, zusammengeführt
+
+Aufruf:  python scripts/bench_chunked_extraction.py [--pages 40] [--positions 120]
+Exit-Code 1, wenn das zusammengeführte Ergebnis Positionen oder Summen verliert
+(auch in den kleinen Fällen aus MERGE_CASES).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+AGB_PARAGRAPH = (
+    "§ {n} {title}\n"
+    "({n}.1) Die nachfolgenden Bestimmungen gelten für alle Lieferungen und Leistungen des Auftragnehmers, "
+    "soweit nicht im Einzelfall schriftlich etwas anderes vereinbart wurde. Abweichende Bedingungen des "
+    "Auftraggebers werden nicht Vertragsbestandteil, auch wenn der Auftragnehmer ihnen nicht ausdrücklich widerspricht.\n"
+    "({n}.2) Mündliche Nebenabreden bestehen nicht. Änderungen und Ergänzungen bedürfen der Schriftform; "
+    "dies gilt auch für die Aufhebung dieses Schriftformerfordernisses.\n"
+    "({n}.3) Sollte eine Bestimmung unwirksam sein, bleibt die Wirksamkeit der übrigen Bestimmungen unberührt.\n"
+)
+AGB_TITLES = ("Geltungsbereich", "Angebot und Vertragsschluss", "Preise und Zahlung", "Lieferung",
+              "Gefahrübergang", "Gewährleistung", "Haftung", "Eigentumsvorbehalt", "Schlussbestimmungen")
+
+
+def framework_offer(pages: int, positions: int) -> tuple[str, dict]:
+    """(Text mit \\f als Seitenumbruch, erwartete Werte)."""
+    header = "Pos  Beschreibung                             Menge  Einheit  Einzelpreis  Gesamt"
+    per_page = 30
+    table_pages = max(1, -(-positions // per_page))
+    agb_pages = max(1, pages - 1 - table_pages)
+    total_pages = 1 + table_pages + agb_pages
+
+    out = [
+        "Büroprofi Schmidt GmbH · Industriestraße 12 · 70565 Stuttgart · USt-IdNr. DE123456789\n\n"
+        "Rahmenangebot Nr. RA-2024-117 – Büroausstattung Standorte Süd\n"
+        "Abteilung: Facility Management\n\n"
+        "Sehr geehrte Damen und Herren,\nvielen Dank für Ihre Anfrage. Gerne bieten wir Ihnen an:\n\n"
+        f"Seite 1 von {total_pages}\n"
+    ]
+    net = 0.0
+    for p in range(table_pages):
+        rows = []
+        for i in range(p * per_page + 1, min(positions, (p + 1) * per_page) + 1):
+            qty, price = 1 + i % 7, 40 + (i * 37) % 900
+            net += qty * price
+            rows.append(f"{i:<4} Büromöbel Artikel {i:03d} Serie {chr(65 + i % 26)}{' ' * 8}{qty} Stk  "
+                        f"{price:,.2f} €  {qty * price:,.2f} €".replace(",", "X").replace(".", ",").replace("X", "."))
+        page = f"{header}\n" + "\n".join(rows) + "\n"
+        if p == table_pages - 1:
+            shipping = 250.0
+            tax = round((net + shipping) * 0.19, 2)
+            fmt = lambda v: f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")  # noqa: E731
+            page += (f"\nSumme Positionen {fmt(net)} €\nVersandkosten netto {fmt(shipping)} €\n"
+                     f"zzgl. 19 % USt {fmt(tax)} €\nGesamtbetrag {fmt(net + shipping + tax)} €\n")
+        out.append(f"{page}\nSeite {p + 2} von {total_pages}\n")
+
+    n = 1
+    for p in range(agb_pages):
+        text = "Allgemeine Geschäftsbedingungen\n" if p == 0 else ""
+        for _ in range(3):
+            text += AGB_PARAGRAPH.format(n=n, title=AGB_TITLES[(n - 1) % len(AGB_TITLES)])
+            n += 1
+        if p == agb_pages - 1:
+            text += "\nDatenschutzhinweise\nWir verarbeiten Ihre Daten ausschließlich zur Vertragsabwicklung.\n"
+        out.append(f"{text}\nSeite {2 + table_pages + p} von {total_pages}\n")
+
+    expected = {"order_lines": positions, "positions_net": round(net, 2), "shipping_net": 250.0,
+                "tax_amount": round((net + 250.0) * 0.19, 2), "total_gross": round(net * 1.19 + 250.0 * 1.19, 2)}
+    return "\f".join(out), expected | {"pages": total_pages}
+
+
+def _line(description: str, unit_price: float, quantity: float = 1) -> dict:
+    return {"description": description, "unit_price": unit_price, "quantity": quantity, "unit": None}
+
+
+# (Teile, erwartete Anzahl Positionen, erwartete Summen) für merge_extractions
+MERGE_CASES = {
+    "echte Wiederholung, Netto passt zu allen Positionen": (
+        [{"order_lines": [_line("Moos", 100), _line("Montage vor Ort", 80, 2)]},
+         {"order_lines": [_line("Acryl", 50), _line("Montage vor Ort", 80, 2)],
+          "positions_net": 470.0, "total_gross": 559.3}],
+        4, {"positions_net": 470.0, "total_gross": 559.3}),
+    "Übersicht auf der letzten Seite wiederholt": (
+        [{"order_lines": [_line("Moos", 100), _line("Acryl", 50)]},
+         {"order_lines": [_line("Moos", 100), _line("Acryl", 50)],
+          "positions_net": 150.0, "tax_amount": 28.5, "total_gross": 178.5}],
+        2, {"positions_net": 150.0, "total_gross": 178.5}),
+    "Netto passt zu keiner Positionssumme": (
+        [{"order_lines": [_line("Moos", 100)]},
+         {"order_lines": [_line("Acryl", 50)],
+          "positions_net": 200.0, "shipping_net": 10.0, "tax_amount": 39.9, "total_gross": 249.9}],
+        2, {"positions_net": 200.0, "total_gross": 249.9}),
+}
+
+
+def check_merge() -> list[str]:
+    from offer_chunking import merge_extractions
+
+    problems = []
+    for name, (parts, n_lines, sums) in MERGE_CASES.items():
+        merged = merge_extractions(parts)
+        got = {field: merged[field] for field in sums}
+        if len(merged["order_lines"]) != n_lines or any(abs((got[f] or 0) - v) > 0.02 for f, v in sums.items()):
+            problems.append(f"{name}: {len(merged['order_lines'])} Positionen, {got}")
+        parts_sum = (merged["positions_net"] or 0) + (merged["shipping_net"] or 0) + (merged["tax_amount"] or 0)
+        if merged["tax_amount"] is not None and abs(parts_sum - merged["total_gross"]) > 0.02:
+            problems.append(f"{name}: Netto + Versand + Steuer {parts_sum:.2f} ≠ Endsumme {merged['total_gross']}")
+    return problems
+
+
+def check(extracted, expected: dict) -> list[str]:
+    problems = []
+    if len(extracted.order_lines) != expected["order_lines"]:
+        problems.append(f"{len(extracted.order_lines)} statt {expected['order_lines']} Positionen")
+    for field in ("positions_net", "shipping_net", "tax_amount", "total_gross"):
+        got = getattr(extracted, field)
+        if got is None or abs(got - expected[field]) > 0.02:
+            problems.append(f"{field} {got} ≠ {expected[field]}")
+    return problems
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=40)
+    ap.add_argument("--positions", type=int, default=120)
+    ap.add_argument("--latency-ms", type=float, default=400, help="fester Anteil pro Aufruf")
+    ap.add_argument("--ms-per-output-token", type=float, default=15, help="≈ 65 Tokens/s beim Generieren")
+    ap.add_argument("--ms-per-1k-input-tokens", type=float, default=60)
+    args = ap.parse_args()
+
+    os.environ.update(AI_BACKEND="standin", STANDIN_LATENCY_MS=str(args.latency_ms), STANDIN_JITTER_MS="0",
+                      STANDIN_ERROR_RATE="0", STANDIN_MS_PER_OUTPUT_TOKEN=str(args.ms_per_output_token),
+                      STANDIN_MS_PER_1K_INPUT_TOKENS=str(args.ms_per_1k_input_tokens),
+                      AI_RPM="100000", AI_TPM="100000000")
+    import ai_service
+    import db
+    import metrics
+    from ai_schemas import ExtractedOffer
+    from intake import build_extraction_input
+    from offer_chunking import split_for_extraction
+
+    text, expected = framework_offer(args.pages, args.positions)
+    pages = expected["pages"]
+    chunks, stats = split_for_extraction(text)
+    print(f"Rahmenangebot: {pages} Seiten, {args.positions} Positionen, {len(text):,} Zeichen; "
+          f"Boilerplate entfernt: {stats['chars_removed']:,} Zeichen, {stats['pages_kept']} Seiten übrig, "
+          f"{len(chunks)} Teile\n")
+
+    def tokens(stage: str) -> tuple[int, int]:
+        row = next((s for s in metrics.stage_stats() if s["stage"] == stage), None)
+        return (row["tokens_in"], row["tokens_out"]) if row else (0, 0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+
+        metrics.reset()
+        t0 = time.perf_counter()
+        resp = ai_service.run_ai(ai_service.parse_structured("llm.extract", build_extraction_input(text), ExtractedOffer))
+        before_s = time.perf_counter() - t0
+        before_in, before_out = tokens("llm.extract")
+        before = resp.output_parsed
+
+        metrics.reset()
+        t0 = time.perf_counter()
+        after = ai_service.run_ai(ai_service.extract_offer_async(text))
+        after_s = time.perf_counter() - t0
+        after_in, after_out = tokens("llm.extract_chunk")
+        calls = next((s["count"] for s in metrics.stage_stats() if s["stage"] == "llm.extract_chunk"), 0)
+        db.close_all_connections()
+
+    print(f"{'':<9} {'Aufrufe':>7} {'Tokens ein':>11} {'aus':>7} {'Tokens/Seite':>13} {'Sekunden':>9} {'s/Seite':>8}")
+    for label, n, t_in, t_out, secs in (("vorher", 1, before_in, before_out, before_s),
+                                         ("nachher", calls, after_in, after_out, after_s)):
+        print(f"{label:<9} {n:>7} {t_in:>11,} {t_out:>7,} {(t_in + t_out) / pages:>13,.0f} {secs:>9.2f} "
+              f"{secs / pages:>8.3f}")
+    print(f"\nGrößter Einzelaufruf: vorher ≈{len(text) // 4:,} Tokens, nachher ≈{max(map(len, chunks)) // 4:,} Tokens")
+
+    problems = [f"nachher: {p}" for p in check(after, expected)]
+    merge_problems = check_merge()
+    print(f"Zusammenführen ({len(MERGE_CASES)} Fälle): {'ok' if not merge_problems else '; '.join(merge_problems)}")
+    problems += merge_problems
+    before_problems = check(before, expected)
+    print(f"Ergebnis vorher: {'ok' if not before_problems else '; '.join(before_problems)}")
+    print(f"Ergebnis nachher: {'ok' if not problems else '; '.join(problems)}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
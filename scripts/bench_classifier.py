@@ -0,0 +1,83 @@
+"""
+Bewertet den lokalen Commodity-Klassifikator auf einer bestehenden DB.
+
+Misst auf einem Holdout: Genauigkeit, Kalibrierung (ECE), Anteil der Requests,
+die ohne KI-Call auskommen (Konfidenz >= Schwelle), und Latenz pro Vorhersage.
+
+Aufruf:  python scripts/bench_classifier.py [pfad/zur/procurement.db] [--threshold 0.8]
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import commodity_classifier as cc  # noqa: E402
+import db  # noqa: E402
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("db_path", nargs="?", default="procurement.db")
+    ap.add_argument("--threshold", type=float, default=cc.LOCAL_CONFIDENCE_THRESHOLD)
+    ap.add_argument("--holdout", type=float, default=0.2)
+    args = ap.parse_args()
+
+    db.DB_PATH = args.db_path
+    db.init_db()
+    rows = db.load_training_examples(after_id=0)
+    examples = [(label, cc.example_text(t, v, d)) for _, label, t, v, d in rows]
+    if len(examples) < cc.MIN_TRAINING_EXAMPLES:
+        print(f"Zu wenig Trainingsdaten ({len(examples)} < {cc.MIN_TRAINING_EXAMPLES}).")
+        return 1
+
+    random.Random(7).shuffle(examples)
+    cut = int(len(examples) * (1 - args.holdout))
+    train, test = examples[:cut], examples[cut:]
+
+    # Kalibrierung wie im Betrieb: Temperatur auf einem Teil des Trainings-Sets
+    calib_cut = int(len(train) * 0.8)
+    calib = cc.CommodityClassifier()
+    for label, text in train[:calib_cut]:
+        calib.add(label, text)
+    calib.fit_temperature(train[calib_cut:])
+
+    clf = cc.CommodityClassifier()
+    for label, text in train:
+        clf.add(label, text)
+    clf.temperature = calib.temperature
+
+    latencies, preds = [], []
+    for label, text in test:
+        t0 = time.perf_counter()
+        pred, conf = clf.predict(text)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        preds.append((label, pred, conf))
+
+    acc = sum(l == p for l, p, _ in preds) / len(preds)
+    confident = [(l, p) for l, p, c in preds if c >= args.threshold]
+
+    # Expected Calibration Error über 10 Konfidenz-Bins
+    ece = 0.0
+    for b in range(10):
+        lo, hi = b / 10, (b + 1) / 10
+        in_bin = [(l == p, c) for l, p, c in preds if lo < c <= hi or (b == 0 and c == 0)]
+        if in_bin:
+            ece += len(in_bin) / len(preds) * abs(
+                sum(ok for ok, _ in in_bin) / len(in_bin) - sum(c for _, c in in_bin) / len(in_bin))
+
+    lat = sorted(latencies)
+    print(f"{len(train)} Training / {len(test)} Test, {len(clf.class_docs)} Klassen, T={clf.temperature}")
+    print(f"Genauigkeit gesamt:         {acc:.1%}")
+    print(f"ECE (Kalibrierung):         {ece:.3f}")
+    print(f"ohne KI-Call (>= {args.threshold:.2f}):     {len(confident) / len(preds):.1%}"
+          f"  davon korrekt {sum(l == p for l, p in confident) / max(len(confident), 1):.1%}")
+    print(f"Latenz p50 / p99:           {statistics.median(lat):.3f} ms / {lat[int(len(lat) * 0.99) - 1]:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Benchmark: Latenz eines Overview-Renders (load_requests + Detail-Queries).
+
+"vorher"  = eine neue sqlite3-Verbindung pro Query, Rollback-Journal (alter Stand)
+"nachher" = Verbindungs-Pool aus app/db.py mit WAL + Pragmas
+
+Zusätzlich: Wechsel zwischen zwei Request-Details (Positionen, Status, Historie)
+mit drei Einzel-Queries vs. load_request_detail (ein Aufruf + Cache).
+
+Aufruf:  python scripts/bench_db.py [--requests 2000] [--lines 10] [--renders 200]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import db  # noqa: E402
+
+
+def seed(path: str, n_requests: int, n_lines: int):
+    db.DB_PATH = path
+    db.init_db()
+    items = []
+    for i in range(n_requests):
+        header = {
+            "requestor_name": "Bench",
+            "department": "Marketing",
+            "title": f"Request {i}",
+            "vendor_name": f"Vendor {i % 50}",
+            "vendor_vat_id": "DE123456789",
+            "commodity_group_id": "009",
+            "commodity_group_name": "General Services – Miscellaneous Services",
+            "total_cost": 100.0,
+            "currency": "EUR",
+            "submit_status": "Draft",
+            "process_status": "Open",
+            "created_at": "2024-01-01T00:00:00",
+        }
+        lines = [
+            {"description": f"Pos {j}", "unit_price": 10.0, "quantity": 1.0, "unit": "pcs", "line_total": 10.0}
+            for j in range(n_lines)
+        ]
+        items.append((header, lines))
+    db.insert_requests(items)
+
+
+# -----------------------------
+# Alter Stand: neue Verbindung pro Query
+# -----------------------------
+def legacy_query(path: str, sql: str, params=()):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def legacy_render(path: str):
+    rows = legacy_query(path, """
+        SELECT id, title, vendor_name, total_cost, currency, submit_status, process_status, created_at,
+               commodity_group_id, commodity_group_name,
+               positions_net, shipping_net, tax_amount, total_is_gross
+        FROM requests
+        ORDER BY id DESC
+    """)
+    rid = rows[0][0]
+    legacy_query(path, "SELECT description, unit_price, quantity, unit, line_total "
+                       "FROM order_lines WHERE request_id = ? ORDER BY id ASC", (rid,))
+    legacy_query(path, "SELECT process_status FROM requests WHERE id = ?", (rid,))
+    legacy_query(path, "SELECT old_status, new_status, changed_at, note "
+                       "FROM status_history WHERE request_id = ? ORDER BY id ASC", (rid,))
+
+
+def pooled_render(path: str):
+    db.DB_PATH = path
+    rows = db.load_requests()
+    rid = rows[0][0]
+    db.load_order_lines(rid)
+    db.get_request_status(rid)
+    db.load_status_history(rid)
+
+
+def detail_separate(path: str, rid: int):
+    db.DB_PATH = path
+    db.load_order_lines(rid)
+    db.get_request_status(rid)
+    db.load_status_history(rid)
+
+
+def detail_cached(path: str, rid: int):
+    db.DB_PATH = path
+    db.load_request_detail(rid)
+
+
+def measure_switching(fn, path: str, rids: list[int], renders: int) -> list[float]:
+    # Nutzer klickt zwischen einigen Requests hin und her
+    out = []
+    for i in range(renders):
+        t0 = time.perf_counter()
+        fn(path, rids[i % len(rids)])
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def measure(fn, path: str, renders: int) -> list[float]:
+    fn(path)  # warmup
+    out = []
+    for _ in range(renders):
+        t0 = time.perf_counter()
+        fn(path)
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def report(label: str, samples: list[float]):
+    s = sorted(samples)
+    p95 = s[int(len(s) * 0.95) - 1]
+    print(f"{label:<10} p50={statistics.median(s):8.2f} ms   p95={p95:8.2f} ms   max={s[-1]:8.2f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--lines", type=int, default=10)
+    ap.add_argument("--renders", type=int, default=200)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        pooled_path = os.path.join(tmp, "pooled.db")
+
+        seed(pooled_path, args.requests, args.lines)
+        # Legacy-DB: gleicher Inhalt, aber klassisches Rollback-Journal
+        seed(legacy_path, args.requests, args.lines)
+        db.close_all_connections()
+        with sqlite3.connect(legacy_path) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+
+        print(f"{args.requests} Requests x {args.lines} Lines, {args.renders} Renders")
+        report("vorher", measure(legacy_render, legacy_path, args.renders))
+        report("nachher", measure(pooled_render, pooled_path, args.renders))
+
+        print("\nDetail-Wechsel zwischen 3 Requests")
+        rids = [1, 2, 3]
+        report("einzeln", measure_switching(detail_separate, pooled_path, rids, args.renders))
+        report("Cache", measure_switching(detail_cached, pooled_path, rids, args.renders))
+        db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
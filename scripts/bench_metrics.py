@@ -0,0 +1,87 @@
+"""
+Benchmark: Kosten der Laufzeitmessung (app/metrics.py) auf heißen Pfaden.
+
+Misst in je einem frischen Prozess (METRICS_ENABLED wird beim Import gelesen):
+- einen leeren span() – reiner Overhead pro Messung,
+- einen schnellen DB-Helfer (get_request_status, ein Primärschlüssel-Lookup),
+- redact_personal_data auf einem kurzen Text.
+
+"vorher"  = METRICS_ENABLED=0 (Decorator gibt die Funktion unverändert zurück)
+"nachher" = METRICS_ENABLED=1
+
+Aufruf:  python scripts/bench_metrics.py [--calls 20000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+SAMPLE_TEXT = "Angebot Grünwerk OHG, Ansprechpartner: Max Muster, Tel. +49 171 2345678, max@example.com\n" * 3
+
+
+def per_call_us(fn, calls: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - t0) * 1e6 / calls
+
+
+def run_child(calls: int) -> dict:
+    import db
+    import metrics
+    from redaction import redact_personal_data
+
+    def empty_span():
+        with metrics.span("bench.empty"):
+            pass
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        db.init_db()
+        request_id = db.insert_request({
+            "requestor_name": "Bench", "department": "IT", "title": "Bench", "vendor_name": "Grünwerk OHG",
+            "vendor_vat_id": "", "total_cost": 0.0, "currency": "EUR", "submit_status": "Draft",
+            "process_status": "Open", "created_at": "2024-01-01T00:00:00",
+        }, [])
+        result = {
+            "span": per_call_us(empty_span, calls),
+            "db.get_request_status": per_call_us(lambda: db.get_request_status(request_id), calls),
+            "redact.text": per_call_us(lambda: redact_personal_data(SAMPLE_TEXT), calls // 4),
+        }
+        db.close_all_connections()
+    return result
+
+
+def measure(enabled: bool, calls: int) -> dict:
+    env = dict(os.environ, METRICS_ENABLED="1" if enabled else "0")
+    out = subprocess.run([sys.executable, __file__, "--child", "--calls", str(calls)],
+                         env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=20000)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.calls)))
+        return 0
+
+    before, after = measure(False, args.calls), measure(True, args.calls)
+    print(f"{'µs pro Aufruf':<24} {'vorher (aus)':>13} {'nachher (an)':>13} {'Overhead':>10}")
+    for name in before:
+        print(f"{name:<24} {before[name]:>13.2f} {after[name]:>13.2f} {after[name] - before[name]:>+10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Benchmark: Auto-Fill mit drei KI-Aufrufen vs. One-Shot (ein Aufruf, kombiniertes Schema).
+
+Ohne --base-url: zählt Round-Trips und gesendete Prompt-Zeichen (≈ Tokens / 4) für ein
+Beispiel-Angebot – das sind die Kosten, die unabhängig vom Modell anfallen.
+Mit --base-url: misst zusätzlich die Latenz pro Angebot gegen diesen Endpunkt
+(echte API oder lokaler Stand-in); der Extraktions-Cache wird dabei umgangen.
+
+"vorher"  = AUTOFILL_MODE=multi   (Extraktion, dann Titel ∥ Commodity Group)
+"nachher" = AUTOFILL_MODE=oneshot
+
+Aufruf:  python scripts/bench_oneshot.py [--lines 8] [--base-url http://localhost:8000/v1] [--offers 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import db  # noqa: E402
+import intake  # noqa: E402
+
+
+def sample_offer(n_lines: int, tag: str = "") -> str:
+    rows = "\n".join(
+        f"{i}  Mooswand Islandmoos Modul {i} 100x50 cm   {i + 1} Stk   {120 + i},00 €   {(120 + i) * (i + 1)},00 €"
+        for i in range(1, n_lines + 1)
+    )
+    return (
+        f"Grünwerk OHG · Gartenweg 3 · 12345 Musterstadt · USt-IdNr. DE123456789 {tag}\n"
+        "Angebot Nr. 2024-117 für Creative Marketing Department\n\n"
+        f"Pos  Beschreibung  Menge  Einzelpreis  Gesamt\n{rows}\n\n"
+        "Positionen netto 4.280,00 €\nVersand netto 80,00 €\nUSt 19 % 828,40 €\nEndsumme 5.188,40 €\n"
+    )
+
+
+def prompt_chars(messages: list[dict], schema: dict) -> int:
+    # Schema geht bei Structured Outputs ebenfalls als Eingabe mit
+    return sum(len(m["content"]) for m in messages) + len(json.dumps(schema))
+
+
+def offline_costs(offer: str) -> dict[str, tuple[int, int]]:
+    from ai_schemas import CommodityPick, ExtractedOffer, OneShotAutoFill, TitleSuggestion
+
+    # Mehrschritt: Titel und Commodity Group sehen die extrahierten Positionen erneut
+    lines = [{"description": f"Mooswand Islandmoos Modul {i} 100x50 cm", "unit_price": 120.0 + i,
+              "quantity": float(i + 1), "unit": "Stk"} for i in range(1, offer.count("Modul") + 1)]
+    multi = (
+        prompt_chars(intake.build_extraction_input(offer), ExtractedOffer.model_json_schema())
+        + prompt_chars(intake.build_title_input("Grünwerk OHG", lines, "Creative Marketing"),
+                       TitleSuggestion.model_json_schema())
+        + prompt_chars(intake.build_commodity_input("", "Grünwerk OHG", lines), CommodityPick.model_json_schema())
+    )
+    oneshot = prompt_chars(intake.build_oneshot_input(offer), OneShotAutoFill.model_json_schema())
+    return {"vorher": (3, multi), "nachher": (1, oneshot)}
+
+
+def measure_latency(mode: str, n_lines: int, offers: int) -> list[float]:
+    import ai_service
+    from ai_service import autofill
+
+    # Gemessen werden die KI-Pfade, nicht der lokale Schnellpfad
+    ai_service.LOCAL_PARSER_ENABLED = False
+    out = []
+    for i in range(offers):
+        # eindeutiger Text pro Lauf → kein Treffer im Extraktions-Cache
+        offer = sample_offer(n_lines, tag=f"{mode}-{i}-{time.time_ns()}")
+        t0 = time.perf_counter()
+        result = autofill(offer, mode=mode)
+        out.append((time.perf_counter() - t0) * 1000)
+        if result.mode != mode:
+            print(f"  Hinweis: {mode} fiel auf {result.mode} zurück ({result.fallback_error})")
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=8, help="Positionen im Beispiel-Angebot")
+    ap.add_argument("--base-url", help="OpenAI-Endpunkt für die Latenzmessung")
+    ap.add_argument("--offers", type=int, default=5)
+    args = ap.parse_args()
+
+    offer = sample_offer(args.lines)
+    print(f"Beispiel-Angebot mit {args.lines} Positionen ({len(offer)} Zeichen)\n")
+    print(f"{'':<8} {'Aufrufe':>7} {'Prompt-Zeichen':>15} {'≈Tokens':>8}")
+    costs = offline_costs(offer)
+    for label, (calls, chars) in costs.items():
+        print(f"{label:<8} {calls:>7} {chars:>15,} {chars // 4:>8,}")
+    saved = 1 - costs["nachher"][1] / costs["vorher"][1]
+    print(f"\nOne-Shot spart {saved:.0%} der Eingabe und 2 von 3 Round-Trips")
+    # Angebot, Extraktions-Schema und Gruppenliste braucht jeder Pfad einmal → Einsparung vor allem Round-Trips
+    from ai_schemas import ExtractedOffer
+
+    floor = len(offer) + len(json.dumps(ExtractedOffer.model_json_schema())) + len(intake.COMMODITY_TEXT_COMPACT)
+    print(f"Davon in beiden Pfaden nötig (Angebot + Extraktions-Schema + Gruppenliste): {floor:,} Zeichen")
+
+    if args.base_url:
+        os.environ["OPENAI_BASE_URL"] = args.base_url
+        with tempfile.TemporaryDirectory() as tmp:
+            db.DB_PATH = os.path.join(tmp, "bench.db")
+            db.init_db()
+            print(f"\nLatenz gegen {args.base_url} ({args.offers} Angebote)")
+            for label, mode in (("vorher", "multi"), ("nachher", "oneshot")):
+                samples = measure_latency(mode, args.lines, args.offers)
+                print(f"{label:<8} p50={statistics.median(samples):8.0f} ms   max={max(samples):8.0f} ms")
+            db.close_all_connections()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Durchsatztest offline: Datei parsen → Redaction → Extraktion → Titel/Commodity Group →
+insert_request – komplett gegen den KI-Stand-in (app/ai_standin.py), also ohne API-Key,
+ohne Kosten und ohne Netzwerk nach außen (CI-tauglich).
+
+Erzeugt --docs Angebote als TXT aus den Fixtures in scripts/fixtures/offers (jedes mit
+eigener Projektkennung, damit weder Extraktions-Cache noch ingest_log greifen) und
+importiert sie mit batch_ingest.run_batch in eine temporäre DB.
+
+--transport inproc  Stand-in im Prozess (AI_BACKEND=standin)
+--transport http    Stand-in als HTTP-Server auf localhost, Aufrufe über den OpenAI-Client
+                    (OPENAI_BASE_URL) → misst Client, HTTP und JSON mit
+
+Der lokale Schnellpfad ist aus (sonst liefe kaum ein Angebot durch die Extraktion; --local-parser
+schaltet ihn ein). Die Quoten des Gateways sind aufgehoben, solange AI_RPM/AI_TPM nicht gesetzt sind;
+Retries und Circuit Breaker gelten wie im Betrieb.
+
+Aufruf:  python scripts/bench_pipeline.py [--docs 200] [--transport inproc|http] [--latency-ms 300]
+                                          [--jitter-ms 100] [--error-rate 0.05] [--ai-concurrency 8]
+                                          [--mode oneshot] [--min-docs-per-min 0]
+Exit-Code 1, wenn ein Angebot nicht als Request in der DB landet oder der Durchsatz unter
+--min-docs-per-min liegt.
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+DEFAULT_FIXTURES = Path(__file__).resolve().parent / "fixtures" / "offers"
+
+
+def project_tag(i: int) -> str:
+    # Nur Buchstaben: Ziffernfolgen würde die Redaction als Telefonnummer maskieren → alle Texte gleich
+    return "".join(chr(ord("a") + int(d)) for d in f"{i:05d}")
+
+
+def write_offers(folder: Path, fixtures: Path, n: int) -> int:
+    templates = [p.read_text(encoding="utf-8") for p in sorted(fixtures.glob("*.txt"))]
+    for i in range(n):
+        text = templates[i % len(templates)]
+        (folder / f"angebot_{i:05d}.txt").write_text(f"{text}\nProjekt {project_tag(i)}\n", encoding="utf-8")
+    return len(templates)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=200)
+    ap.add_argument("--transport", choices=("inproc", "http"), default="inproc")
+    ap.add_argument("--latency-ms", type=float, default=300, help="Antwortzeit des Stand-ins pro KI-Aufruf")
+    ap.add_argument("--jitter-ms", type=float, default=100)
+    ap.add_argument("--error-rate", type=float, default=0.05, help="Anteil simulierter 429/503 (0–1)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Prozesse für Datei-Parsing")
+    ap.add_argument("--ai-concurrency", type=int, default=8)
+    ap.add_argument("--mode", choices=("multi", "oneshot"), default="multi")
+    ap.add_argument("--local-parser", action="store_true", help="lokalen Schnellpfad (offer_parser) einschalten")
+    ap.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES)
+    ap.add_argument("--min-docs-per-min", type=float, default=0, help="Untergrenze für CI (0 = keine)")
+    args = ap.parse_args()
+
+    # Konfiguration wird beim Import gelesen → vor dem ersten Import der App-Module setzen
+    os.environ["AUTOFILL_LOCAL_PARSER"] = "1" if args.local_parser else "0"
+    os.environ.setdefault("AI_RPM", "1000000")
+    os.environ.setdefault("AI_TPM", "1000000000")
+    os.environ.update(STANDIN_LATENCY_MS=str(args.latency_ms), STANDIN_JITTER_MS=str(args.jitter_ms),
+                      STANDIN_ERROR_RATE=str(args.error_rate), STANDIN_SEED=str(args.seed))
+
+    server = None
+    if args.transport == "http":
+        from ai_standin import StandIn, start_server
+
+        standin = StandIn()
+        server, base_url = start_server(standin)
+        os.environ.update(AI_BACKEND="openai", OPENAI_BASE_URL=base_url, OPENAI_API_KEY="sk-standin")
+    else:
+        os.environ["AI_BACKEND"] = "standin"
+
+    import batch_ingest
+    import db
+    import metrics
+    from ai_backends import get_backend
+    from ai_gateway import gateway_stats
+
+    if args.transport == "inproc":
+        standin = get_backend().standin
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp) / "angebote"
+        folder.mkdir()
+        n_templates = write_offers(folder, args.fixtures, args.docs)
+        db.DB_PATH = os.path.join(tmp, "pipeline.db")
+
+        print(f"Offline-Pipeline: {args.docs} Angebote ({n_templates} Vorlagen), Stand-in {args.transport} "
+              f"(Latenz {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, Fehlerquote {args.error_rate:.0%}), "
+              f"KI-Parallelität {args.ai_concurrency}, Modus {args.mode}")
+        t0 = time.perf_counter()
+        # batch_ingest meldet jede Datei einzeln → hier nur die Zusammenfassung
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = batch_ingest.run_batch(folder, args.workers, args.ai_concurrency, "Pipeline-Test", args.mode)
+        wall = time.perf_counter() - t0
+        stored = db.count_requests()
+        db.close_all_connections()
+    if server is not None:
+        server.shutdown()
+
+    ok = [r for r in results if r["status"] == "done"]
+    per_min = len(ok) / wall * 60 if wall > 0 else 0.0
+    print(f"{len(ok)}/{args.docs} importiert, {stored} Requests in der DB, {wall:.1f} s → {per_min:.0f} Angebote/min")
+    if ok:
+        parse_ms = sorted(r["parse_s"] * 1000 for r in ok)
+        ai_ms = sorted(r["ai_s"] * 1000 for r in ok)
+        print(f"pro Angebot: parse+redact p50 {statistics.median(parse_ms):.1f} ms, "
+              f"KI p50 {statistics.median(ai_ms):.0f} ms / p95 {metrics.quantile(ai_ms, 0.95):.0f} ms")
+    gw = gateway_stats() or {}
+    print(f"Stand-in: {standin.counters['calls']} Aufrufe, {standin.counters['errors']} simulierte Fehler; "
+          f"Gateway: {gw.get('retries', 0)} Wiederholungen, Breaker {gw.get('breaker', '-')}")
+
+    print(f"\n{'Stufe':<28} {'Anzahl':>7} {'Fehler':>7} {'p50 ms':>9} {'p95 ms':>9}")
+    for s in metrics.stage_stats():
+        if s["stage"].startswith(("llm.", "db.insert_request", "parse.offer_local")):
+            print(f"{s['stage']:<28} {s['count']:>7} {s['errors']:>7} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f}")
+
+    problems = [f"{r['file']}: nicht importiert" for r in results if r["status"] != "done"]
+    if len(results) != args.docs or stored != args.docs:
+        problems.append(f"{stored} Requests in der DB statt {args.docs}")
+    if args.min_docs_per_min and per_min < args.min_docs_per_min:
+        problems.append(f"Durchsatz {per_min:.0f}/min unter {args.min_docs_per_min:.0f}/min")
+    if problems:
+        print(f"\n{len(problems)} Probleme:")
+        for p in problems[:20]:
+            print(f"  {p}")
+        return 1
+    print("\nOK: alle Angebote offline durch Parsen, Redaction, KI-Stand-in und DB.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
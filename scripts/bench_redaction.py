@@ -0,0 +1,144 @@
+"""
+Benchmark + Worst-Case-Check für die Redaction (app/redaction.py).
+
+- Durchsatz (MB/s) auf einem synthetischen Angebots-Korpus: alte 5-Pass-Variante vs. Single-Pass
+  vs. Streaming (Seite für Seite)
+- Pathologische Eingaben (lange Ziffern-/Punkt-Ketten usw.) müssen unter einem Zeitbudget bleiben
+
+Aufruf:  python scripts/bench_redaction.py [--mb 5] [--budget-s 0.5]
+Exit-Code 1, wenn Streaming vom Single-Pass abweicht, ein Worst Case das Budget reißt
+oder eine E-Mail aus LEAK_CASES bzw. ein Fall aus EXPECTED_CASES nicht vollständig maskiert wird.
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from redaction import redact_personal_data, redact_stream  # noqa: E402
+
+OFFER_LINES = [
+    "Muster GmbH · Musterstraße 1 · 10115 Berlin",
+    "Tel. +49 (030) 123456-78 · Fax 030 1234567",
+    "E-Mail: vertrieb@muster-gmbh.de · www.muster-gmbh.de",
+    "Ansprechpartner: Hans Meier",
+    "Kontakt: Frau Müller, mueller@muster-gmbh.de, 0171 2345678",
+    "USt-IdNr. DE123456789 · HRB 12345 B",
+    "IBAN DE89370400440532013000 · BIC COBADEFFXXX",
+    "Angebot Nr. 2024-00123 vom 12.03.2024",
+    "Pos. Menge Einheit Bezeichnung Einzelpreis Gesamt",
+    "1 12,50 m2 Mooswand Premium, inkl. Montage 189,00 2.362,50",
+    "2 4 Stk Acryl-Logo-Platte 60x40 cm 245,00 980,00",
+    "3 1 psch. Anlieferung und Montage 450,00 450,00",
+    "Nettobetrag 3.792,50 EUR",
+    "zzgl. 19 % USt 720,58 EUR",
+    "Endsumme 4.513,08 EUR",
+    "Es gelten unsere Allgemeinen Geschäftsbedingungen. Zahlbar innerhalb von 14 Tagen ohne Abzug.",
+]
+
+WORST_CASES = {
+    "lange Ziffernfolge + Buchstabe": "1" * 50_000 + "x",
+    "Ziffern mit Leerzeichen": "1 " * 50_000,
+    "Punkt-Kette ohne @": "a." * 50_000,
+    "viele @ ohne Domain": "a@" * 50_000,
+    "Großbuchstaben-Block": "A" * 100_000,
+    "Kontakt-Wiederholung": "Kontakt:" * 20_000,
+    "lange Local-Parts": ("x" * 60 + "@") * 2_000,
+    "Telefon-Fragmente": "+49 (0" * 20_000,
+    "E-Mail-Ketten ohne Trenner": "+max@x.de" * 20_000,
+}
+
+# Hier darf kein "@" übrig bleiben: die zweite Adresse beginnt mitten im Lauf hinter einem Treffer
+LEAK_CASES = [
+    "a+max@x.de+0Zmax@x.de",
+    "0171 2345678-max@x.de",
+    "+max@x.de" * 1_000,
+]
+
+# Ansprechpartner-Fenster endet mitten in einer IBAN/Telefonnummer → darf keinen Rest davon übrig lassen
+EXPECTED_CASES = {
+    "Kontakt: Max Mustermann, Einkauf Zentrale Nord, Bankverbindung DE89370400440532013000":
+        "Kontakt: [PERSON]",
+    "Ansprechpartner: Dr. Maximilian Mustermann-Schulze, Vertrieb, Tel. 0171 2345678":
+        "Ansprechpartner: [PERSON]",
+}
+
+
+def legacy_redact(text: str) -> str:
+    # Stand vor dem Single-Pass-Umbau (5 getrennte re.sub-Aufrufe)
+    t = text
+    t = re.sub(r"\b[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}\b", "[EMAIL]", t, flags=re.IGNORECASE)
+    t = re.sub(r"\b(\+?\d{1,3}[\s\-]?)?(\(?\d{2,5}\)?[\s\-]?)?\d{3,}[\s\-]?\d{2,}\b", "[PHONE]", t)
+    t = re.sub(r"\b[A-Z]{2}\d{2}[A-Z0-9]{11,30}\b", "[IBAN]", t)
+    t = re.sub(r"\b[A-Z]{4}[A-Z]{2}[A-Z0-9]{2}([A-Z0-9]{3})?\b", "[BIC]", t)
+    t = re.sub(r"(?i)(ansprechpartner|kontakt|bearbeiter)\s*:\s*[^\n\r]{1,60}", r"\1: [PERSON]", t)
+    return t
+
+
+def build_corpus(mb: float, seed: int = 1) -> list[str]:
+    # Liste von "Seiten" à ~3 KB
+    rng = random.Random(seed)
+    pages, size = [], 0
+    while size < mb * 1024 * 1024:
+        page = "\n".join(rng.choice(OFFER_LINES) for _ in range(40))
+        pages.append(page + "\n")
+        size += len(page.encode("utf-8"))
+    return pages
+
+
+def throughput(label: str, fn, mb: float) -> float:
+    t0 = time.perf_counter()
+    out = fn()
+    dt = time.perf_counter() - t0
+    print(f"{label:<22} {mb / dt:8.1f} MB/s  ({dt:.3f}s)")
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", type=float, default=5.0)
+    ap.add_argument("--budget-s", type=float, default=0.5, help="Zeitbudget pro Worst-Case-Eingabe")
+    args = ap.parse_args()
+
+    pages = build_corpus(args.mb)
+    text = "".join(pages)
+    mb = len(text.encode("utf-8")) / 1024 / 1024
+    print(f"Korpus: {mb:.1f} MB, {len(pages)} Seiten\n")
+
+    legacy = throughput("alt (5 Pässe)", lambda: legacy_redact(text), mb)
+    single = throughput("Single-Pass", lambda: redact_personal_data(text), mb)
+    stream = throughput("Streaming (pro Seite)", lambda: "".join(redact_stream(pages)), mb)
+
+    ok = True
+    if stream != single:
+        print("FEHLER: Streaming-Ergebnis weicht vom Single-Pass ab")
+        ok = False
+    if legacy != single:
+        print("Hinweis: Ergebnis weicht von der alten Variante ab")
+
+    print(f"\nWorst Cases (Budget {args.budget_s:.2f}s):")
+    for name, payload in WORST_CASES.items():
+        t0 = time.perf_counter()
+        redact_personal_data(payload)
+        dt = time.perf_counter() - t0
+        status = "ok" if dt <= args.budget_s else "ZU LANGSAM"
+        ok = ok and dt <= args.budget_s
+        print(f"  {name:<32} {len(payload) / 1024:7.0f} KB  {dt:.4f}s  {status}")
+
+    for payload in LEAK_CASES:
+        if "@" in redact_personal_data(payload) or "@" in "".join(redact_stream([payload])):
+            print(f"FEHLER: E-Mail nicht maskiert in {payload[:40]!r}")
+            ok = False
+    for payload, expected in EXPECTED_CASES.items():
+        for got in (redact_personal_data(payload), "".join(redact_stream([payload]))):
+            if got != expected:
+                print(f"FEHLER: {payload[:40]!r}… → {got!r}, erwartet {expected!r}")
+                ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
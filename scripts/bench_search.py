@@ -0,0 +1,139 @@
+"""
+Benchmark: Volltextsuche über Titel, Vendor und Order-Line-Beschreibungen.
+
+"vorher"  = LIKE '%begriff%' über requests + order_lines (was ohne Index möglich wäre)
+"nachher" = db.search_requests (FTS5 + bm25)
+
+Aufruf:  python scripts/bench_search.py [--requests 10000] [--lines 30] [--repeat 20] [--budget-ms 50]
+Exit-Code 1, wenn eine Suche im p95 über dem Budget liegt oder der gesuchte Request fehlt.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import db  # noqa: E402
+
+WORDS = (
+    "Acrylplatte Schraube Montage Lieferung Beratung Lizenz Laptop Monitor Kabel Druckerpapier "
+    "Stuhl Tisch Wartung Software Schulung Catering Reinigung Toner Dübel Regal Lampe Teppich "
+    "Beamer Headset Adapter Workshop Übersetzung Reisekosten Hosting Domain Versand Verpackung"
+).split()
+VENDORS = ["Muster GmbH", "Beispiel AG", "ACME Ltd", "Nordlicht KG", "Büroprofi24", "Grünwerk OHG"]
+
+# Ein Request, der gefunden werden muss ("die Mooswand vom letzten Frühjahr")
+NEEDLE = {
+    "title": "Mooswand für Empfang",
+    "vendor_name": "Grünwerk OHG",
+    "lines": ["Mooswand Islandmoos 2x1m", "Montage vor Ort"],
+}
+
+QUERIES = [
+    "mooswand",               # seltener Begriff
+    "moos",                   # Präfix
+    "mooswand grünwerk",      # Titel + Vendor
+    "islandmoos montage",     # zwei Order Lines
+    "laptop",                 # sehr häufiger Begriff
+    "sch",                    # kurzer, häufiger Präfix
+]
+
+
+def seed(n_requests: int, n_lines: int, seed_: int = 1) -> int:
+    rnd = random.Random(seed_)
+    items = []
+    for i in range(n_requests):
+        header = {
+            "requestor_name": "Bench",
+            "department": "Einkauf",
+            "title": " ".join(rnd.sample(WORDS, 3)),
+            "vendor_name": rnd.choice(VENDORS),
+            "vendor_vat_id": "",
+            "total_cost": 100.0,
+            "currency": "EUR",
+            "submit_status": "Submitted",
+            "process_status": "Open",
+            "created_at": f"2024-{rnd.randint(1, 12):02d}-01T00:00:00",
+        }
+        lines = [
+            {"description": " ".join(rnd.sample(WORDS, 4)) + f" Art.-Nr. {rnd.randint(1, 99999)}",
+             "unit_price": 1.0, "quantity": 1.0, "unit": "pcs", "line_total": 1.0}
+            for _ in range(n_lines)
+        ]
+        items.append((header, lines))
+    needle = dict(items[0][0], title=NEEDLE["title"], vendor_name=NEEDLE["vendor_name"], created_at="2024-04-15T00:00:00")
+    needle_lines = [dict(items[0][1][0], description=d) for d in NEEDLE["lines"]]
+    items.insert(n_requests // 2, (needle, needle_lines))
+
+    ids = []
+    for i in range(0, len(items), 1000):
+        ids.extend(db.insert_requests(items[i:i + 1000]))
+    return ids[n_requests // 2]
+
+
+def like_search(query: str, limit: int = db.SEARCH_LIMIT):
+    terms = [t.lower() for t in query.split()]
+    where = " AND ".join(
+        "(lower(r.title) LIKE ? OR lower(r.vendor_name) LIKE ? OR EXISTS ("
+        "SELECT 1 FROM order_lines l WHERE l.request_id = r.id AND lower(l.description) LIKE ?))"
+        for _ in terms
+    )
+    params = [p for t in terms for p in (f"%{t}%",) * 3]
+    with db.get_conn() as conn:
+        return conn.execute(f"SELECT r.id FROM requests r WHERE {where} LIMIT ?", params + [limit]).fetchall()
+
+
+def measure(fn, query: str, repeat: int) -> list[float]:
+    fn(query)  # warmup
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(query)
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def p95(samples: list[float]) -> float:
+    s = sorted(samples)
+    return s[max(0, int(len(s) * 0.95) - 1)]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=10_000)
+    ap.add_argument("--lines", type=int, default=30)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--budget-ms", type=float, default=50.0, help="p95-Budget pro Suche (nachher)")
+    args = ap.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "search.db")
+        db.init_db()
+        t0 = time.perf_counter()
+        needle_id = seed(args.requests, args.lines)
+        print(f"{args.requests + 1} Requests x {args.lines} Lines geladen in {time.perf_counter() - t0:.1f}s\n")
+
+        print(f"{'Suche':<22} {'vorher p50':>11} {'nachher p50':>12} {'p95':>8}  Treffer  Nadel")
+        for q in QUERIES:
+            before = measure(like_search, q, max(1, args.repeat // 5))
+            after = measure(db.search_requests, q, args.repeat)
+            hits = [r[0] for r in db.search_requests(q)]
+            needle_rank = hits.index(needle_id) + 1 if needle_id in hits else None
+            expect_needle = q in QUERIES[:4]
+            ok = p95(after) <= args.budget_ms and (needle_rank is not None or not expect_needle)
+            failed |= not ok
+            print(f"{q:<22} {statistics.median(before):9.1f}ms {statistics.median(after):10.1f}ms "
+                  f"{p95(after):6.1f}ms  {len(hits):>7}  {needle_rank or '-':>5}{'' if ok else '  FEHLER'}")
+        db.close_all_connections()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Benchmark: Auto-Fill im Formular – wann steht das erste brauchbare Feld drin?
+
+Legt pro Fixture-Angebot (scripts/fixtures/offers) einen Auto-Fill-Job an wie die UI; Worker
+arbeiten sie gegen den KI-Stand-in ab (Latenz bis zum ersten Token + Zeit pro Ausgabe-Token wie
+ein echtes Modell), ein Poller liest die Jobs im Takt der UI (JOB_UI_POLL_S) wie das Fragment in app.py.
+
+"vorher"  = AUTOFILL_STREAM aus: das Formular füllt sich erst mit dem fertigen Ergebnis
+"nachher" = gestreamte Extraktion: Lieferant/USt-Id/Abteilung und Positionen über partial_json
+
+Gemessen ab dem Einreihen: erstes Feld, erste Position, fertiges Ergebnis (p50/p95).
+Geprüft: das Endergebnis ist mit und ohne Streaming gleich, und das zuletzt gesehene
+Teilergebnis widerspricht ihm nicht (gleiche Kopffelder, Positionen sind ein Anfang der Liste).
+
+Der lokale Schnellpfad ist aus, sonst liefe kaum ein Fixture durch die KI-Extraktion.
+--transport http: Stand-in als HTTP-Server, Aufrufe über den OpenAI-Client (responses.stream, SSE).
+
+Aufruf:  python scripts/bench_streaming_autofill.py [--latency-ms 400] [--ms-per-output-token 15]
+                                                    [--mode multi|oneshot] [--transport inproc|http]
+Exit-Code 1, wenn ein Job scheitert oder sich die Ergebnisse unterscheiden.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "offers"
+HEADER_FIELDS = ("vendor_name", "vendor_vat_id", "department")
+
+
+def project_tag(prefix: str, i: int) -> str:
+    # Nur Buchstaben (Ziffern maskiert die Redaction); eigener Text pro Lauf → kein Cache-Treffer
+    return prefix + "".join(chr(ord("a") + int(d)) for d in f"{i:03d}")
+
+
+def run_jobs(texts: list[str], prefix: str, poll_s: float, timeout_s: float = 300) -> list[dict]:
+    """Alle Angebote einreihen und wie die UI pollen; pro Job Zeitpunkte + Endergebnis."""
+    import autofill_jobs
+    import db
+
+    t0 = time.perf_counter()
+    ids = [autofill_jobs.enqueue_text(f"{text}\nProjekt {project_tag(prefix, i)}\n") for i, text in enumerate(texts)]
+    seen = {i: {"first_field": None, "first_line": None, "done": None, "partial": None, "job": None} for i in ids}
+    while time.perf_counter() - t0 < timeout_s and any(s["done"] is None for s in seen.values()):
+        now = time.perf_counter() - t0
+        for job_id, s in seen.items():
+            if s["done"] is not None:
+                continue
+            job = db.get_job(job_id)
+            if job["status"] in ("done", "failed"):
+                s["done"], s["job"] = now, job
+                s["first_field"] = s["first_field"] or now
+                s["first_line"] = s["first_line"] or now
+            elif job["partial_json"]:
+                partial = json.loads(job["partial_json"])
+                s["partial"] = partial
+                if s["first_field"] is None and (any(partial.get(f) for f in HEADER_FIELDS) or partial["lines"]):
+                    s["first_field"] = now
+                if s["first_line"] is None and partial["lines"]:
+                    s["first_line"] = now
+        time.sleep(poll_s)
+    return list(seen.values())
+
+
+def check(before: list[dict], after: list[dict]) -> list[str]:
+    problems = []
+    for i, (b, a) in enumerate(zip(before, after)):
+        if b["job"] is None or a["job"] is None:
+            problems.append(f"Angebot {i}: Job nicht fertig geworden")
+            continue
+        if b["job"]["status"] != "done" or a["job"]["status"] != "done":
+            problems.append(f"Angebot {i}: {b['job']['error'] or a['job']['error']}")
+            continue
+        final_b, final_a = json.loads(b["job"]["result_json"]), json.loads(a["job"]["result_json"])
+        if final_b != final_a:
+            problems.append(f"Angebot {i}: Endergebnis mit Streaming weicht ab")
+        partial = a["partial"]
+        if partial is not None:
+            for field in HEADER_FIELDS:
+                if field in partial and partial[field] != final_a["extracted"][field]:
+                    problems.append(f"Angebot {i}: Teilergebnis {field}={partial[field]!r} ≠ {final_a['extracted'][field]!r}")
+            if partial["lines"] != final_a["lines"][:len(partial["lines"])]:
+                problems.append(f"Angebot {i}: gestreamte Positionen passen nicht zum Endergebnis")
+    return problems
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency-ms", type=float, default=400, help="bis zum ersten Token")
+    ap.add_argument("--ms-per-output-token", type=float, default=15, help="≈ 65 Tokens/s beim Generieren")
+    ap.add_argument("--mode", choices=("multi", "oneshot"), default="multi")
+    ap.add_argument("--transport", choices=("inproc", "http"), default="inproc")
+    ap.add_argument("--offers", type=int, default=0, help="nur die ersten N Fixtures (0 = alle)")
+    args = ap.parse_args()
+
+    # Konfiguration wird beim Import gelesen → vor dem ersten Import der App-Module setzen
+    os.environ.update(AUTOFILL_LOCAL_PARSER="0", AUTOFILL_MODE=args.mode, AUTOFILL_WORKERS="0",
+                      STANDIN_LATENCY_MS=str(args.latency_ms), STANDIN_JITTER_MS="0", STANDIN_ERROR_RATE="0",
+                      STANDIN_MS_PER_OUTPUT_TOKEN=str(args.ms_per_output_token),
+                      AI_RPM="1000000", AI_TPM="1000000000")
+    server = None
+    if args.transport == "http":
+        from ai_standin import start_server
+
+        server, base_url = start_server()
+        os.environ.update(AI_BACKEND="openai", OPENAI_BASE_URL=base_url, OPENAI_API_KEY="sk-standin")
+    else:
+        os.environ["AI_BACKEND"] = "standin"
+
+    import ai_service
+    import autofill_jobs
+    import db
+    import metrics
+
+    texts = [p.read_text(encoding="utf-8") for p in sorted(FIXTURES.glob("*.txt"))]
+    texts = texts[:args.offers] if args.offers else texts
+    poll_s = autofill_jobs.JOB_UI_POLL_S
+    print(f"{len(texts)} Angebote als Auto-Fill-Jobs, Stand-in {args.transport} ({args.latency_ms:.0f} ms bis zum "
+          f"ersten Token, {args.ms_per_output_token:.0f} ms/Token), Modus {args.mode}, UI-Poll {poll_s * 1000:.0f} ms\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "streaming.db")
+        db.init_db()
+        workers = autofill_jobs.JobWorkers(len(texts), poll_s=0.05).start()
+        ai_service.AUTOFILL_STREAM = False
+        before = run_jobs(texts, "v", poll_s)
+        ai_service.AUTOFILL_STREAM = True
+        metrics.reset()
+        after = run_jobs(texts, "n", poll_s)
+        first_field_ms = next((s["p50_ms"] for s in metrics.stage_stats() if s["stage"].endswith(".first_field")), None)
+        workers.stop(timeout=5)
+        db.close_all_connections()
+    if server is not None:
+        server.shutdown()
+
+    print(f"{'':<9} {'erstes Feld p50':>16} {'p95':>7} {'erste Position p50':>19} {'fertig p50':>11} {'p95':>7}")
+    for label, runs in (("vorher", before), ("nachher", after)):
+        def q(key, p):
+            values = sorted(s[key] for s in runs if s[key] is not None)
+            return (statistics.median(values) if p == 0.5 else metrics.quantile(values, p)) if values else float("nan")
+        print(f"{label:<9} {q('first_field', 0.5):>15.2f}s {q('first_field', 0.95):>6.2f}s "
+              f"{q('first_line', 0.5):>18.2f}s {q('done', 0.5):>10.2f}s {q('done', 0.95):>6.2f}s")
+    if first_field_ms is not None:
+        print(f"\nIm Worker (ohne UI-Poll): erstes Feld nach p50 {first_field_ms:.0f} ms")
+
+    problems = check(before, after)
+    if problems:
+        print(f"\n{len(problems)} Probleme:")
+        for p in problems[:20]:
+            print(f"  {p}")
+        return 1
+    print("\nOK: gleiche Endergebnisse mit und ohne Streaming, Teilergebnisse passen dazu.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
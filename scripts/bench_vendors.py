@@ -0,0 +1,213 @@
+"""
+Benchmark: Vendor-Stammdaten – Backfill, Zuordnungsqualität, Abfragen pro Vendor.
+
+Erzeugt Requests für --vendors Lieferanten in typischen Schreibweisen aus Angeboten
+("Muster GmbH", "MUSTER G.m.b.H.", "Muster", "Müller"/"Mueller", Tippfehler, USt-Id mit
+Leerzeichen oder fehlend) – die echte Zugehörigkeit ist bekannt. Dann wie eine Alt-DB:
+vendor_id leer, keine Vendoren → db.backfill_vendors() einmalig.
+
+Geprüft:   keine zwei echten Lieferanten unter einer vendor_id (Fehlzuordnung) und wie viele
+           Lieferanten auf mehrere vendor_ids verteilt bleiben (nicht erkannte Dubletten).
+Gemessen:  alle Requests eines Lieferanten (Anzahl + Summe), je Lieferant eine Abfrage
+  "exakt"   = WHERE vendor_name = ? (Index, findet nur die eine Schreibweise)
+  "vorher"  = alle Requests lesen, Namen/USt-Id beim Lesen normalisieren (vendors.py)
+  "nachher" = WHERE vendor_id = ? (Index auf der Integer-Spalte)
+Dazu db.find_vendor (Intake-Hinweis) p50/p95.
+
+Aufruf:  python scripts/bench_vendors.py [--vendors 300] [--requests 20000] [--seed 7]
+Exit-Code 1 bei Fehlzuordnungen oder inkonsistenter spend_summary.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import db  # noqa: E402
+import metrics  # noqa: E402
+from vendors import canonical_name, normalize_vat_id  # noqa: E402
+
+PREFIXES = (
+    "Nordlicht Grünwerk Bergmann Sonnenhof Alpen Rhein Hanse Isar Elbe Weser Main Donau Taunus Eifel "
+    "Müller Schröder Becker Hoffmann Wagner Krüger Zimmermann Köhler Lorenz Brandt Vogel Engel"
+).split()
+TRADES = (
+    "Bürotechnik Möbelwerk Gebäudeservice Druckerei Messebau Softwarehaus Elektrotechnik Logistik "
+    "Catering Reinigung Werbetechnik Sicherheitsdienst Medientechnik Verpackung Übersetzungen"
+).split()
+FORMS = ("GmbH", "GmbH", "GmbH", "AG", "KG", "GmbH & Co. KG", "e.K.")
+
+
+def make_vendors(n: int, rnd: random.Random) -> list[dict]:
+    names = [f"{p} {t}" for p in PREFIXES for t in TRADES]
+    rnd.shuffle(names)
+    if n > len(names):
+        raise SystemExit(f"Höchstens {len(names)} Lieferanten möglich")
+    return [{"name": f"{name} {rnd.choice(FORMS)}",
+             "vat": f"DE{rnd.randrange(10 ** 8, 10 ** 9)}" if rnd.random() < 0.7 else ""}
+            for name in names[:n]]
+
+
+def spelling(vendor: dict, rnd: random.Random) -> tuple[str, str]:
+    """Eine Schreibweise wie aus einem Angebot extrahiert (Name, USt-Id)."""
+    name, vat = vendor["name"], vendor["vat"]
+    variant = rnd.random()
+    if variant < 0.4:
+        pass
+    elif variant < 0.5:
+        name = name.upper()
+    elif variant < 0.6:
+        name += "."
+    elif variant < 0.68:
+        name = name.replace("GmbH", "G.m.b.H.")
+    elif variant < 0.78:
+        name = " ".join(name.split()[:2])              # ohne Rechtsform
+    elif variant < 0.86:
+        name = name.replace("ü", "ue").replace("ö", "oe").replace("ä", "ae")
+    else:
+        words = name.split()                           # Tippfehler im längsten Wort
+        i = max(range(len(words)), key=lambda k: len(words[k]))
+        j = rnd.randrange(1, len(words[i]) - 1)
+        words[i] = words[i][:j] + words[i][j + 1:]
+        name = " ".join(words)
+    if vat:
+        vat_variant = rnd.random()
+        if vat_variant < 0.25:
+            vat = ""                                   # nicht im Angebot gefunden
+        elif vat_variant < 0.4:
+            vat = f"{vat[:2].lower()} {vat[2:5]} {vat[5:8]} {vat[8:]}"
+    return name, vat
+
+
+def make_items(vendors: list[dict], n_requests: int, rnd: random.Random):
+    # Wenige große, viele kleine Lieferanten
+    weights = [1 / (i + 1) for i in range(len(vendors))]
+    truth = []
+    items = []
+    for i in range(n_requests):
+        v = rnd.choices(range(len(vendors)), weights)[0]
+        name, vat = spelling(vendors[v], rnd)
+        truth.append(v)
+        items.append(({
+            "requestor_name": "Bench", "department": "Einkauf", "title": f"Request {i}",
+            "vendor_name": name, "vendor_vat_id": vat,
+            "total_cost": round(rnd.uniform(10, 5000), 2), "currency": "EUR",
+            "submit_status": "Submitted", "process_status": "Open",
+            "created_at": f"2024-{1 + i * 12 // n_requests:02d}-01T{i % 24:02d}:00:00",
+        }, []))
+    return items, truth
+
+
+def check_links(ids: list[int], truth: list[int]) -> tuple[list[str], int]:
+    with db.get_conn() as conn:
+        linked = dict(conn.execute("SELECT id, vendor_id FROM requests").fetchall())
+    truths_per_vendor, vendors_per_truth = defaultdict(set), defaultdict(set)
+    for rid, t in zip(ids, truth):
+        truths_per_vendor[linked[rid]].add(t)
+        vendors_per_truth[t].add(linked[rid])
+    merged = [f"vendor_id {vid}: {len(ts)} verschiedene Lieferanten" for vid, ts in truths_per_vendor.items()
+              if len(ts) > 1]
+    split = sum(1 for vids in vendors_per_truth.values() if len(vids) > 1)
+    return merged, split
+
+
+def time_queries(fn, keys) -> tuple[float, int]:
+    t0 = time.perf_counter()
+    hits = sum(fn(k) for k in keys)
+    return (time.perf_counter() - t0) * 1000 / len(keys), hits
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--vendors", type=int, default=300)
+    ap.add_argument("--requests", type=int, default=20000)
+    ap.add_argument("--queries", type=int, default=50, help="Lieferanten für den Abfragevergleich")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rnd = random.Random(args.seed)
+    vendors = make_vendors(args.vendors, rnd)
+    items, truth = make_items(vendors, args.requests, rnd)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "vendors.db")
+        db.init_db()
+        ids = db.insert_requests(items)
+        n_spellings = len({(h["vendor_name"], h["vendor_vat_id"]) for h, _ in items})
+        print(f"{len(ids)} Requests, {len(vendors)} Lieferanten in {n_spellings} Schreibweisen (Name + USt-Id)")
+
+        # Zustand einer Alt-DB: Requests ohne Vendor-Zuordnung
+        with db.get_conn() as conn:
+            conn.execute("UPDATE requests SET vendor_id = NULL")
+            conn.execute("DELETE FROM vendor_trigrams")
+            conn.execute("DELETE FROM vendor_names")
+            conn.execute("DELETE FROM vendors")
+            conn.commit()
+        t0 = time.perf_counter()
+        stats = db.backfill_vendors()
+        backfill_s = time.perf_counter() - t0
+        print(f"Backfill: {stats['linked']} Requests → {stats['new_vendors']} Vendoren in {backfill_s:.2f}s")
+
+        merged, split = check_links(ids, truth)
+        print(f"Fehlzuordnungen: {len(merged)} · Lieferanten auf mehrere Vendoren verteilt: {split} "
+              f"von {len(vendors)}")
+
+        # Abfrage pro Lieferant; Schlüssel = Schreibweise des ersten Requests
+        sample = rnd.sample(range(len(vendors)), k=min(args.queries, len(vendors)))
+        first = {t: i for i, t in reversed(list(enumerate(truth)))}
+        sample = [t for t in sample if t in first]
+        with db.get_conn() as conn:
+            vendor_of = dict(conn.execute("SELECT id, vendor_id FROM requests").fetchall())
+            vendor_id = {t: vendor_of[ids[i]] for t, i in first.items()}
+            first = {t: items[i][0] for t, i in first.items()}
+
+            def exact(t):
+                return conn.execute("SELECT COUNT(*), SUM(total_cost) FROM requests WHERE vendor_name = ?",
+                                    (first[t]["vendor_name"],)).fetchone()[0]
+
+            def normalized(t):
+                want_name = canonical_name(first[t]["vendor_name"])
+                want_vat = normalize_vat_id(first[t]["vendor_vat_id"])
+                return sum(1 for name, vat, _ in conn.execute(
+                    "SELECT vendor_name, vendor_vat_id, total_cost FROM requests")
+                    if canonical_name(name) == want_name or (want_vat and normalize_vat_id(vat) == want_vat))
+
+            def by_vendor_id(t):
+                return conn.execute("SELECT COUNT(*), SUM(total_cost) FROM requests WHERE vendor_id = ?",
+                                    (vendor_id[t],)).fetchone()[0]
+
+            expected = sum(truth.count(t) for t in sample)
+            print(f"\nAlle Requests eines Lieferanten ({len(sample)} Lieferanten, {expected} Requests erwartet):")
+            print(f"{'':<9} {'ms/Abfrage':>11} {'gefunden':>9}")
+            for label, fn in (("exakt", exact), ("vorher", normalized), ("nachher", by_vendor_id)):
+                ms, hits = time_queries(fn, sample)
+                print(f"{label:<9} {ms:>11.2f} {hits:>9} ({hits / expected:.0%})")
+            spend_problems = db.check_spend_summary(conn)
+
+        metrics.reset()
+        for h, _ in items[:500]:
+            db.find_vendor(h["vendor_name"], h["vendor_vat_id"])
+        lookups = [s for s in metrics.stage_stats() if s["stage"] == "db.find_vendor"]
+        if lookups:
+            print(f"\nfind_vendor: p50 {lookups[0]['p50_ms']:.2f} ms, p95 {lookups[0]['p95_ms']:.2f} ms")
+        db.close_all_connections()
+
+    if spend_problems:
+        print(f"\nspend_summary inkonsistent: {spend_problems[:5]}")
+    if merged:
+        print("\nFehlzuordnungen:")
+        for m in merged[:20]:
+            print(f"  {m}")
+    if merged or spend_problems:
+        return 1
+    print("\nOK: keine Fehlzuordnungen, spend_summary konsistent.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Import-Budget: die Kern-Module (ohne Streamlit-UI) müssen schnell und ohne schwere Abhängigkeiten laden.
+
+Startet pro Lauf einen frischen Interpreter mit `python -X importtime`, importiert die
+Kern-Module und summiert die Importzeit aller Module, die nicht schon der nackte
+Interpreter-Start lädt. Gemessen wird das Minimum über mehrere Läufe (Rauschen).
+Wie im Betrieb mit Bytecode-Cache: ein Aufwärmlauf schreibt die .pyc in ein temporäres
+PYTHONPYCACHEPREFIX (auch wenn PYTHONDONTWRITEBYTECODE gesetzt ist) – sonst misst der Check
+vor allem das Kompilieren von db.py (≈ 20 ms) und schwankt knapp um das Budget.
+Budget 60 ms bei ≈ 25 ms gemessen: gut das Doppelte als Reserve für langsamere Rechner/CI.
+Zusätzlich darf keines der schweren Pakete (streamlit, openai, pydantic, pypdf, docx)
+beim Import geladen werden – die werden erst bei Bedarf nachgeladen.
+
+Aufruf:  python scripts/check_import_time.py [--budget-ms 60] [--runs 5] [--top 10]
+Exit-Code 1, wenn das Budget überschritten wird oder ein schweres Paket geladen wurde.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+
+CORE_MODULES = [
+    "db",
+    "redaction",
+    "intake",
+    "document_text",
+    "extraction_cache",
+    "commodity_classifier",
+    "batch_ingest",
+    "autofill_jobs",
+]
+HEAVY_PACKAGES = {"streamlit", "openai", "pydantic", "pypdf", "docx", "httpx"}
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int, int]]:
+    # Zeilen: "import time: self [us] | cumulative | imported package" → (name, self_us, cumulative_us, tiefe)
+    out = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        out.append((name.strip(), int(self_us), int(cum_us), depth))
+    return out
+
+
+def run_importtime(code: str, env: dict) -> list[tuple[str, int, int, int]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR, capture_output=True, text=True, check=True, env=env,
+    )
+    return parse_importtime(proc.stderr)
+
+
+def measure(modules: list[str], env: dict) -> tuple[float, list[tuple[str, int, int, int]]]:
+    baseline = {name for name, *_ in run_importtime("pass", env)}
+    entries = [e for e in run_importtime("import " + ", ".join(modules), env) if e[0] not in baseline]
+    # Nur oberste Ebene summieren; tiefere Ebenen stecken schon in deren cumulative
+    top_level = [e for e in entries if e[3] == 0]
+    return sum(e[2] for e in top_level) / 1000, entries
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget-ms", type=float, default=60.0)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10, help="langsamste Module anzeigen")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as pycache:
+        env = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+        env["PYTHONPYCACHEPREFIX"] = pycache
+        run_importtime("import " + ", ".join(CORE_MODULES), env)  # Aufwärmen: .pyc schreiben
+        runs = [measure(CORE_MODULES, env) for _ in range(args.runs)]
+    total_ms, entries = min(runs, key=lambda r: r[0])
+
+    heavy = sorted({name for name, *_ in entries if name.split(".")[0] in HEAVY_PACKAGES})
+    print(f"import {', '.join(CORE_MODULES)}")
+    print(f"Importzeit (Minimum aus {args.runs} Läufen): {total_ms:.1f} ms, Budget {args.budget_ms:.0f} ms\n")
+    print(f"{'Modul':<32} {'selbst':>9} {'gesamt':>9}")
+    for name, self_us, cum_us, _ in sorted(entries, key=lambda e: -e[1])[:args.top]:
+        print(f"{name:<32} {self_us / 1000:7.1f}ms {cum_us / 1000:7.1f}ms")
+
+    failed = False
+    if heavy:
+        print(f"\nFEHLER: schwere Pakete beim Import geladen: {', '.join(h for h in heavy if '.' not in h)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"\nFEHLER: Importzeit {total_ms:.1f} ms über Budget {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("\nOK: Kern-Module laden ohne schwere Abhängigkeiten im Budget.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Prüft den lokalen Schnellpfad (app/offer_parser.py) gegen das gelabelte Korpus in
+scripts/fixtures/offers/: NAME.txt = Angebotstext, NAME.json = erwartete
+ExtractedOffer-Felder oder {"fallback": true} (lokal nicht sicher → KI).
+
+Die Texte laufen wie im Auto-Fill-Job durch normalize_offer_text + Redaction
+(DSGVO), bevor der Parser sie sieht – maskierte Daten sind also auch lokal weg.
+
+Gemessen werden:
+- Trefferquote: Anteil der strukturierten Angebote, die ohne KI-Extraktion durchgehen
+  ("vorher" ging jedes Angebot an die KI),
+- Feldgenauigkeit der lokal übernommenen Angebote,
+- Fehlannahmen: ein Fallback-Fall oder ein Feld mit falschem Wert wurde übernommen,
+- Laufzeit pro Dokument.
+
+Aufruf:  python scripts/check_offer_parser.py [--fixtures scripts/fixtures/offers] [--verbose]
+Exit-Code 1 bei einer Fehlannahme (falsche Daten im Formular sind schlimmer als ein KI-Aufruf).
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+from intake import normalize_offer_text  # noqa: E402
+from offer_parser import parse_offer_locally  # noqa: E402
+from redaction import redact_personal_data  # noqa: E402
+
+DEFAULT_FIXTURES = Path(__file__).resolve().parent / "fixtures" / "offers"
+REPEAT = 20
+
+
+def load_corpus(folder: Path) -> list[tuple[str, str, dict]]:
+    corpus = []
+    for txt in sorted(folder.glob("*.txt")):
+        label = json.loads(txt.with_suffix(".json").read_text(encoding="utf-8"))
+        text = redact_personal_data(normalize_offer_text(txt.read_text(encoding="utf-8")))
+        corpus.append((txt.stem, text, label))
+    return corpus
+
+
+def field_diffs(got: dict, expected: dict) -> list[str]:
+    return [f"{k}: {got.get(k)!r} ≠ {v!r}" for k, v in expected.items() if got.get(k) != v]
+
+
+def timed_parse(text: str) -> tuple[float, tuple]:
+    t0 = time.perf_counter()
+    for _ in range(REPEAT):
+        out = parse_offer_locally(text)
+    return (time.perf_counter() - t0) * 1000 / REPEAT, out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES)
+    ap.add_argument("--verbose", action="store_true", help="Gründe für jeden Fallback ausgeben")
+    args = ap.parse_args()
+
+    corpus = load_corpus(args.fixtures)
+    if not corpus:
+        print(f"Keine Fixtures in {args.fixtures}")
+        return 1
+
+    structured = [c for c in corpus if not c[2].get("fallback")]
+    hits, fields_ok, fields_total, false_accepts, ms = 0, 0, 0, [], []
+    print(f"{'Fixture':<32} {'erwartet':<9} {'Ergebnis':<9} {'ms':>6}")
+    for name, text, label in corpus:
+        elapsed, (offer, problems) = timed_parse(text)
+        ms.append(elapsed)
+        expected = "KI" if label.get("fallback") else "lokal"
+        result = "KI" if offer is None else "lokal"
+        note = ""
+        if offer is not None and label.get("fallback"):
+            false_accepts.append(f"{name}: übernommen, obwohl Fallback erwartet ({label.get('reason', '')})")
+        elif offer is not None:
+            hits += 1
+            diffs = field_diffs(offer, label)
+            fields_total += len(label)
+            fields_ok += len(label) - len(diffs)
+            false_accepts += [f"{name}: {d}" for d in diffs]
+            note = "  " + "; ".join(diffs) if diffs else ""
+        elif args.verbose or not label.get("fallback"):
+            note = "  " + "; ".join(problems[:2])
+        print(f"{name:<32} {expected:<9} {result:<9} {elapsed:>6.2f}{note}")
+
+    print(f"\nTrefferquote (strukturierte Angebote ohne KI-Extraktion): "
+          f"vorher 0/{len(structured)}  nachher {hits}/{len(structured)} ({hits / len(structured):.0%})")
+    if fields_total:
+        print(f"Feldgenauigkeit der lokal übernommenen Angebote: {fields_ok}/{fields_total} "
+              f"({fields_ok / fields_total:.1%})")
+    print(f"Laufzeit lokal: p50={statistics.median(ms):.2f} ms  max={max(ms):.2f} ms pro Dokument")
+
+    if false_accepts:
+        print(f"\n{len(false_accepts)} Fehlannahmen:")
+        for f in false_accepts:
+            print(f"  {f}")
+        return 1
+    print("OK: keine Fehlannahmen, unsichere Angebote gehen an die KI.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+Prüft per EXPLAIN QUERY PLAN, dass keine Query der App einen Full Scan macht.
+
+Aufruf:  python scripts/check_query_plans.py [pfad/zur/procurement.db]
+Ohne Pfad wird eine frische, migrierte Temp-DB geprüft. Exit-Code 1 bei Problemen.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import db  # noqa: E402
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tmp, "plans.db")
+        db.init_db()
+        with db.get_conn() as conn:
+            for name, sql, params, allow_scan in db.QUERY_PLAN_CHECKS:
+                flag = " (Scan erlaubt)" if allow_scan else ""
+                print(f"{name}{flag}")
+                for detail in db.explain_query_plan(conn, sql, params):
+                    print(f"    {detail}")
+            problems = db.check_query_plans(conn)
+        db.close_all_connections()
+
+    if problems:
+        print("\nFull Scans gefunden:")
+        for name, detail in problems:
+            print(f"  {name}: {detail}")
+        return 1
+    print("\nOK: alle Queries nutzen Indizes.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Konsistenzprüfung: spend_summary (per Trigger gepflegt) gegen Neuberechnung aus requests.
+
+Aufruf:  python scripts/check_spend_summary.py [pfad/zur/procurement.db] [--ops 5000] [--rebuild]
+Ohne Pfad wird eine Temp-DB mit zufälligen Requests befüllt und danach kräftig
+verändert (Statuswechsel einzeln + bulk, Kosten-/Vendor-Änderungen, Löschungen).
+--rebuild baut die Summary bei Abweichungen neu auf. Exit-Code 1 bei Abweichungen.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import db  # noqa: E402
+
+STATUSES = ["Open", "In Progress", "Closed"]
+VENDORS = ["Muster GmbH", "Beispiel AG", "ACME Ltd", "Nordlicht KG", ""]
+DEPARTMENTS = ["Marketing", "IT", "Einkauf", "HR"]
+CURRENCIES = ["EUR", "EUR", "EUR", "USD", "GBP"]
+
+
+def random_request(rnd: random.Random) -> tuple[dict, list[dict]]:
+    gross = round(rnd.uniform(10, 5000), 2)
+    header = {
+        "requestor_name": "Check",
+        "department": rnd.choice(DEPARTMENTS),
+        "title": "Spend-Check",
+        "vendor_name": rnd.choice(VENDORS),
+        "vendor_vat_id": "",
+        "commodity_group_id": rnd.choice([None, "009", "031", "021"]),
+        "commodity_group_name": None,
+        "total_cost": gross,
+        "currency": rnd.choice(CURRENCIES),
+        "submit_status": rnd.choice(["Draft", "Submitted"]),
+        "process_status": "Open",
+        "created_at": f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T10:00:00",
+        "positions_net": rnd.choice([None, round(gross / 1.19, 2)]),
+        "tax_amount": rnd.choice([None, round(gross - gross / 1.19, 2)]),
+    }
+    return header, []
+
+
+def churn(n_ops: int, seed: int = 7):
+    rnd = random.Random(seed)
+    ids = db.insert_requests(random_request(rnd) for _ in range(n_ops // 5))
+    for _ in range(n_ops):
+        op = rnd.random()
+        if op < 0.1:
+            ids.extend(db.insert_requests([random_request(rnd) for _ in range(rnd.randint(1, 20))]))
+        elif op < 0.5:
+            db.update_request_status(rnd.choice(ids), rnd.choice(STATUSES), "check")
+        elif op < 0.6:
+            db.update_request_statuses(rnd.sample(ids, k=min(10, len(ids))), rnd.choice(STATUSES), "check bulk",
+                                       expected_status=rnd.choice([None] + STATUSES))
+        elif op < 0.85:
+            col, val = rnd.choice([
+                ("total_cost", round(rnd.uniform(1, 9000), 2)),
+                ("positions_net", None),
+                ("vendor_name", rnd.choice(VENDORS)),
+                ("vendor_id", None),  # Vendor-Zuordnung gelöst → Gruppe fällt auf vendor_name zurück
+                ("commodity_group_id", rnd.choice([None, "009", "031"])),
+                ("submit_status", "Submitted"),
+                ("created_at", f"2025-0{rnd.randint(1, 9)}-01T00:00:00"),
+            ])
+            with db.get_conn() as conn:
+                conn.execute(f"UPDATE requests SET {col} = ? WHERE id = ?", (val, rnd.choice(ids)))
+                conn.commit()
+        elif ids:
+            rid = ids.pop(rnd.randrange(len(ids)))
+            with db.get_conn() as conn:
+                conn.execute("DELETE FROM status_history WHERE request_id = ?", (rid,))
+                conn.execute("DELETE FROM requests WHERE id = ?", (rid,))
+                conn.commit()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("db_path", nargs="?")
+    ap.add_argument("--ops", type=int, default=5000)
+    ap.add_argument("--rebuild", action="store_true")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = args.db_path or os.path.join(tmp, "spend.db")
+        db.init_db()
+        if not args.db_path:
+            t0 = time.perf_counter()
+            churn(args.ops)
+            print(f"{args.ops} Änderungen in {time.perf_counter() - t0:.2f}s")
+
+        with db.get_conn() as conn:
+            n_requests = conn.execute("SELECT COUNT(*) FROM requests").fetchone()[0]
+            n_groups = conn.execute("SELECT COUNT(*) FROM spend_summary").fetchone()[0]
+            problems = db.check_spend_summary(conn)
+            if problems and args.rebuild:
+                db.rebuild_spend_summary(conn)
+                print(f"{len(problems)} Abweichungen → spend_summary neu aufgebaut")
+                problems = db.check_spend_summary(conn)
+        db.close_all_connections()
+
+    print(f"{n_requests} Requests, {n_groups} Summary-Gruppen")
+    if problems:
+        print(f"\n{len(problems)} Abweichungen:")
+        for p in problems[:20]:
+            print(f"  {p}")
+        return 1
+    print("OK: spend_summary stimmt mit der Neuberechnung überein.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+Stresstest: KI-Gateway (app/ai_gateway.py) gegen einen simulierten OpenAI-Endpunkt.
+
+Der Endpunkt ist eine Funktion ohne Netzwerk, mit eigenem Limit (429) bzw. Ausfall:
+1. Lastspitze: viele Sessions starten gleichzeitig Auto-Fill.
+   "vorher" = direkt aufrufen, ohne Retry → jeder 429 wird zum Fehler im UI,
+   "nachher" = über den Gateway (Token-Bucket + Retries mit Backoff).
+2. Coalescing: identische Prompts gleichzeitig → ein einziger Aufruf.
+3. Ausfall: Endpunkt antwortet nur noch mit Timeouts. "vorher" wartet jeder Aufruf
+   den Timeout ab, "nachher" öffnet der Circuit Breaker und weist sofort ab;
+   nach der Abkühlzeit schließt ein erfolgreicher Probe-Aufruf ihn wieder.
+4. Fallback: Auto-Fill bei offenem Breaker liefert Titel-Fallback und
+   Schlagwort-Heuristik für die Commodity Group, ohne zu warten.
+
+Aufruf:  python scripts/stress_ai_gateway.py [--sessions 60] [--rps 10]
+Exit-Code 1, wenn über den Gateway ein Aufruf fehlschlägt oder Breaker/Fallback nicht greifen.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import ai_gateway  # noqa: E402
+from ai_gateway import AIGateway, AIUnavailableError, CircuitBreaker  # noqa: E402
+
+LATENCY_S = 0.05
+TIMEOUT_S = 0.2
+
+
+class FakeStatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers={})
+
+
+class FakeEndpoint:
+    """Lässt `rps` Anfragen pro Sekunde durch (gleitendes Fenster), sonst 429; down → Timeout."""
+
+    def __init__(self, rps: float):
+        self.rps = rps
+        self.calls = 0
+        self.recent: list[float] = []
+        self.down = False
+
+    async def request(self):
+        self.calls += 1
+        if self.down:
+            await asyncio.sleep(TIMEOUT_S)
+            raise TimeoutError("Request timed out.")
+        now = time.monotonic()
+        self.recent = [t for t in self.recent if now - t < 1.0]
+        if len(self.recent) >= self.rps:
+            raise FakeStatusError(429)
+        self.recent.append(now)
+        await asyncio.sleep(LATENCY_S)
+        return SimpleNamespace(output_parsed="ok", usage=SimpleNamespace(input_tokens=900, output_tokens=100,
+                                                                         total_tokens=1000))
+
+
+async def burst(sessions: int, rps: float) -> tuple[dict, dict]:
+    direct = FakeEndpoint(rps)
+    results = await asyncio.gather(*(direct.request() for _ in range(sessions)), return_exceptions=True)
+    before = {"failed": sum(isinstance(r, Exception) for r in results), "calls": direct.calls, "s": 0.0}
+
+    # Quote ehrlich konfiguriert (rps * 60), Burst 1 s; Endpunkt ist strenger als gedacht → Retries nötig
+    endpoint = FakeEndpoint(rps * 0.9)
+    gw = AIGateway(rpm=rps * 60, tpm=1e9, burst_s=1, max_retries=6, backoff_base_s=0.2)
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(gw.call("llm.extract", f"k{i}", endpoint.request, 1000)
+                                     for i in range(sessions)), return_exceptions=True)
+    after = {**gw.counters, "failed": sum(isinstance(r, Exception) for r in results), "upstream": endpoint.calls,
+             "s": time.perf_counter() - t0}
+    return before, after
+
+
+async def coalescing(n: int) -> tuple[int, int]:
+    endpoint = FakeEndpoint(rps=1000)
+    gw = AIGateway(rpm=60000, tpm=1e9)
+    results = await asyncio.gather(*(gw.call("llm.title", "same-prompt", endpoint.request, 100) for _ in range(n)))
+    return endpoint.calls, sum(r.output_parsed == "ok" for r in results)
+
+
+async def outage(n: int, failures: int, cooldown_s: float) -> tuple[list[float], list[float], str]:
+    endpoint = FakeEndpoint(rps=1000)
+    endpoint.down = True
+
+    before = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        try:
+            await endpoint.request()
+        except TimeoutError:
+            pass
+        before.append((time.perf_counter() - t0) * 1000)
+
+    gw = AIGateway(rpm=60000, tpm=1e9, max_retries=0,
+                   breaker=CircuitBreaker(failures=failures, cooldown_s=cooldown_s))
+    after = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        try:
+            await gw.call("llm.extract", f"o{i}", endpoint.request, 100)
+        except (TimeoutError, AIUnavailableError):
+            pass
+        after.append((time.perf_counter() - t0) * 1000)
+
+    # API wieder da: nach der Abkühlzeit schließt der Probe-Aufruf den Breaker
+    endpoint.down = False
+    await asyncio.sleep(cooldown_s)
+    await gw.call("llm.extract", "probe", endpoint.request, 100)
+    return before, after, gw.breaker.state
+
+
+def mooswand_offer():
+    from ai_schemas import ExtractedOffer
+
+    return ExtractedOffer(vendor_name="Grünwerk OHG", order_lines=[
+        {"description": "Mooswand Islandmoos 100x50 cm", "unit_price": 189.0, "quantity": 4, "unit": "Stk"}])
+
+
+def fallback_with_open_breaker() -> tuple[float, object]:
+    os.environ.setdefault("OPENAI_API_KEY", "sk-stress-test")
+    import ai_service
+
+    breaker = CircuitBreaker(failures=1, cooldown_s=60)
+    breaker.failure()
+    ai_gateway._gateway = AIGateway(breaker=breaker)
+    extracted = mooswand_offer()
+    # erster Lauf startet AI-Loop und Client (einmalig pro Prozess), gemessen wird der zweite
+    ai_service.run_ai(ai_service.complete_autofill_async(extracted), timeout=10)
+    t0 = time.perf_counter()
+    result = ai_service.run_ai(ai_service.complete_autofill_async(extracted), timeout=10)
+    return (time.perf_counter() - t0) * 1000, result
+
+
+def fallback_on_first_outage():
+    """Breaker noch zu, API fällt gerade aus: schon die ersten Aufrufe müssen auf die Fallbacks gehen."""
+    os.environ.setdefault("OPENAI_API_KEY", "sk-stress-test")
+    import ai_service
+    from ai_backends import get_backend
+
+    async def down(messages, text_format):
+        raise TimeoutError("Request timed out.")
+
+    backend = get_backend()
+    backend.parse = down
+    ai_gateway._gateway = AIGateway(max_retries=1, backoff_base_s=0.01,
+                                    breaker=CircuitBreaker(failures=100, cooldown_s=60))
+    try:
+        return ai_service.run_ai(ai_service.complete_autofill_async(mooswand_offer()), timeout=10)
+    finally:
+        del backend.parse
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, default=60)
+    ap.add_argument("--rps", type=float, default=10, help="Limit des simulierten Endpunkts")
+    args = ap.parse_args()
+    problems = []
+
+    before, after = asyncio.run(burst(args.sessions, args.rps))
+    print(f"1) Lastspitze: {args.sessions} gleichzeitige Aufrufe, Endpunkt-Limit ≈{args.rps:.0f}/s")
+    print(f"   vorher  fehlgeschlagen {before['failed']:>3}/{args.sessions} (429 direkt im UI)")
+    print(f"   nachher fehlgeschlagen {after['failed']:>3}/{args.sessions}  in {after['s']:.1f}s  "
+          f"Endpunkt-Aufrufe {after['upstream']}  Wiederholungen {after['retries']}  429 {after['rate_limited']}")
+    if after["failed"]:
+        problems.append(f"Lastspitze: {after['failed']} Aufrufe trotz Gateway fehlgeschlagen")
+
+    calls, ok = asyncio.run(coalescing(20))
+    print(f"2) Coalescing: 20 identische Prompts → {calls} Endpunkt-Aufruf(e), {ok} Ergebnisse")
+    if calls != 1 or ok != 20:
+        problems.append(f"Coalescing: {calls} Aufrufe / {ok} Ergebnisse statt 1 / 20")
+
+    n, failures = 20, 5
+    before_ms, after_ms, state = asyncio.run(outage(n, failures, cooldown_s=0.3))
+    rejected = after_ms[failures:]
+    print(f"3) Ausfall ({n} Aufrufe, Timeout {TIMEOUT_S * 1000:.0f} ms): vorher {sum(before_ms):.0f} ms gesamt, "
+          f"nachher {sum(after_ms):.0f} ms; nach {failures} Fehlern p50 {statistics.median(rejected):.3f} ms; "
+          f"nach Erholung: {state}")
+    if max(rejected) > 5:
+        problems.append(f"Circuit Breaker: abgewiesene Aufrufe brauchen bis {max(rejected):.1f} ms")
+    if state != "closed":
+        problems.append(f"Circuit Breaker schließt nach Erholung nicht ({state})")
+
+    ms, result = fallback_with_open_breaker()
+    print(f"4) Auto-Fill bei offenem Breaker: {ms:.1f} ms, Titel '{result.title}', "
+          f"Commodity Group {result.pick.commodity_group_id if result.pick else None} ({result.pick_source})")
+    if result.pick_source != "Fallback" or result.title != "Mooswand Islandmoos 100x50 cm" or ms > 100:
+        problems.append("Fallback bei offenem Breaker greift nicht sofort")
+
+    try:
+        result = fallback_on_first_outage()
+    except Exception as e:
+        print(f"5) Auto-Fill beim ersten Ausfall (Breaker zu): abgebrochen mit {type(e).__name__}: {e}")
+        problems.append("Ausfall ohne offenen Breaker bricht Auto-Fill ab statt auf Fallbacks zu gehen")
+    else:
+        print(f"5) Auto-Fill beim ersten Ausfall (Breaker zu): Titel '{result.title}', "
+              f"Commodity Group {result.pick.commodity_group_id if result.pick else None} ({result.pick_source})")
+        if result.pick_source != "Fallback" or result.title != "Mooswand Islandmoos 100x50 cm":
+            problems.append("Fallback beim ersten Ausfall greift nicht")
+
+    if problems:
+        print(f"\n{len(problems)} Probleme:")
+        for p in problems:
+            print(f"  {p}")
+        return 1
+    print("OK: keine 429 im UI, identische Prompts zusammengelegt, Breaker und Fallbacks greifen.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Stresstest: Auto-Fill-Job-Queue mit mehreren Worker-Gruppen (wie mehrere Prozesse) auf einer DB.
+
+Die KI wird durch eine künstliche Arbeit ersetzt (Schlaf + zufällige Fehler), damit
+nur die Queue geprüft wird:
+- jeder Job endet als 'done' oder 'failed', keiner bleibt hängen,
+- kein Job läuft gleichzeitig in zwei Workern,
+- vorübergehende Fehler werden wiederholt (höchstens max_attempts Versuche),
+  endgültige Fehler sofort beendet,
+- ein Job mit abgelaufenem Lease (Worker gestorben) wird neu vergeben.
+
+Zusätzlich: wie lange blockiert die UI? "vorher" = Auto-Fill synchron im Skript,
+"nachher" = enqueue_text (nur ein INSERT).
+
+Aufruf:  python scripts/stress_autofill_jobs.py [--jobs 300] [--groups 2] [--workers 4] [--fail-rate 0.3]
+Exit-Code 1 bei hängenden, doppelt laufenden oder falsch wiederholten Jobs.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import autofill_jobs  # noqa: E402
+import db  # noqa: E402
+
+WORK_S = 0.01
+
+
+class FakeRun:
+    # Ersatz für autofill_jobs.run_job: zählt parallele Läufe pro Job und wirft zufällig Fehler
+    def __init__(self, fail_rate: float, seed: int = 3):
+        self.fail_rate = fail_rate
+        self.rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.running: Counter = Counter()
+        self.calls: Counter = Counter()
+        self.overlaps: list[int] = []
+
+    def __call__(self, job: dict) -> str:
+        with self.lock:
+            self.running[job["id"]] += 1
+            self.calls[job["id"]] += 1
+            if self.running[job["id"]] > 1:
+                self.overlaps.append(job["id"])
+            roll = self.rnd.random()
+        try:
+            time.sleep(WORK_S)
+            if job["title"] == "permanent":
+                raise autofill_jobs.PermanentJobError("kein Text")
+            if roll < self.fail_rate:
+                raise TimeoutError("KI antwortet nicht")
+            return '{"ok": true}'
+        finally:
+            with self.lock:
+                self.running[job["id"]] -= 1
+
+
+def wait_until_finished(job_ids: list[int], timeout_s: float) -> dict[int, dict]:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        jobs = {i: db.get_job(i) for i in job_ids}
+        if all(j["status"] in ("done", "failed") for j in jobs.values()):
+            return jobs
+        time.sleep(0.1)
+    return {i: db.get_job(i) for i in job_ids}
+
+
+def check_lease_recovery() -> list[str]:
+    # Worker "stirbt" nach dem Claim: Lease läuft ab, ein anderer Worker übernimmt
+    job_id = db.enqueue_job("text", None, b"x", "lease", 3)
+    claimed = db.claim_job(lease_s=-1)
+    if claimed is None or claimed["id"] != job_id:
+        return ["Lease: Job wurde nicht vergeben"]
+    again = db.claim_job(lease_s=60)
+    if again is None or again["id"] != job_id or again["attempts"] != 2:
+        return [f"Lease: abgelaufener Job nicht neu vergeben ({again})"]
+    db.finish_job(job_id, "{}")
+    return []
+
+
+def measure_ui_block(repeat: int) -> tuple[list[float], list[float]]:
+    before, after = [], []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        time.sleep(WORK_S * 3)  # synchron: Extraktion + Titel ∥ Commodity Group im Skript
+        before.append((time.perf_counter() - t0) * 1000)
+        t0 = time.perf_counter()
+        autofill_jobs.enqueue_text("Angebot", title="ui")
+        after.append((time.perf_counter() - t0) * 1000)
+    return before, after
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=300)
+    ap.add_argument("--groups", type=int, default=2, help="Worker-Gruppen (simulieren Prozesse)")
+    ap.add_argument("--workers", type=int, default=4, help="Threads pro Gruppe")
+    ap.add_argument("--fail-rate", type=float, default=0.3)
+    args = ap.parse_args()
+
+    autofill_jobs.JOB_RETRY_BASE_S = 0.0
+    fake = FakeRun(args.fail_rate)
+    autofill_jobs.run_job = fake
+
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "jobs.db")
+        db.init_db()
+        problems += check_lease_recovery()
+
+        ids = [autofill_jobs.enqueue_text(f"Angebot {i}", title="permanent" if i % 50 == 0 else "")
+               for i in range(args.jobs)]
+        groups = [autofill_jobs.JobWorkers(args.workers, poll_s=0.05).start() for _ in range(args.groups)]
+        t0 = time.perf_counter()
+        jobs = wait_until_finished(ids, timeout_s=120)
+        wall = time.perf_counter() - t0
+        for g in groups:
+            g.stop(timeout=5)
+
+        before, after = measure_ui_block(20)
+        db.close_all_connections()
+
+    statuses = Counter(j["status"] for j in jobs.values())
+    retried = sum(1 for j in jobs.values() if j["attempts"] > 1)
+    for i, j in jobs.items():
+        if j["status"] not in ("done", "failed"):
+            problems.append(f"Job {i} hängt im Status {j['status']}")
+        if j["attempts"] > j["max_attempts"] or fake.calls[i] != j["attempts"]:
+            problems.append(f"Job {i}: {fake.calls[i]} Läufe, attempts={j['attempts']}/{j['max_attempts']}")
+        if j["status"] == "failed" and j["attempts"] < j["max_attempts"] and "kein Text" not in (j["error"] or ""):
+            problems.append(f"Job {i}: vorzeitig aufgegeben ({j['error']})")
+    problems += [f"Job {i} lief gleichzeitig in zwei Workern" for i in sorted(set(fake.overlaps))]
+
+    print(f"{args.jobs} Jobs, {args.groups}x{args.workers} Worker, Fehlerquote {args.fail_rate:.0%}: "
+          f"{wall:.2f}s  " + "  ".join(f"{k}={v}" for k, v in sorted(statuses.items())) + f"  wiederholt={retried}")
+    print(f"UI blockiert  vorher p50={statistics.median(before):6.1f} ms (künstlich {WORK_S * 3000:.0f} ms KI)  "
+          f"nachher p50={statistics.median(after):6.2f} ms (enqueue)")
+    if problems:
+        print(f"\n{len(problems)} Probleme:")
+        for p in problems[:20]:
+            print(f"  {p}")
+        return 1
+    print("OK: jeder Job genau einmal gleichzeitig, Wiederholungen und Lease wie erwartet.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Stresstest: viele Threads ändern gleichzeitig den Status derselben Requests.
+
+Jeder Thread liest den Status (wie ein Einkäufer, der die Seite sieht), wartet kurz und
+setzt dann einen neuen Status – einzeln oder als Bulk über mehrere Requests.
+Danach wird geprüft, dass die Status-Historie jedes Requests eine lückenlose Kette ist
+(old_status = new_status des Vorgängers, letzter Eintrag = aktueller Status) und
+kein "database is locked" aufgetreten ist.
+
+"vorher"  = alter Ablauf (SELECT, dann UPDATE + History ohne BEGIN IMMEDIATE / Bedingung)
+"nachher" = db.update_request_status / db.update_request_statuses (Compare-and-set)
+
+Aufruf:  python scripts/stress_status.py [--threads 16] [--ops 200] [--requests 5]
+Exit-Code 1, wenn "nachher" eine kaputte Historie oder Lock-Fehler liefert.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "app"))
+
+import db  # noqa: E402
+
+STATUSES = ["Open", "In Progress", "Closed"]
+
+
+def seed(n_requests: int) -> list[int]:
+    header = {
+        "requestor_name": "Stress",
+        "department": "Einkauf",
+        "title": "Stress",
+        "vendor_name": "Vendor",
+        "vendor_vat_id": "",
+        "total_cost": 1.0,
+        "currency": "EUR",
+        "submit_status": "Submitted",
+        "process_status": "Open",
+        "created_at": "2024-01-01T00:00:00",
+    }
+    return db.insert_requests([(header, [])] * n_requests)
+
+
+# -----------------------------
+# Alter Stand
+# -----------------------------
+def legacy_update(request_id: int, new_status: str, note: str):
+    with db.get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(db.SQL_GET_REQUEST_STATUS, (request_id,))
+        old_status = cur.fetchone()[0]
+        if new_status == old_status:
+            return True, old_status
+        time.sleep(0.001)  # Denkpause zwischen Lesen und Schreiben, wie im echten Ablauf
+        cur.execute("UPDATE requests SET process_status = ? WHERE id = ?", (new_status, request_id))
+        cur.execute(db.SQL_INSERT_STATUS_HISTORY,
+                    (request_id, old_status, new_status, datetime.now().isoformat(timespec="seconds"), note))
+        conn.commit()
+    return True, old_status
+
+
+# -----------------------------
+# Lauf
+# -----------------------------
+def worker(mode: str, ids: list[int], ops: int, seed_: int, stats: Counter, lock: threading.Lock):
+    rnd = random.Random(seed_)
+    local = Counter()
+    for _ in range(ops):
+        new_status = rnd.choice(STATUSES)
+        try:
+            if mode == "legacy":
+                legacy_update(rnd.choice(ids), new_status, "stress")
+                local["ok"] += 1
+            elif rnd.random() < 0.2:
+                picked = rnd.sample(ids, k=min(3, len(ids)))
+                expected = rnd.choice([None] + STATUSES)
+                changed = db.update_request_statuses(picked, new_status, "stress bulk", expected_status=expected)
+                local["bulk"] += 1
+                local["bulk_changed"] += len(changed)
+            else:
+                rid = rnd.choice(ids)
+                seen = db.get_request_status(rid)
+                time.sleep(0.001)  # Nutzer entscheidet – inzwischen kann jemand anders speichern
+                ok, _ = db.update_request_status(rid, new_status, "stress", expected_status=seen)
+                local["ok" if ok else "conflict"] += 1
+        except sqlite3.OperationalError as e:
+            local["locked" if "locked" in str(e) else "error"] += 1
+    with lock:
+        stats.update(local)
+
+
+def check_history(ids: list[int]) -> list[str]:
+    problems = []
+    for rid in ids:
+        current = db.get_request_status(rid)
+        prev = None
+        for old_status, new_status, _, _ in db.load_status_history(rid):
+            if old_status != prev:
+                problems.append(f"Request {rid}: Eintrag {old_status!r} → {new_status!r} folgt auf {prev!r}")
+            prev = new_status
+        if prev != current:
+            problems.append(f"Request {rid}: letzter History-Eintrag {prev!r}, aktueller Status {current!r}")
+    return problems
+
+
+def run(mode: str, path: str, threads: int, ops: int, n_requests: int) -> tuple[Counter, list[str], float]:
+    db.DB_PATH = path
+    db.init_db()
+    ids = seed(n_requests)
+    stats, lock = Counter(), threading.Lock()
+    t0 = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(mode, ids, ops, i, stats, lock)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - t0
+    problems = check_history(ids)
+    db.close_all_connections()
+    return stats, problems, wall
+
+
+def report(label: str, stats: Counter, problems: list[str], wall: float):
+    ops = sum(v for k, v in stats.items() if k != "bulk_changed")
+    print(f"{label:<8} {ops} Operationen in {wall:.2f}s ({ops / wall:,.0f}/s)  " +
+          "  ".join(f"{k}={v}" for k, v in sorted(stats.items())) +
+          f"  History-Fehler={len(problems)}")
+    for p in problems[:5]:
+        print(f"         {p}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--ops", type=int, default=200, help="Operationen pro Thread")
+    ap.add_argument("--requests", type=int, default=5, help="wenige Requests → viele Konflikte")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report("vorher", *run("legacy", os.path.join(tmp, "legacy.db"), args.threads, args.ops, args.requests))
+        stats, problems, wall = run("cas", os.path.join(tmp, "cas.db"), args.threads, args.ops, args.requests)
+        report("nachher", stats, problems, wall)
+
+    return 1 if problems or stats["locked"] or stats["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())